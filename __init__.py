@@ -11,6 +11,7 @@ bl_info = {
 import bpy
 from . import config
 from .compilation import *
+from .watch_mode import stop_watch, watch_state
 
 def register():
     # Enregistrer toutes les classes
@@ -28,9 +29,15 @@ def register():
     bpy.types.Scene.sequence_list_index = bpy.props.IntProperty()
     bpy.types.Scene.lod_list = bpy.props.CollectionProperty(type=config.LODPropGroup)
     bpy.types.Scene.lod_list_index = bpy.props.IntProperty()
+    bpy.types.Scene.compile_target_list = bpy.props.CollectionProperty(type=config.CompileTargetPropGroup)
+    bpy.types.Scene.compile_target_list_index = bpy.props.IntProperty()
 
 
 def unregister():
+    # Le handler et le timer du mode watch ne doivent pas survivre à l'addon
+    if watch_state.active:
+        stop_watch()
+    
     # Supprimer les propriétés de la scène
     del bpy.types.Scene.relinker_props
     del bpy.types.Scene.compilation_props
@@ -40,6 +47,8 @@ def unregister():
     del bpy.types.Scene.sequence_list_index
     del bpy.types.Scene.lod_list
     del bpy.types.Scene.lod_list_index
+    del bpy.types.Scene.compile_target_list
+    del bpy.types.Scene.compile_target_list_index
     
     # Désenregistrer toutes les classes
     for cls in reversed(config.classes):
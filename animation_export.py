@@ -0,0 +1,164 @@
+import os
+import math
+from collections import deque
+
+import numpy as np
+
+from .smd_export import Skeleton, find_armature
+from .smd_format import format_animation
+from .staging import atomic_write
+
+
+# Cadence par défaut de studiomdl quand la séquence n'a pas de fps
+DEFAULT_SEQUENCE_FPS = 30
+
+# Nœud unique des animations d'objets rigides (même nom que l'en-tête SMD statique)
+RIGID_ROOT_NAME = "root"
+
+
+def sequence_source(seq):
+    """Objet animé d'une séquence : l'armature, ou le mesh animé, ou None"""
+    if seq.animation_mode == 'ARMATURE':
+        return seq.animation_armature
+    return seq.animation_mesh
+
+
+def sequence_fps(seq):
+    if seq.enable_fps and seq.fps > 0:
+        return seq.fps
+    return DEFAULT_SEQUENCE_FPS
+
+
+def sequence_frames(scene, frame_start, frame_end, fps):
+    """Frames de scène (fractionnaires) échantillonnées de frame_start à frame_end à fps images/s"""
+    scene_fps = scene.render.fps / scene.render.fps_base
+    step = scene_fps / fps
+    count = int(math.floor((frame_end - frame_start) / step + 1e-6)) + 1
+    return frame_start + np.arange(max(count, 1)) * step
+
+
+def _set_frame(scene, frame):
+    whole = math.floor(frame)
+    scene.frame_set(int(whole), subframe=float(frame - whole))
+
+
+class SequenceSampler:
+    """Échantillonne les matrices d'une séquence : armature (tous les os) ou objet rigide
+
+    L'action de la séquence est assignée le temps de l'échantillonnage puis
+    restaurée. Chaque frame n'évalue la scène qu'une fois et lit toutes les
+    matrices des os d'un bloc.
+    """
+
+    def __init__(self, scene, seq):
+        self.scene = scene
+        self.seq = seq
+        self.source = sequence_source(seq)
+        self.armature = None
+        if self.source is not None:
+            self.armature = self.source if self.source.type == 'ARMATURE' else find_armature(self.source)
+
+    @property
+    def animated(self):
+        return self.armature if self.armature is not None else self.source
+
+    def frame_range(self):
+        """Plage de l'action assignée, ou la frame courante sans action"""
+        animation_data = self.animated.animation_data
+        action = self.seq.action or (animation_data.action if animation_data else None)
+        if action is None:
+            return self.scene.frame_current, self.scene.frame_current
+        start, end = action.frame_range
+        return start, end
+
+    def sample(self):
+        """Retourne (noms des nœuds, parents, matrices monde (F, B, 4, 4))"""
+        animated = self.animated
+        previous_action = None
+        had_animation_data = animated.animation_data is not None
+        if self.seq.action is not None:
+            if not had_animation_data:
+                animated.animation_data_create()
+            previous_action = animated.animation_data.action
+            animated.animation_data.action = self.seq.action
+
+        try:
+            start, end = self.frame_range()
+            frames = sequence_frames(self.scene, start, end, sequence_fps(self.seq))
+            if self.armature is not None:
+                return self._sample_armature(frames)
+            return self._sample_rigid(frames)
+        finally:
+            if self.seq.action is not None:
+                if had_animation_data:
+                    animated.animation_data.action = previous_action
+                else:
+                    animated.animation_data_clear()
+
+    def _sample_armature(self, frames):
+        skeleton = Skeleton(self.armature)
+        pose_bones = self.armature.pose.bones
+        buffer = np.empty((len(frames), len(pose_bones) * 16), dtype=np.float32)
+        armature_matrices = np.empty((len(frames), 4, 4), dtype=np.float64)
+
+        for index, frame in enumerate(frames):
+            _set_frame(self.scene, frame)
+            pose_bones.foreach_get("matrix", buffer[index])
+            armature_matrices[index] = self.armature.matrix_world
+
+        world = armature_matrices[:, None] @ skeleton.pose_matrices(buffer)
+        return skeleton.names, skeleton.parents, world
+
+    def _sample_rigid(self, frames):
+        # Le mesh de référence est écrit en espace monde à la frame courante :
+        # le nœud racine porte le mouvement relatif à cette position
+        reference = np.linalg.inv(np.array(self.source.matrix_world, dtype=np.float64))
+        world = np.empty((len(frames), 1, 4, 4), dtype=np.float64)
+        for index, frame in enumerate(frames):
+            _set_frame(self.scene, frame)
+            world[index, 0] = np.array(self.source.matrix_world, dtype=np.float64) @ reference
+        return [RIGID_ROOT_NAME], [-1], world
+
+
+def write_animation_smd(path, text):
+    with atomic_write(path) as f:
+        f.write(text)
+
+
+def export_sequence_smds(scene, jobs, output_dir, formatter=None):
+    """Échantillonne puis écrit le SMD d'animation de chaque séquence
+
+    L'échantillonnage passe par frame_set et reste séquentiel ; avec un
+    formatter parallèle, la conversion en Euler et le formatage de chaque
+    séquence partent dans un worker pendant que la suivante est échantillonnée.
+    Retourne le nombre de frames écrites.
+    """
+    frame_current = scene.frame_current
+    subframe = scene.frame_subframe
+    frame_count = 0
+    pending = deque()
+    try:
+        for job in jobs:
+            names, parents, world = SequenceSampler(scene, job.sequence).sample()
+            frame_count += len(world)
+            path = os.path.join(output_dir, job.filename)
+
+            if formatter is None:
+                write_animation_smd(path, format_animation(names, parents, world))
+                continue
+
+            pending.append((path, formatter.submit("format_animation", names, parents, world)))
+            if len(pending) >= formatter.workers * 2:
+                path, future = pending.popleft()
+                write_animation_smd(path, future.result())
+
+        while pending:
+            path, future = pending.popleft()
+            write_animation_smd(path, future.result())
+    except BaseException:
+        for path, future in pending:
+            future.cancel()
+        raise
+    finally:
+        scene.frame_set(frame_current, subframe=subframe)
+    return frame_count
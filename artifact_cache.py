@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+
+from .staging import file_digest, sync_file
+from .compiled_model import mdl_anim_blocks, read_checksum
+
+
+# Extensions produites par studiomdl pour un modèle
+ARTIFACT_EXTENSIONS = (
+    ".mdl",
+    ".vvd",
+    ".phy",
+    ".ani",
+    ".vtx",
+    ".dx90.vtx",
+    ".dx80.vtx",
+    ".sw.vtx",
+)
+
+_META_FILENAME = "meta.json"
+
+# Empreintes de l'exécutable studiomdl, indexées par (chemin, taille, mtime)
+_binary_digests = {}
+
+
+def _binary_digest(path):
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _binary_digests:
+        _binary_digests[key] = file_digest(path)
+    return _binary_digests[key]
+
+
+def compile_key(qc_path, input_paths, studiomdl_path, gameinfo_path):
+    """Clé d'un compile : texte du QC, empreinte de chaque SMD et du binaire studiomdl, gameinfo utilisé
+
+    Deux cibles qui partagent un studiomdl compilent pour des jeux différents
+    (matériaux, $includemodel, version de MDL) : le chemin du gameinfo fait
+    partie de la clé.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(os.path.normcase(os.path.abspath(gameinfo_path)).encode() + b"\0")
+    with open(qc_path, "rb") as f:
+        digest.update(f.read())
+    for path in sorted(input_paths):
+        digest.update(os.path.basename(path).encode() + b"\0")
+        digest.update(file_digest(path).encode())
+    digest.update(_binary_digest(studiomdl_path).encode())
+    return digest.hexdigest()
+
+
+def model_artifact_base(game_dir, modelname):
+    """Chemin (sans extension) des fichiers compilés pour un $modelname"""
+    return os.path.join(game_dir, "models", os.path.splitext(modelname)[0])
+
+
+def find_artifacts(artifact_base):
+    """Fichiers compilés existants pour une base de modèle"""
+    return [artifact_base + ext for ext in ARTIFACT_EXTENSIONS if os.path.exists(artifact_base + ext)]
+
+
+def current_artifacts(artifact_base):
+    """Fichiers compilés qui appartiennent au .mdl actuel
+
+    studiomdl ne supprime pas ce qu'il n'écrit plus : un .phy ou un .ani
+    d'un compile précédent peut rester à côté du nouveau .mdl. Un fichier
+    est gardé si sa somme de contrôle est celle du .mdl ; le .ani, qui n'en
+    a pas, seulement si le .mdl déclare des blocs d'animation.
+    """
+    mdl_path = artifact_base + ".mdl"
+    if not os.path.exists(mdl_path):
+        return []
+
+    try:
+        checksum = read_checksum(mdl_path)
+        anim_blocks = mdl_anim_blocks(mdl_path)
+    except OSError:
+        return []
+
+    artifacts = []
+    for path in find_artifacts(artifact_base):
+        ext = path[len(artifact_base):]
+        try:
+            if ext == ".ani":
+                current = anim_blocks > 0
+            else:
+                current = read_checksum(path) == checksum
+        except OSError:
+            current = False
+        if current:
+            artifacts.append(path)
+        else:
+            print(f"[ARTIFACTS] Ignoring stale {os.path.basename(path)}")
+    return artifacts
+
+
+def copy_artifacts(artifact_base, output_dir):
+    """Copie les fichiers compilés d'un modèle dans output_dir ; retourne le nombre de fichiers copiés"""
+    os.makedirs(output_dir, exist_ok=True)
+    copied = 0
+    for path in current_artifacts(artifact_base):
+        if sync_file(path, os.path.join(output_dir, os.path.basename(path))):
+            copied += 1
+    return copied
+
+
+class ArtifactCache:
+    """Store local des fichiers compilés, indexé par clé de compile, avec éviction LRU
+
+    Chaque entrée est un répertoire <clé>/ contenant les artefacts et un
+    meta.json ; la date de dernier usage sert à l'éviction quand la taille
+    totale dépasse max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.directory, key)
+
+    def _read_meta(self, key):
+        meta_path = os.path.join(self._entry_dir(key), _META_FILENAME)
+        try:
+            with open(meta_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        with open(os.path.join(self._entry_dir(key), _META_FILENAME), "w") as f:
+            json.dump(meta, f, indent=1)
+
+    def restore(self, key, artifact_base):
+        """Recopie les artefacts d'une entrée vers artifact_base ; False si absente
+
+        Les fichiers du modèle absents de l'entrée (un .phy ou un .ani d'un
+        autre compile) sont supprimés : le modèle restauré est exactement
+        celui du compile mis en cache.
+        """
+        meta = self._read_meta(key)
+        if meta is None:
+            return False
+
+        entry_dir = self._entry_dir(key)
+        if not all(os.path.exists(os.path.join(entry_dir, ext.lstrip("."))) for ext in meta["extensions"]):
+            return False
+
+        os.makedirs(os.path.dirname(artifact_base), exist_ok=True)
+        for ext in meta["extensions"]:
+            sync_file(os.path.join(entry_dir, ext.lstrip(".")), artifact_base + ext)
+        for ext in ARTIFACT_EXTENSIONS:
+            if ext not in meta["extensions"] and os.path.exists(artifact_base + ext):
+                os.remove(artifact_base + ext)
+                print(f"[ARTIFACTS] Removed stale {os.path.basename(artifact_base + ext)}")
+
+        meta["last_used"] = time.time()
+        self._write_meta(key, meta)
+        return True
+
+    def store(self, key, artifact_base):
+        """Ajoute au store les artefacts du .mdl compilé (current_artifacts) puis applique l'éviction"""
+        artifacts = current_artifacts(artifact_base)
+        if not artifacts:
+            return False
+
+        entry_dir = self._entry_dir(key)
+        tmp_dir = f"{entry_dir}.{os.getpid()}.tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        extensions = []
+        size = 0
+        for path in artifacts:
+            ext = path[len(artifact_base):]
+            shutil.copy2(path, os.path.join(tmp_dir, ext.lstrip(".")))
+            extensions.append(ext)
+            size += os.path.getsize(path)
+
+        with open(os.path.join(tmp_dir, _META_FILENAME), "w") as f:
+            json.dump({"extensions": extensions, "size": size, "last_used": time.time()}, f, indent=1)
+
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+
+        self.evict()
+        return True
+
+    def evict(self):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        entries = []
+        total = 0
+        for key in os.listdir(self.directory):
+            meta = self._read_meta(key)
+            if meta is None:
+                continue
+            entries.append((meta.get("last_used", 0), key, meta.get("size", 0)))
+            total += meta.get("size", 0)
+
+        for last_used, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+            print(f"[ARTIFACTS] Evicted {key} ({size} bytes)")
@@ -0,0 +1,182 @@
+import os
+import json
+import time
+
+from .studiomdl_runner import StudiomdlProcess, studiomdl_error_message
+
+
+class BatchJob:
+    """Un modèle de la file : son sandbox, sa commande studiomdl et son résultat"""
+
+    def __init__(self, name, sandbox_dir):
+        self.name = name
+        self.sandbox_dir = sandbox_dir
+        self.status = 'PENDING'
+        self.error = ""
+        self.args = None
+        self.cwd = None
+        self.timeout = 0
+        self.process = None
+        self.lines = []
+        self.export_duration = 0.0
+        self.start_time = None
+        self.duration = 0.0
+        self.on_success = None
+        self.from_cache = False
+
+    @property
+    def log_path(self):
+        return os.path.join(self.sandbox_dir, "studiomdl.log")
+
+    def ready(self, args, cwd, timeout):
+        """Marque le job comme prêt à compiler une fois ses entrées exportées"""
+        self.args = args
+        self.cwd = cwd
+        self.timeout = timeout
+        self.status = 'READY'
+
+    def restored(self):
+        """Artefacts restaurés depuis le cache : pas de studiomdl à lancer"""
+        self.status = 'SUCCEEDED'
+        self.from_cache = True
+
+    def fail(self, error):
+        self.status = 'FAILED'
+        self.error = error
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "status": self.status,
+            "error": self.error,
+            "sandbox": self.sandbox_dir,
+            "log": self.log_path if self.lines else "",
+            "from_cache": self.from_cache,
+            "export_seconds": round(self.export_duration, 3),
+            "compile_seconds": round(self.duration, 3),
+        }
+
+
+class BatchQueue:
+    """File de compilation : jusqu'à `concurrency` studiomdl en parallèle
+
+    step() ne bloque jamais : il démarre les jobs prêts dans la limite de
+    concurrence et relève les jobs terminés. run() boucle jusqu'à la fin.
+    """
+
+    def __init__(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        self.jobs = []
+        self.start_time = time.monotonic()
+
+    def add(self, job):
+        self.jobs.append(job)
+        return job
+
+    def running_jobs(self):
+        return [job for job in self.jobs if job.status == 'RUNNING']
+
+    @property
+    def finished(self):
+        return not any(job.status in {'PENDING', 'READY', 'RUNNING'} for job in self.jobs)
+
+    def step(self):
+        """Avance la file d'un pas ; retourne True quand tous les jobs sont terminés"""
+        for job in self.running_jobs():
+            job.lines.extend(job.process.drain())
+
+            if job.process.timed_out():
+                job.process.terminate()
+                self._finish(job, 'FAILED', f"studiomdl.exe timeout (exceeded {job.timeout} seconds)")
+                continue
+
+            returncode = job.process.poll()
+            if returncode is None:
+                continue
+
+            job.lines.extend(job.process.drain())
+            if returncode != 0:
+                self._finish(job, 'FAILED', studiomdl_error_message(returncode, job.lines))
+            else:
+                self._finish(job, 'SUCCEEDED')
+
+        free_slots = self.concurrency - len(self.running_jobs())
+        for job in self.jobs:
+            if free_slots <= 0:
+                break
+            if job.status != 'READY':
+                continue
+            try:
+                job.process = StudiomdlProcess(job.args, job.cwd, job.timeout)
+            except OSError as e:
+                job.fail(f"Cannot start studiomdl.exe: {e}")
+                continue
+            job.status = 'RUNNING'
+            job.start_time = time.monotonic()
+            free_slots -= 1
+
+        return self.finished
+
+    def run(self, poll_interval=0.1):
+        """Mode bloquant : exécute toute la file"""
+        while not self.step():
+            time.sleep(poll_interval)
+
+    def cancel(self):
+        for job in self.jobs:
+            if job.status == 'RUNNING':
+                job.process.terminate()
+                self._finish(job, 'CANCELLED')
+            elif job.status in {'PENDING', 'READY'}:
+                job.status = 'CANCELLED'
+
+    def _finish(self, job, status, error=""):
+        job.status = status
+        job.error = error
+        job.duration = time.monotonic() - job.start_time
+        if status == 'SUCCEEDED' and job.on_success is not None:
+            job.on_success()
+        if job.lines:
+            with open(job.log_path, "w") as f:
+                f.write("\n".join(f"[{stream}] {line}" for stream, line in job.lines))
+                f.write("\n")
+
+    def counts(self):
+        counts = {}
+        for job in self.jobs:
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return counts
+
+    def summary(self):
+        counts = self.counts()
+        return (
+            f"{counts.get('SUCCEEDED', 0)} succeeded, {counts.get('FAILED', 0)} failed, "
+            f"{counts.get('CANCELLED', 0)} cancelled in {time.monotonic() - self.start_time:.1f} s"
+        )
+
+    def write_summary(self, path):
+        with open(path, "w") as f:
+            json.dump({
+                "concurrency": self.concurrency,
+                "total_seconds": round(time.monotonic() - self.start_time, 3),
+                "counts": self.counts(),
+                "jobs": [job.to_dict() for job in self.jobs],
+            }, f, indent=2)
+
+
+class BatchStatus:
+    """Dernière file lancée, affichée par le panel batch"""
+
+    def __init__(self):
+        self.queue = None
+        self.summary_path = ""
+
+    @property
+    def running(self):
+        return self.queue is not None and not self.queue.finished
+
+
+batch_status = BatchStatus()
+
+# File des cibles de compile (un export partagé, un studiomdl par cible)
+target_status = BatchStatus()
@@ -0,0 +1,378 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import traceback
+
+import bpy
+import numpy as np
+
+from .headless import HeadlessContext, HeadlessCompile
+from .export_plan import build_export_plan
+from .instrumentation import CompileProfiler
+
+
+# Banc de mesure de l'export SMD, de la génération de LODs et du QC (bpy sans interface).
+#
+#   blender -b --factory-startup --python-expr "import sys; from lw_ModelToGmodHelper import benchmark; sys.exit(benchmark.main())" -- --result bench.json
+#
+# Options (après le "--") :
+#   --case NOM           ne lance que les cas dont le nom contient NOM (répétable)
+#   --quick              seulement les petits cas (itération rapide)
+#   --repeat N           répétitions par cas, le meilleur temps est gardé
+#   --skip-lods          ne mesure pas RELINKER_OT_CreateLODs
+#   --no-memory          désactive tracemalloc (pic mémoire) pour des temps sans surcoût
+#   --baseline FICHIER   compare aux résultats stockés ; code de retour 1 en cas de régression
+#   --threshold X        régression si le temps dépasse la baseline de plus de X (0.15 = 15 %)
+#   --update-baseline    écrit les résultats dans --baseline au lieu de comparer
+#   --result FICHIER     résultats JSON de ce lancement
+#
+# Un cas qui échoue (exception, opérateur annulé) est listé dans "errors" et
+# donne le code de retour 2, même sans régression.
+#
+# Les scènes sont générées avec une graine fixe : deux lancements produisent
+# exactement la même géométrie.
+
+EXIT_OK = 0
+EXIT_REGRESSION = 1
+EXIT_ERROR = 2
+
+DEFAULT_THRESHOLD = 0.15
+BENCHMARK_SEED = 1234
+
+
+class BenchmarkCase:
+    """Une scène synthétique : triangles, objets, slots de matériaux, UV et shading"""
+
+    def __init__(self, triangles, objects, materials, uvs=True, smooth=True, quick=False):
+        self.triangles = triangles
+        self.objects = objects
+        self.materials = materials
+        self.uvs = uvs
+        self.smooth = smooth
+        self.quick = quick
+
+    @property
+    def name(self):
+        uv = "uv" if self.uvs else "nouv"
+        shading = "smooth" if self.smooth else "flat"
+        return f"{_short_count(self.triangles)}tris_{self.objects}obj_{self.materials}mat_{uv}_{shading}"
+
+
+BENCHMARK_CASES = [
+    BenchmarkCase(10_000, 1, 1, quick=True),
+    BenchmarkCase(10_000, 1, 1, uvs=False, smooth=False, quick=True),
+    BenchmarkCase(100_000, 10, 8, smooth=False, quick=True),
+    BenchmarkCase(100_000, 100, 4, uvs=False),
+    BenchmarkCase(1_000_000, 1, 16),
+    BenchmarkCase(1_000_000, 50, 16, smooth=False),
+    BenchmarkCase(1_000_000, 500, 64, uvs=False),
+    BenchmarkCase(5_000_000, 1, 1, smooth=False),
+    BenchmarkCase(5_000_000, 100, 64),
+]
+
+
+def _short_count(count):
+    if count >= 1_000_000:
+        return f"{count // 1_000_000}m"
+    if count >= 1_000:
+        return f"{count // 1_000}k"
+    return str(count)
+
+
+def build_grid_mesh(name, triangles, materials, uvs, smooth, rng):
+    """Mesh en grille bruitée d'exactement `triangles` triangles, construit en bloc"""
+    quads = (triangles + 1) // 2
+    cols = int(np.ceil(np.sqrt(quads)))
+    rows = (quads + cols - 1) // cols
+
+    xs, ys = np.meshgrid(np.arange(cols + 1, dtype=np.float32), np.arange(rows + 1, dtype=np.float32))
+    co = np.column_stack((xs.ravel(), ys.ravel(), rng.random(xs.size, dtype=np.float32) * 0.25))
+
+    quad = np.arange(quads)
+    v0 = (quad // cols) * (cols + 1) + quad % cols
+    v1 = v0 + 1
+    v2 = v1 + cols + 1
+    v3 = v0 + cols + 1
+    tris = np.empty((quads * 2, 3), dtype=np.int32)
+    tris[0::2] = np.column_stack((v0, v1, v2))
+    tris[1::2] = np.column_stack((v0, v2, v3))
+    tris = tris[:triangles]
+
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(co))
+    mesh.vertices.foreach_set("co", co.ravel())
+    mesh.loops.add(tris.size)
+    mesh.loops.foreach_set("vertex_index", tris.ravel())
+    mesh.polygons.add(len(tris))
+    mesh.polygons.foreach_set("loop_start", np.arange(0, tris.size, 3, dtype=np.int32))
+    mesh.polygons.foreach_set("material_index", ((np.arange(len(tris)) // 2) % materials).astype(np.int32))
+    mesh.polygons.foreach_set("use_smooth", np.full(len(tris), smooth, dtype=bool))
+
+    if uvs:
+        uv_layer = mesh.uv_layers.new(name="UVMap")
+        loop_uvs = co[tris.ravel(), :2] / np.float32(max(cols, rows))
+        uv_layer.data.foreach_set("uv", loop_uvs.ravel())
+
+    mesh.update()
+    return mesh
+
+
+def generate_scene(case, seed=BENCHMARK_SEED):
+    """Crée une scène de benchmark : une collection d'objets et un body qui l'instancie"""
+    rng = np.random.default_rng(seed)
+    scene = bpy.data.scenes.new(f"bench_{case.name}")
+    collection = bpy.data.collections.new(f"bench_{case.name}")
+    scene.collection.children.link(collection)
+
+    materials = [bpy.data.materials.new(f"bench_mat_{index}") for index in range(case.materials)]
+
+    # Triangles répartis au plus juste entre les objets
+    per_object = np.full(case.objects, case.triangles // case.objects)
+    per_object[:case.triangles % case.objects] += 1
+
+    for index, triangles in enumerate(per_object):
+        mesh = build_grid_mesh(f"bench_mesh_{index}", int(triangles), case.materials, case.uvs, case.smooth, rng)
+        for material in materials:
+            mesh.materials.append(material)
+        obj = bpy.data.objects.new(f"bench_obj_{index}", mesh)
+        obj.location = (index * 2.0 * np.sqrt(triangles), 0.0, 0.0)
+        collection.objects.link(obj)
+
+    body_object = bpy.data.objects.new(f"bench_body_{case.name}", None)
+    body_object.instance_type = 'COLLECTION'
+    body_object.instance_collection = collection
+    scene.collection.objects.link(body_object)
+
+    props = scene.compilation_props
+    props.modelname = "benchmark/bench.mdl"
+    props.cdmaterials = "models/benchmark"
+    body = scene.body_list.add()
+    body.name = "bench"
+    body.mesh_object = body_object
+
+    return scene, collection
+
+
+class BenchmarkRunner(HeadlessCompile):
+    """Mesure export SMD, LODs et QC sur les scènes générées"""
+
+    def __init__(self, output_dir, repeat=1, trace_memory=True, skip_lods=False):
+        super().__init__()
+        self.output_dir = output_dir
+        self.repeat = max(1, repeat)
+        self.trace_memory = trace_memory
+        self.skip_lods = skip_lods
+
+    def run_case(self, case):
+        """Exécute un cas et retourne {opération: mesures}, meilleur temps sur `repeat` passes"""
+        before = _data_snapshot()
+        try:
+            scene, collection = generate_scene(case)
+            view_layer = scene.view_layers[0]
+            with bpy.context.temp_override(scene=scene, view_layer=view_layer):
+                return self._measure(case, scene, view_layer, collection)
+        finally:
+            _remove_new_data(before)
+
+    def _measure(self, case, scene, view_layer, collection):
+        context = HeadlessContext(scene)
+        first_object = collection.objects[0]
+        first_triangles = len(first_object.data.polygons)
+        case_dir = os.path.join(self.output_dir, case.name)
+        os.makedirs(case_dir, exist_ok=True)
+
+        best = {}
+        for _ in range(self.repeat):
+            profiler = CompileProfiler(self.trace_memory)
+            depsgraph = context.evaluated_depsgraph_get()
+
+            with profiler.stage("export_mesh_to_smd") as stage:
+                self.export_mesh_to_smd(first_object, os.path.join(case_dir, "mesh.smd"), False, depsgraph)
+                stage.triangles = first_triangles
+            with profiler.stage("export_collection_to_smd") as stage:
+                self.export_collection_to_smd(collection, os.path.join(case_dir, "collection.smd"), False, depsgraph)
+                stage.triangles = case.triangles
+            with profiler.stage("generate_qc") as stage:
+                self.generate_qc(context, os.path.join(case_dir, "model_compile.qc"), build_export_plan(scene))
+
+            if not self.skip_lods:
+                view_layer.objects.active = first_object
+                with profiler.stage("create_lods") as stage:
+                    # Un opérateur annulé (pas de mesh actif) donnerait un temps quasi nul
+                    result = bpy.ops.lw_pannel.create_lods()
+                    if result != {'FINISHED'}:
+                        raise Exception(f"create_lods returned {sorted(result)}")
+                    stage.triangles = first_triangles
+            profiler.stop()
+
+            for record in profiler.stages:
+                measure = {
+                    "seconds": round(record.wall, 4),
+                    "cpu_seconds": round(record.cpu, 4),
+                    "triangles": record.triangles,
+                    "triangles_per_second": round(record.triangles / record.wall) if record.wall > 0 else 0,
+                    "peak_memory_bytes": record.peak_memory,
+                }
+                if record.name not in best or measure["seconds"] < best[record.name]["seconds"]:
+                    best[record.name] = measure
+
+            if not self.skip_lods:
+                # Les LODs générés ne doivent pas s'empiler d'une passe à l'autre
+                _remove_lod_collections(collection.name)
+        return best
+
+
+def _data_snapshot():
+    return {
+        "objects": set(bpy.data.objects.keys()),
+        "meshes": set(bpy.data.meshes.keys()),
+        "materials": set(bpy.data.materials.keys()),
+        "collections": set(bpy.data.collections.keys()),
+        "scenes": set(bpy.data.scenes.keys()),
+    }
+
+
+def _remove_new_data(before):
+    """Supprime tout ce qu'un cas a créé (objets, meshes, matériaux, collections, scène)"""
+    removed = []
+    for attr, names in before.items():
+        data = getattr(bpy.data, attr)
+        removed.extend(item for item in data if item.name not in names)
+    bpy.data.batch_remove(removed)
+
+
+def _remove_lod_collections(collection_name):
+    prefix = f"{collection_name}_lod"
+    removed = []
+    for lod_collection in bpy.data.collections:
+        if lod_collection.name.startswith(prefix):
+            for obj in lod_collection.objects:
+                removed.append(obj)
+                if obj.data is not None:
+                    removed.append(obj.data)
+            removed.append(lod_collection)
+    bpy.data.batch_remove(removed)
+
+
+def compare_to_baseline(results, baseline, threshold):
+    """Annote les résultats avec le ratio à la baseline et retourne la liste des régressions"""
+    regressions = []
+    for case_name, operations in results["cases"].items():
+        baseline_operations = baseline.get("cases", {}).get(case_name)
+        if not baseline_operations:
+            continue
+        for operation, measure in operations.items():
+            reference = baseline_operations.get(operation)
+            if not reference or reference["seconds"] <= 0:
+                continue
+            ratio = measure["seconds"] / reference["seconds"]
+            measure["baseline_seconds"] = reference["seconds"]
+            measure["ratio"] = round(ratio, 3)
+            if ratio > 1.0 + threshold:
+                regressions.append(
+                    f"{case_name}/{operation}: {reference['seconds']:.3f} s -> "
+                    f"{measure['seconds']:.3f} s (+{(ratio - 1.0) * 100:.0f}%)"
+                )
+    return regressions
+
+
+def select_cases(names, quick):
+    cases = [case for case in BENCHMARK_CASES if case.quick or not quick]
+    if names:
+        cases = [case for case in cases if any(name in case.name for name in names)]
+    return cases
+
+
+def _script_args(argv):
+    # Sous Blender, les arguments du script suivent "--"
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    return argv
+
+
+def main(argv=None):
+    """Point d'entrée : retourne 2 si un cas a échoué, 1 si une régression dépasse le seuil"""
+    parser = argparse.ArgumentParser(prog="benchmark", description="LW ModelToGmodHelper export benchmark")
+    parser.add_argument("--case", action="append", default=[], help="Only run cases whose name contains this (repeatable)")
+    parser.add_argument("--quick", action="store_true", help="Only run the small cases")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per case, the best time is kept")
+    parser.add_argument("--skip-lods", action="store_true", help="Do not time RELINKER_OT_CreateLODs")
+    parser.add_argument("--no-memory", action="store_true", help="Disable tracemalloc peak memory tracking")
+    parser.add_argument("--baseline", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Allowed slowdown before failing (0.15 = 15%%)")
+    parser.add_argument("--update-baseline", action="store_true", help="Write the results to --baseline instead of comparing")
+    parser.add_argument("--result", help="JSON file for this run's results")
+    parser.add_argument("--output-dir", help="Directory for the exported SMD/QC files (default: temporary)")
+    args = parser.parse_args(_script_args(argv))
+
+    # Avec le module bpy, l'addon n'est pas enregistré automatiquement
+    if not hasattr(bpy.types.Scene, "compilation_props"):
+        from . import register
+        register()
+
+    output_dir = args.output_dir or tempfile.mkdtemp(prefix="lw_benchmark_")
+    runner = BenchmarkRunner(output_dir, args.repeat, not args.no_memory, args.skip_lods)
+
+    results = {
+        "blender": bpy.app.version_string,
+        "numpy": np.__version__,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "seed": BENCHMARK_SEED,
+        "repeat": runner.repeat,
+        "cases": {},
+        "errors": {},
+    }
+
+    start = time.monotonic()
+    for case in select_cases(args.case, args.quick):
+        print(f"[BENCHMARK] {case.name}")
+        try:
+            results["cases"][case.name] = runner.run_case(case)
+        except Exception as e:
+            traceback.print_exc()
+            results["errors"][case.name] = str(e)
+            continue
+        for operation, measure in results["cases"][case.name].items():
+            print(
+                f"[BENCHMARK]   {operation}: {measure['seconds']:.3f} s, "
+                f"{measure['triangles_per_second']} tris/s, peak {measure['peak_memory_bytes'] / (1024 * 1024):.1f} MB"
+            )
+    results["seconds"] = round(time.monotonic() - start, 3)
+
+    regressions = []
+    if args.baseline and args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"[BENCHMARK] Baseline written to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.threshold)
+        results["threshold"] = args.threshold
+        results["regressions"] = regressions
+        for regression in regressions:
+            print(f"[BENCHMARK] REGRESSION {regression}")
+
+    if args.result:
+        with open(args.result, "w") as f:
+            json.dump(results, f, indent=2)
+
+    for case_name, message in results["errors"].items():
+        print(f"[BENCHMARK] ERROR {case_name}: {message}")
+    print(
+        f"[BENCHMARK] {len(results['cases'])} case(s) in {results['seconds']} s, "
+        f"{len(regressions)} regression(s), {len(results['errors'])} error(s)"
+    )
+    if results["errors"]:
+        return EXIT_ERROR
+    return EXIT_REGRESSION if regressions else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
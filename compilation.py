@@ -1,9 +1,42 @@
 import bpy
 import os
+import time
 import subprocess
-import shutil
 from pathlib import Path
-from io import StringIO
+from .smd_export import InstancedMeshes, iter_instances_to_smd, iter_objects_to_smd
+from .dmx_export import iter_instances_to_dmx, iter_objects_to_dmx
+from .dmx_format import DMX_EXTENSION
+from .smd_parallel import ParallelFormatter
+from .animation_export import export_sequence_smds
+from .flex_export import DEFAULT_FLEX_TOLERANCE, write_flex_model, write_vta
+from .export_cache import SMDExportCache, fingerprint_objects
+from .export_plan import body_groups, build_export_plan, is_collection_instancer, reference_body, single_body
+from .mesh_split import (
+    MAX_STUDIO_MATERIALS,
+    MAX_STUDIO_TRIANGLES,
+    MAX_STUDIO_VERTICES,
+    SplitLimits,
+    estimate_instances,
+    estimate_objects,
+    instance_count,
+    iter_split_part,
+    split_body_if_needed,
+)
+from .staging import atomic_write, sync_file
+from .batch_compile import BatchJob, BatchQueue, batch_status, target_status
+from .artifact_cache import ArtifactCache, compile_key, copy_artifacts, model_artifact_base
+from .instrumentation import CompileProfiler, finish_profiler
+from .watch_mode import start_watch, stop_watch, watch_state
+from .export_progress import export_progress, run_slice, run_to_end
+from .preflight import run_preflight
+from .studiomdl_output import studiomdl_output
+from .compiled_model import load_stats, model_stats, read_model_stats, stats_changes, stats_summary, write_stats
+from .studiomdl_runner import (
+    compile_log,
+    build_studiomdl_args,
+    studiomdl_error_message,
+    StudiomdlProcess,
+)
 
 
 def validate_compilation_config(context):
@@ -23,6 +56,16 @@ def on_compilation_path_changed(self, context):
     validate_compilation_config(context)
 
 
+def tag_compilation_redraw(context):
+    """Redessine les vues 3D pour rafraîchir le log de compilation"""
+    if not context.window_manager:
+        return
+    for window in context.window_manager.windows:
+        for area in window.screen.areas:
+            if area.type == 'VIEW_3D':
+                area.tag_redraw()
+
+
 class CompilationProperties(bpy.types.PropertyGroup):
     """Propriétés pour la compilation Source Engine"""
     
@@ -92,6 +135,188 @@ class CompilationProperties(bpy.types.PropertyGroup):
         default=""
     )
     
+    staging_mode: bpy.props.EnumProperty(
+        name="Staging Mode",
+        description="How compile inputs reach the game directory",
+        items=[
+            ('STAGED', "Staging Directory", "Write to the SMD output path (or temp) and copy only changed files to the game directory"),
+            ('DIRECT', "Direct", "Write SMDs and QC straight into the game directory")
+        ],
+        default='STAGED'
+    )
+    
+    studiomdl_timeout: bpy.props.IntProperty(
+        name="studiomdl Timeout",
+        description="Seconds before studiomdl is stopped (0 = no timeout)",
+        default=120,
+        min=0
+    )
+    
+    log_scroll: bpy.props.IntProperty(
+        name="Log Scroll",
+        description="Number of lines scrolled up from the end of the compile log",
+        default=0,
+        min=0
+    )
+    
+    log_lines_shown: bpy.props.IntProperty(
+        name="Log Lines",
+        description="Number of compile log lines displayed",
+        default=20,
+        min=5,
+        max=200
+    )
+    
+    batch_include: bpy.props.BoolProperty(
+        name="Include in Batch",
+        description="Compile this scene when running the batch queue",
+        default=False
+    )
+    
+    batch_concurrency: bpy.props.IntProperty(
+        name="Concurrent Jobs",
+        description="Maximum number of studiomdl processes running at the same time",
+        default=max(1, (os.cpu_count() or 2) // 2),
+        min=1,
+        max=64
+    )
+    
+    batch_sandbox_path: bpy.props.StringProperty(
+        name="Batch Sandbox Path",
+        description="Root directory for per-job QC and SMD sandboxes (leave empty for temp directory)",
+        subtype='DIR_PATH',
+        default=""
+    )
+    
+    use_artifact_cache: bpy.props.BoolProperty(
+        name="Use Artifact Cache",
+        description="Skip studiomdl and restore compiled files when the QC, SMDs and studiomdl are unchanged",
+        default=True
+    )
+    
+    artifact_cache_path: bpy.props.StringProperty(
+        name="Artifact Cache Path",
+        description="Directory of the compiled artifact store (leave empty for the Blender user data directory)",
+        subtype='DIR_PATH',
+        default=""
+    )
+    
+    artifact_cache_size_mb: bpy.props.IntProperty(
+        name="Artifact Cache Size (MB)",
+        description="Maximum size of the artifact store, least recently used entries are evicted first",
+        default=2048,
+        min=16
+    )
+    
+    write_model_stats: bpy.props.BoolProperty(
+        name="Store Model Stats",
+        description="Write <model>.stats.json (triangles per LOD, bones, materials, hulls) next to the compiled .mdl",
+        default=False
+    )
+    
+    write_run_report: bpy.props.BoolProperty(
+        name="Write Run Report",
+        description="Write compile_report.json (per-stage timings, triangles, bytes) next to the QC",
+        default=True
+    )
+    
+    profile_memory: bpy.props.BoolProperty(
+        name="Trace Memory",
+        description="Record peak traced Python/NumPy memory per stage (slower)",
+        default=False
+    )
+    
+    profile_cprofile: bpy.props.BoolProperty(
+        name="cProfile Capture",
+        description="Profile the whole compile and save compile_profile.prof (pstats) next to the QC",
+        default=False
+    )
+    
+    output_format: bpy.props.EnumProperty(
+        name="Mesh Format",
+        description="File format of the exported meshes",
+        items=[
+            ('SMD', "SMD (text)", "Text SMD, one vertex line per triangle corner"),
+            ('DMX', "DMX (binary)", "Binary DMX with indexed vertices, normals and UVs (skinned meshes stay SMD)")
+        ],
+        default='SMD'
+    )
+    
+    export_flexes: bpy.props.BoolProperty(
+        name="Export Flexes",
+        description="Write shape keys of the body meshes to a VTA with flexfile/flexcontroller blocks (single body only)",
+        default=True
+    )
+    
+    flex_tolerance: bpy.props.FloatProperty(
+        name="Flex Tolerance",
+        description="Vertices that move less than this distance are left out of the flex frames",
+        default=DEFAULT_FLEX_TOLERANCE,
+        min=0.0,
+        precision=5
+    )
+    
+    watch_debounce: bpy.props.FloatProperty(
+        name="Watch Debounce",
+        description="Seconds without edits before watch mode re-exports the changed meshes and recompiles",
+        default=0.75,
+        min=0.1,
+        max=10.0,
+        subtype='TIME_ABSOLUTE'
+    )
+    
+    auto_split: bpy.props.BoolProperty(
+        name="Auto Split Bodies",
+        description="Split bodies that exceed the studiomdl vertex, triangle or material limits into several $body entries (single body only)",
+        default=True
+    )
+    
+    split_max_vertices: bpy.props.IntProperty(
+        name="Max Vertices",
+        description="Maximum vertices per model after studiomdl vertex unification",
+        default=MAX_STUDIO_VERTICES,
+        min=3,
+        max=MAX_STUDIO_VERTICES
+    )
+    
+    split_max_triangles: bpy.props.IntProperty(
+        name="Max Triangles",
+        description="Maximum triangles per model",
+        default=MAX_STUDIO_TRIANGLES,
+        min=1,
+        max=MAX_STUDIO_TRIANGLES
+    )
+    
+    split_max_materials: bpy.props.IntProperty(
+        name="Max Materials",
+        description="Maximum materials per model",
+        default=MAX_STUDIO_MATERIALS,
+        min=1,
+        max=MAX_STUDIO_MATERIALS
+    )
+    
+    use_export_cache: bpy.props.BoolProperty(
+        name="Use Export Cache",
+        description="Reuse existing SMD files when the evaluated mesh has not changed",
+        default=True
+    )
+    
+    export_workers: bpy.props.IntProperty(
+        name="Export Workers",
+        description="Number of processes used to format large meshes (0 or 1 = single-threaded)",
+        default=0,
+        min=0,
+        max=64
+    )
+    
+    export_frame_budget: bpy.props.IntProperty(
+        name="Export Slice",
+        description="Time the interactive export may take per UI frame before handing control back (milliseconds)",
+        default=50,
+        min=5,
+        max=1000
+    )
+    
     # Options supplémentaires pour le QC
     illumposition_x: bpy.props.FloatProperty(name="Illum X", default=0.0)
     illumposition_y: bpy.props.FloatProperty(name="Illum Y", default=0.0)
@@ -273,6 +498,18 @@ class BodyPropGroup(bpy.types.PropertyGroup):
         description="Mesh collection for this body",
         poll=lambda self, obj: obj.type == 'EMPTY' and obj.instance_type == 'COLLECTION'
     )
+    
+    bodygroup: bpy.props.StringProperty(
+        name="Bodygroup",
+        description="Bodygroup this option belongs to; bodies with the same bodygroup name form one $bodygroup",
+        default="Body"
+    )
+    
+    blank: bpy.props.BoolProperty(
+        name="Blank",
+        description="Empty option: nothing is drawn when this option is selected",
+        default=False
+    )
 
 
 class SequencePropGroup(bpy.types.PropertyGroup):
@@ -313,6 +550,13 @@ class SequencePropGroup(bpy.types.PropertyGroup):
         poll=lambda self, obj: obj.type == 'ARMATURE'
     )
     
+    # Action exportée (vide = action déjà assignée à la source)
+    action: bpy.props.PointerProperty(
+        type=bpy.types.Action,
+        name="Action",
+        description="Action to export for this sequence (empty uses the action assigned to the source)"
+    )
+    
     # Sequence options
     enable_activity: bpy.props.BoolProperty(
         name="Enable Activity",
@@ -421,13 +665,60 @@ class LODPropGroup(bpy.types.PropertyGroup):
     )
 
 
+class CompileTargetPropGroup(bpy.types.PropertyGroup):
+    """Cible de compile : un studiomdl, un gameinfo et un dossier de sortie"""
+    enabled: bpy.props.BoolProperty(
+        name="Enabled",
+        description="Compile the shared export for this target",
+        default=True
+    )
+    
+    studiomdl_path: bpy.props.StringProperty(
+        name="studiomdl.exe Path",
+        description="studiomdl.exe of this target",
+        subtype='FILE_PATH',
+        default=""
+    )
+    
+    gameinfo_path: bpy.props.StringProperty(
+        name="gameinfo.txt Path",
+        description="gameinfo.txt of this target",
+        subtype='FILE_PATH',
+        default=""
+    )
+    
+    output_path: bpy.props.StringProperty(
+        name="Output Path",
+        description="Directory where the compiled model files are copied (leave empty to keep them in the game directory)",
+        subtype='DIR_PATH',
+        default=""
+    )
+    
+    @property
+    def game_dir(self):
+        return os.path.dirname(self.gameinfo_path)
+
+
+def target_problem(target):
+    """Message d'erreur si les chemins d'une cible sont invalides, sinon chaîne vide"""
+    if not target.studiomdl_path or not os.path.exists(target.studiomdl_path):
+        return f"studiomdl.exe not found: {target.studiomdl_path}"
+    if not target.gameinfo_path or not os.path.exists(target.gameinfo_path):
+        return f"gameinfo.txt not found: {target.gameinfo_path}"
+    return ""
+
+
 class COMPILATION_UL_BodyList(bpy.types.UIList):
     """Liste UI pour les bodies"""
     def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
         if self.layout_type in {'DEFAULT', 'COMPACT'}:
             row = layout.row(align=True)
             row.prop(item, "name", text="", emboss=False, icon='MESH_DATA')
-            row.prop(item, "mesh_object", text="", icon='OBJECT_DATA')
+            row.label(text=item.bodygroup)
+            if item.blank:
+                row.label(text="blank", icon='GHOST_DISABLED')
+            else:
+                row.prop(item, "mesh_object", text="", icon='OBJECT_DATA')
         elif self.layout_type in {'GRID'}:
             layout.alignment = 'CENTER'
             layout.label(text="", icon='MESH_DATA')
@@ -465,6 +756,18 @@ class COMPILATION_UL_LODList(bpy.types.UIList):
             layout.label(text="", icon='MOD_DECIM')
 
 
+class COMPILATION_UL_TargetList(bpy.types.UIList):
+    """Liste UI pour les cibles de compile"""
+    def draw_item(self, context, layout, data, item, icon, active_data, active_propname):
+        if self.layout_type in {'DEFAULT', 'COMPACT'}:
+            row = layout.row(align=True)
+            row.prop(item, "enabled", text="")
+            row.prop(item, "name", text="", emboss=False, icon='CONSOLE')
+        elif self.layout_type in {'GRID'}:
+            layout.alignment = 'CENTER'
+            layout.label(text="", icon='CONSOLE')
+
+
 class COMPILATION_OT_AddBody(bpy.types.Operator):
     """Ajouter un nouveau body"""
     bl_idname = "lw_pannel.add_body"
@@ -546,68 +849,256 @@ class COMPILATION_OT_RemoveLOD(bpy.types.Operator):
         return {'FINISHED'}
 
 
-class COMPILATION_OT_CompileModel(bpy.types.Operator):
-    """Compiler le modèle"""
-    bl_idname = "lw_pannel.compile_model"
-    bl_label = "Compile Model"
-    bl_description = "Compile model to Source Engine MDL format"
+class COMPILATION_OT_AddTarget(bpy.types.Operator):
+    """Ajouter une cible de compile"""
+    bl_idname = "lw_pannel.add_target"
+    bl_label = "Add Target"
+    bl_description = "Add a compile target, initialised with the current studiomdl and gameinfo paths"
+    
+    def execute(self, context):
+        props = context.scene.compilation_props
+        target = context.scene.compile_target_list.add()
+        target.name = f"Target_{len(context.scene.compile_target_list)}"
+        target.studiomdl_path = props.studiomdl_path
+        target.gameinfo_path = props.gameinfo_path
+        context.scene.compile_target_list_index = len(context.scene.compile_target_list) - 1
+        return {'FINISHED'}
+
+
+class COMPILATION_OT_RemoveTarget(bpy.types.Operator):
+    """Supprimer une cible de compile"""
+    bl_idname = "lw_pannel.remove_target"
+    bl_label = "Remove Target"
+    bl_description = "Remove selected compile target"
+    
+    def execute(self, context):
+        scene = context.scene
+        if len(scene.compile_target_list) > 0:
+            scene.compile_target_list.remove(scene.compile_target_list_index)
+            scene.compile_target_list_index = min(max(0, scene.compile_target_list_index - 1), len(scene.compile_target_list) - 1)
+        return {'FINISHED'}
+
+
+class COMPILATION_OT_CancelCompile(bpy.types.Operator):
+    """Annuler la compilation en cours"""
+    bl_idname = "lw_pannel.cancel_compile"
+    bl_label = "Cancel Compile"
+    bl_description = "Stop the running studiomdl process"
+    
+    @classmethod
+    def poll(cls, context):
+        return compile_log.running or export_progress.running
+    
+    def execute(self, context):
+        compile_log.cancel_requested = True
+        return {'FINISHED'}
+
+
+class COMPILATION_OT_ToggleWatch(bpy.types.Operator):
+    """Démarrer ou arrêter le mode watch"""
+    bl_idname = "lw_pannel.toggle_watch"
+    bl_label = "Watch Mode"
+    bl_description = "Recompile in the background when a body, LOD or collision mesh changes, re-exporting only the changed meshes"
+    
+    def execute(self, context):
+        if watch_state.active:
+            stop_watch()
+            self.report({'INFO'}, "Watch mode stopped")
+        else:
+            start_watch(context.scene)
+            self.report({'INFO'}, f"Watching '{context.scene.name}'")
+        tag_compilation_redraw(context)
+        return {'FINISHED'}
+
+
+class COMPILATION_OT_SelectErrorObjects(bpy.types.Operator):
+    """Sélectionner les objets cités par les erreurs de studiomdl"""
+    bl_idname = "lw_pannel.select_error_objects"
+    bl_label = "Select Error Objects"
+    bl_description = "Select the objects whose exported files caused the studiomdl errors"
+    bl_options = {'REGISTER', 'UNDO'}
+    
+    @classmethod
+    def poll(cls, context):
+        return bool(studiomdl_output.error_objects()) and context.mode == 'OBJECT'
+    
+    def execute(self, context):
+        objects = [context.scene.objects.get(name) for name in studiomdl_output.error_objects()]
+        objects = [obj for obj in objects if obj is not None]
+        if not objects:
+            self.report({'WARNING'}, "The objects cited by the errors are not in this scene")
+            return {'CANCELLED'}
+        
+        bpy.ops.object.select_all(action='DESELECT')
+        for obj in objects:
+            obj.select_set(True)
+        context.view_layer.objects.active = objects[0]
+        self.report({'INFO'}, f"Selected {len(objects)} object(s)")
+        return {'FINISHED'}
+
+
+class COMPILATION_OT_PreflightCheck(bpy.types.Operator):
+    """Vérifier le compile sans rien exporter"""
+    bl_idname = "lw_pannel.preflight_check"
+    bl_label = "Check"
+    bl_description = "Check bodies, materials, LODs, collision, QC names and $cdmaterials without exporting anything"
     
     def execute(self, context):
+        game_dir = os.path.dirname(context.scene.compilation_props.gameinfo_path) if validate_compilation_config(context) else None
+        problems = run_preflight(context.scene, context.evaluated_depsgraph_get(), game_dir)
+        for problem in problems:
+            self.report({problem.severity}, str(problem))
+        if not problems:
+            self.report({'INFO'}, "Pre-flight check passed")
+        tag_compilation_redraw(context)
+        return {'FINISHED'}
+
+
+class CompilePipeline:
+    """Étapes de compilation partagées (QC, export SMD, staging, studiomdl)
+
+    Classe mixin : l'hôte (opérateur ou runner headless) fournit report().
+    """
+    cache_summary = ""
+    compile_plan = None
+    # Mode watch : pointeurs des objets modifiés ; None exporte tout le plan
+    changed_sources = None
+    artifact_key = None
+    profiler = None
+    report_dir = ""
+    # Fichiers de mesh réutilisés (cache d'export, mode watch) et artefacts restaurés au dernier compile
+    reused_files = 0
+    artifacts_restored = False
+    
+    def check_compile_config(self, context, require_paths=True):
+        """Vérifie la configuration avant toute étape coûteuse
+
+        require_paths=False laisse de côté le couple studiomdl/gameinfo
+        principal (les cibles de compile ont leurs propres chemins).
+        """
         scene = context.scene
         props = scene.compilation_props
         
         # Validation
-        if not validate_compilation_config(context):
+        if require_paths and not validate_compilation_config(context):
             self.report({'ERROR'}, "Please configure studiomdl.exe and gameinfo.txt paths")
-            return {'CANCELLED'}
+            return False
         
         if not props.modelname:
             self.report({'ERROR'}, "Please define a $modelname")
-            return {'CANCELLED'}
+            return False
         
         if len(scene.body_list) == 0:
             self.report({'ERROR'}, "Please add at least one body")
-            return {'CANCELLED'}
+            return False
         
-        # Vérifier que tous les bodies ont un mesh valide
+        if not any(not body.blank for body in scene.body_list):
+            self.report({'ERROR'}, "Please add at least one non-blank body")
+            return False
+        
+        # Vérifier que tous les bodies (hors entrées blank) ont un mesh valide
         for body in scene.body_list:
-            if not body.mesh_object or body.mesh_object.type != 'MESH':
+            if body.blank:
+                continue
+            if not body.mesh_object or not (body.mesh_object.type == 'MESH' or is_collection_instancer(body.mesh_object)):
                 self.report({'ERROR'}, f"Body '{body.name}' has no valid mesh")
-                return {'CANCELLED'}
+                return False
+        
+        # Pré-vérification du plan complet (comptes en bloc, aucune écriture) avant l'export
+        game_dir = os.path.dirname(props.gameinfo_path) if require_paths else None
+        problems = run_preflight(scene, context.evaluated_depsgraph_get(), game_dir)
+        for problem in problems:
+            self.report({problem.severity}, str(problem))
+        return not any(problem.severity == 'ERROR' for problem in problems)
+    
+    def prepare_compile(self, context, sandbox_dir=None):
+        """Génère le QC, exporte les SMD et les place dans le répertoire du jeu
+
+        Avec sandbox_dir, QC et SMD sont écrits dans ce répertoire isolé et
+        studiomdl y lit directement ses entrées. Retourne (répertoire du jeu,
+        chemin du QC à compiler).
+        """
+        with watch_state.suspend():
+            return run_to_end(self.iter_prepare_compile(context, sandbox_dir))
+    
+    def iter_prepare_compile(self, context, sandbox_dir=None):
+        """prepare_compile découpé en étapes (générateur)
+
+        Rend la main après chaque bloc de triangles écrit ; l'avancement est
+        suivi dans export_progress. Fermé avant la fin, les fichiers en cours
+        d'écriture sont supprimés (écriture atomique). Retourne (répertoire
+        du jeu, chemin du QC à compiler).
+        """
+        scene = context.scene
+        props = scene.compilation_props
         
         # Récupérer les chemins
         game_dir = os.path.dirname(props.gameinfo_path)
         
-        # Utiliser le chemin personnalisé pour SMD ou le répertoire temp
-        if props.smd_output_path and os.path.exists(props.smd_output_path):
+        # Sandbox, écriture directe dans le jeu, chemin personnalisé pour SMD ou répertoire temp
+        if sandbox_dir:
+            temp_path = sandbox_dir
+        elif props.staging_mode == 'DIRECT':
+            temp_path = game_dir
+        elif props.smd_output_path and os.path.exists(props.smd_output_path):
             temp_path = props.smd_output_path
         else:
             temp_path = bpy.app.tempdir
         
+        os.makedirs(temp_path, exist_ok=True)
         qc_path = os.path.join(temp_path, "model_compile.qc")
         
+        print(f"[COMPILATION] Starting compilation...")
+        
+        self.cache_summary = ""
+        self.reused_files = 0
+        self.artifacts_restored = False
+        self.profiler = CompileProfiler(props.profile_memory, props.profile_cprofile)
+        self.report_dir = temp_path
+        
+        # Plan d'export unique : chaque objet n'est évalué et écrit qu'une fois
+        plan = build_export_plan(scene)
+        self.compile_plan = plan
+        
+        export_progress.start()
         try:
-            print(f"[COMPILATION] Starting compilation...")
+            # Les meshes sont écrits avant le QC : un body découpé y ajoute ses parts
+            with self.profiler.stage("export_meshes") as stage:
+                yield from self.iter_export_meshes(context, temp_path, plan, stage)
+            if plan.sequence_jobs:
+                export_progress.stage = "Sequences"
+                yield
+                with self.profiler.stage("export_sequences"):
+                    self.export_sequences(context, temp_path, plan)
+            if plan.flex_jobs:
+                export_progress.stage = "Flexes"
+                yield
+                with self.profiler.stage("export_flexes") as stage:
+                    self.export_flexes(context, temp_path, plan, stage)
+            export_progress.stage = "QC"
+            yield
+            with self.profiler.stage("generate_qc") as stage:
+                self.generate_qc(context, qc_path, plan)
+                stage.bytes = os.path.getsize(qc_path)
+            if sandbox_dir:
+                return game_dir, qc_path
             
-            self.generate_qc(context, qc_path)
-            self.export_meshes(context, temp_path)
-            self.copy_files_to_game_dir(context, temp_path, game_dir)
-            self.run_studiomdl(context, game_dir)
+            if os.path.normcase(os.path.abspath(temp_path)) != os.path.normcase(os.path.abspath(game_dir)):
+                export_progress.stage = "Staging"
+                yield
+                with self.profiler.stage("copy_files_to_game_dir") as stage:
+                    stage.bytes = self.copy_files_to_game_dir(context, temp_path, game_dir, plan)
             
-            self.report({'INFO'}, "Compilation successful!")
-            return {'FINISHED'}
-        except Exception as e:
-            self.report({'ERROR'}, f"Compilation failed: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return {'CANCELLED'}
+            return game_dir, os.path.join(game_dir, "model_compile.qc")
+        finally:
+            export_progress.finish()
     
-    def generate_qc(self, context, qc_path):
+    def generate_qc(self, context, qc_path, plan):
         """Génère le fichier QC"""
         scene = context.scene
         props = scene.compilation_props
         
-        with open(qc_path, "w") as f:
+        with atomic_write(qc_path) as f:
             # Ordre correct : modelname, cdmaterials, body, lod, shadowlod, options, sequences, collision
             f.write(f'$modelname "{props.modelname}"\n')
             
@@ -617,25 +1108,31 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
             
             f.write('\n')
             
-            # $body ou $bodygroup
-            if len(scene.body_list) == 1:
-                body = scene.body_list[0]
+            # $body pour un body unique, sinon un $bodygroup par nom de bodygroup
+            body = single_body(scene)
+            if body is not None:
                 if body.mesh_object:
-                    if isinstance(body.mesh_object, bpy.types.Collection):
-                        body_filename = f"{body.mesh_object.name}.smd"
+                    body_job = plan.get(body.mesh_object)
+                    flex_job = plan.get_flex(body.mesh_object)
+                    if flex_job:
+                        write_flex_model(f, body.name, body_job.filename, flex_job.filename, flex_job.names)
                     else:
-                        body_filename = f"{body.mesh_object.name}.smd"
-                    f.write(f'$body "{body.name}" "{body_filename}"\n\n')
+                        # Un body découpé donne un $body par part
+                        for index, body_filename in enumerate(body_job.filenames):
+                            part_name = body.name if index == 0 else f"{body.name}_part{index + 1}"
+                            f.write(f'$body "{part_name}" "{body_filename}"\n')
+                        f.write('\n')
             else:
-                f.write('$bodygroup "Body"\n{\n')
-                for body in scene.body_list:
-                    if body.mesh_object:
-                        if isinstance(body.mesh_object, bpy.types.Collection):
-                            body_filename = f"{body.mesh_object.name}.smd"
-                        else:
-                            body_filename = f"{body.mesh_object.name}.smd"
-                        f.write(f'\tstudio "{body_filename}"\n')
-                f.write('}\n\n')
+                # Un submodel utilisé dans plusieurs bodygroups n'a qu'un fichier, référencé par son nom
+                for group_name, bodies in body_groups(scene):
+                    f.write(f'$bodygroup "{group_name}"\n{{\n')
+                    for body in bodies:
+                        if body.blank:
+                            f.write('\tblank\n')
+                        elif body.mesh_object:
+                            body_filename = plan.get(body.mesh_object).filename
+                            f.write(f'\tstudio "{body_filename}"\n')
+                    f.write('}\n\n')
             
             # LOD Levels (seulement si valides : from ET to définis)
             lods_written = False
@@ -644,7 +1141,10 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
                     if lod.replace_model_from_obj and lod.replace_model_to_obj:
                         f.write(f'$lod {lod.lod_level}\n')
                         f.write('{\n')
-                        f.write(f'\treplacemodel "{lod.replace_model_from_obj.name}" "{lod.replace_model_to_obj.name}"\n')
+                        # from : nom du modèle déclaré par le body ; to : fichier chargé (extension gardée en DMX)
+                        from_name = plan.get(lod.replace_model_from_obj).model_name
+                        to_name = plan.qc_reference(plan.get(lod.replace_model_to_obj))
+                        f.write(f'\treplacemodel "{from_name}" "{to_name}"\n')
                         
                         if lod.enable_replace_material and lod.replace_material_from and lod.replace_material_to:
                             f.write(f'\treplacematerial "{lod.replace_material_from}" "{lod.replace_material_to}"\n')
@@ -656,7 +1156,9 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
             if props.enable_shadowlod and props.shadowlod_replace_from_obj and props.shadowlod_replace_to_obj:
                 f.write('$shadowlod\n')
                 f.write('{\n')
-                f.write(f'\treplacemodel "{props.shadowlod_replace_from_obj.name}" "{props.shadowlod_replace_to_obj.name}"\n')
+                from_name = plan.get(props.shadowlod_replace_from_obj).model_name
+                to_name = plan.qc_reference(plan.get(props.shadowlod_replace_to_obj))
+                f.write(f'\treplacemodel "{from_name}" "{to_name}"\n')
                 f.write('}\n\n')
             
             # Options
@@ -691,19 +1193,19 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
             
             # Générer les séquences
             if len(scene.sequence_list) > 0:
-                first_body = scene.body_list[0]
+                first_body = reference_body(scene)
                 if first_body.mesh_object:
-                    if isinstance(first_body.mesh_object, bpy.types.Collection):
-                        first_body_filename = f"{first_body.mesh_object.name}.smd"
-                    else:
-                        first_body_filename = f"{first_body.mesh_object.name}.smd"
+                    first_body_filename = plan.get(first_body.mesh_object).filename
                 else:
                     first_body_filename = f"{first_body.name}_ref.smd"
                 
                 for seq in scene.sequence_list:
                     if seq.enabled:
+                        # Chaque séquence avec une source référence son propre SMD d'animation
+                        sequence_job = plan.get_sequence(seq)
+                        sequence_filename = sequence_job.filename if sequence_job else first_body_filename
                         f.write(f'$sequence "{seq.name}" {{\n')
-                        f.write(f'\t"{first_body_filename}"\n')
+                        f.write(f'\t"{sequence_filename}"\n')
                         
                         # Activity
                         if seq.enable_activity and seq.activity:
@@ -724,12 +1226,9 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
                         f.write('}\n\n')
             else:
                 # Séquence par défaut si aucune séquence n'est définie
-                first_body = scene.body_list[0]
+                first_body = reference_body(scene)
                 if first_body.mesh_object:
-                    if isinstance(first_body.mesh_object, bpy.types.Collection):
-                        first_body_filename = f"{first_body.mesh_object.name}.smd"
-                    else:
-                        first_body_filename = f"{first_body.mesh_object.name}.smd"
+                    first_body_filename = plan.get(first_body.mesh_object).filename
                 else:
                     first_body_filename = f"{first_body.name}_ref.smd"
                 
@@ -740,7 +1239,7 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
             
             # Collision
             if props.collision_mesh and props.collision_mesh.type == 'MESH':
-                collision_filename = props.collision_mesh.name
+                collision_filename = plan.qc_reference(plan.get(props.collision_mesh, True))
                 if props.collision_type == 'MODEL':
                     # Collision Model
                     f.write(f'$collisionmodel    "{collision_filename}"\n')
@@ -768,107 +1267,252 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
                         f.write(f'\t$rotdamping {props.collision_joints_rotdamping:.2f}\n')
                     f.write('}\n')
     
-    def export_meshes(self, context, temp_path):
-        """Exporte tous les meshes en SMD"""
+    def export_meshes(self, context, temp_path, plan, stage=None):
+        """Exporte tous les meshes du plan d'export en SMD"""
+        run_to_end(self.iter_export_meshes(context, temp_path, plan, stage))
+    
+    def job_estimate(self, job, depsgraph):
+        """(objets, triangles) qu'un job va écrire, lus sur les meshes évalués sans extraction"""
+        if job.is_instancer:
+            return instance_count(job.source, depsgraph), estimate_instances(job.source, depsgraph)[1]
+        return len(job.objects), estimate_objects(job.objects, depsgraph)[1]
+    
+    def iter_export_meshes(self, context, temp_path, plan, stage=None):
+        """export_meshes découpé en blocs de triangles (générateur)"""
         scene = context.scene
         os.makedirs(temp_path, exist_ok=True)
         
-        # Exporter les bodies
-        for body in scene.body_list:
-            # Déterminer le nom du fichier SMD à partir du nom exact de l'objet Blender
-            if body.mesh_object:
-                if isinstance(body.mesh_object, bpy.types.Collection):
-                    # Si c'est une Collection, utiliser son nom
-                    smd_filename = f"{body.mesh_object.name}.smd"
-                    smd_path = os.path.join(temp_path, smd_filename)
-                    self.export_collection_to_smd(body.mesh_object, smd_path, False)
-                elif body.mesh_object.type == 'MESH':
-                    # Si c'est un objet mesh, utiliser son nom
-                    smd_filename = f"{body.mesh_object.name}.smd"
-                    smd_path = os.path.join(temp_path, smd_filename)
-                    self.export_mesh_to_smd(body.mesh_object, smd_path, False)
-        
-        # Exporter les modèles LOD
-        for lod in scene.lod_list:
-            if lod.replace_model_from_obj:
-                smd_path = os.path.join(temp_path, f"{lod.replace_model_from_obj.name}.smd")
-                self.export_mesh_to_smd(lod.replace_model_from_obj, smd_path, False)
-            
-            if lod.replace_model_to_obj:
-                smd_path = os.path.join(temp_path, f"{lod.replace_model_to_obj.name}.smd")
-                self.export_mesh_to_smd(lod.replace_model_to_obj, smd_path, False)
-        
-        # Exporter les modèles shadowlod
-        if scene.compilation_props.shadowlod_replace_from_obj:
-            smd_path = os.path.join(temp_path, f"{scene.compilation_props.shadowlod_replace_from_obj.name}.smd")
-            self.export_mesh_to_smd(scene.compilation_props.shadowlod_replace_from_obj, smd_path, False)
-        
-        if scene.compilation_props.shadowlod_replace_to_obj:
-            smd_path = os.path.join(temp_path, f"{scene.compilation_props.shadowlod_replace_to_obj.name}.smd")
-            self.export_mesh_to_smd(scene.compilation_props.shadowlod_replace_to_obj, smd_path, False)
-        
-        # Exporter la collision mesh
-        if scene.compilation_props.collision_mesh:
-            smd_path = os.path.join(temp_path, f"{scene.compilation_props.collision_mesh.name}.smd")
-            self.export_mesh_to_smd(scene.compilation_props.collision_mesh, smd_path, True)
-    
-    def copy_files_to_game_dir(self, context, temp_path, game_dir):
-        """Copie les fichiers SMD et QC vers le répertoire du jeu"""
-        scene = context.scene
+        # Un seul depsgraph évalué pour tout l'export (en mode objet)
+        current_mode = bpy.context.object.mode if bpy.context.object else 'OBJECT'
+        if bpy.context.mode != 'OBJECT':
+            bpy.ops.object.mode_set(mode='OBJECT')
+        depsgraph = context.evaluated_depsgraph_get()
         
-        # Copier les bodies
-        for body in scene.body_list:
-            if body.mesh_object:
-                if isinstance(body.mesh_object, bpy.types.Collection):
-                    body_filename = f"{body.mesh_object.name}.smd"
-                else:
-                    body_filename = f"{body.mesh_object.name}.smd"
-                src = os.path.join(temp_path, body_filename)
-                dst = os.path.join(game_dir, body_filename)
-                if os.path.exists(src):
-                    shutil.copy2(src, dst)
-        
-        # Copier les modèles LOD
-        for lod in scene.lod_list:
-            if lod.replace_model_from_obj:
-                src = os.path.join(temp_path, f"{lod.replace_model_from_obj.name}.smd")
-                dst = os.path.join(game_dir, f"{lod.replace_model_from_obj.name}.smd")
-                if os.path.exists(src):
-                    shutil.copy2(src, dst)
+        # Cache d'export : les SMD dont l'empreinte n'a pas changé sont réutilisés
+        cache = SMDExportCache(temp_path) if scene.compilation_props.use_export_cache else None
+        
+        # Formatage multi-processus optionnel pour les gros meshes
+        workers = scene.compilation_props.export_workers
+        formatter = ParallelFormatter(workers) if workers > 1 else None
+        
+        props = scene.compilation_props
+        limits = None
+        if props.auto_split:
+            limits = SplitLimits(props.split_max_vertices, props.split_max_triangles, props.split_max_materials)
+        
+        try:
+            # Totaux estimés pour la barre de progression
+            estimates = [self.job_estimate(job, depsgraph) for job in plan.jobs]
+            for objects, triangles in estimates:
+                export_progress.add_totals(objects, triangles)
             
-            if lod.replace_model_to_obj:
-                src = os.path.join(temp_path, f"{lod.replace_model_to_obj.name}.smd")
-                dst = os.path.join(game_dir, f"{lod.replace_model_to_obj.name}.smd")
-                if os.path.exists(src):
-                    shutil.copy2(src, dst)
-        
-        # Copier les modèles shadowlod
-        if scene.compilation_props.shadowlod_replace_from_obj:
-            src = os.path.join(temp_path, f"{scene.compilation_props.shadowlod_replace_from_obj.name}.smd")
-            dst = os.path.join(game_dir, f"{scene.compilation_props.shadowlod_replace_from_obj.name}.smd")
-            if os.path.exists(src):
-                shutil.copy2(src, dst)
+            # Chaque job du plan correspond à un seul fichier, quel que soit le nombre de rôles
+            for job, (objects, triangles) in zip(plan.jobs, estimates):
+                mesh_objects = job.objects
+                if not mesh_objects:
+                    raise Exception(f"No mesh objects found in '{job.source.name}'")
+                
+                export_progress.begin_job(objects, triangles)
+                export_progress.stage = job.filename
+                smd_path = os.path.join(temp_path, job.filename)
+                if self.reuse_unchanged_job(job, smd_path, plan, stage):
+                    self.reused_files += 1
+                else:
+                    split = limits is not None and job.is_body and not job.is_collision
+                    instancer = job.source if job.is_instancer else None
+                    fingerprint = None
+                    if cache is not None:
+                        fingerprint = fingerprint_objects(mesh_objects, depsgraph, job.is_collision, instancer)
+                        if split:
+                            # Un fichier n'est valable que pour les limites avec lesquelles il a été découpé (ou non)
+                            fingerprint = f"{fingerprint}:split={limits.key}"
+                    if not (split and (yield from self.iter_export_split_body(context, job, temp_path, depsgraph, plan, limits, cache, fingerprint, formatter, stage))):
+                        yield from self.iter_export_objects(mesh_objects, smd_path, job.is_collision, depsgraph, cache, formatter, stage, instancer, fingerprint)
+                    watch_state.part_counts[job.filename] = len(job.part_filenames)
+                export_progress.end_job()
+                yield
+        finally:
+            if formatter is not None:
+                formatter.close()
+            if current_mode != 'OBJECT' and bpy.context.object:
+                bpy.ops.object.mode_set(mode=current_mode)
         
-        if scene.compilation_props.shadowlod_replace_to_obj:
-            src = os.path.join(temp_path, f"{scene.compilation_props.shadowlod_replace_to_obj.name}.smd")
-            dst = os.path.join(game_dir, f"{scene.compilation_props.shadowlod_replace_to_obj.name}.smd")
-            if os.path.exists(src):
-                shutil.copy2(src, dst)
+        if cache is not None:
+            cache.save()
+            self.reused_files += cache.hits
+            self.cache_summary = cache.summary()
+            print(f"[CACHE] {self.cache_summary}")
+    
+    def reuse_unchanged_job(self, job, path, plan, stage=None):
+        """Mode watch : garde le fichier d'un job dont aucun objet n'a changé depuis son dernier export"""
+        if self.changed_sources is None or job.filename not in watch_state.part_counts or not os.path.exists(path):
+            return False
+        
+        pointers = {job.source.as_pointer()} | {obj.as_pointer() for obj in job.objects}
+        if pointers & self.changed_sources:
+            return False
+        
+        # Un body découpé retrouve ses parts (mêmes noms, réservés dans le même ordre)
+        for _ in range(watch_state.part_counts[job.filename]):
+            plan.add_part(job)
+        if job.part_filenames:
+            plan.remove_flex(job)
+        
+        if stage is not None:
+            for obj in job.objects:
+                stage.add_object(obj.name, 0, 0, 0.0, 0.0, cached=True)
+        print(f"[WATCH] Keeping {job.filename}")
+        return True
+    
+    def iter_export_split_body(self, context, job, temp_path, depsgraph, plan, limits, cache=None, fingerprint=None, formatter=None, stage=None):
+        """Écrit un body qui dépasse les limites de studiomdl en plusieurs parts
+
+        Générateur ; retourne False si le body tient dans un modèle (test
+        rapide, cache d'export ou découpe exacte en une seule part) : il
+        suit alors l'export normal. Les parts sont enregistrées dans le
+        cache d'export avec l'empreinte du body et réutilisées ensemble.
+        """
+        path = os.path.join(temp_path, job.filename)
+        if cache is not None and cache.is_fresh(path, fingerprint):
+            part_filenames = cache.parts(path)
+            if not part_filenames:
+                return False
+            if all(cache.is_fresh(os.path.join(temp_path, filename), fingerprint) for filename in part_filenames):
+                self.check_split_body(context, job, len(part_filenames) + 1)
+                # Mêmes noms, réservés dans le même ordre qu'au découpage
+                for _ in part_filenames:
+                    plan.add_part(job)
+                if plan.remove_flex(job):
+                    print(f"[SPLIT] Flexes of '{job.source.name}' skipped: a split body cannot carry a flexfile")
+                cache.hits += 1
+                print(f"[CACHE] Reusing {job.filename} and {len(part_filenames)} part(s)")
+                if stage is not None:
+                    for obj in job.objects:
+                        stage.add_object(obj.name, 0, 0, 0.0, 0.0, cached=True)
+                return True
+        
+        split = split_body_if_needed(job, depsgraph, limits)
+        if split is None:
+            return False
+        
+        parts, skeleton = split
+        self.check_split_body(context, job, len(parts))
+        if plan.remove_flex(job):
+            print(f"[SPLIT] Flexes of '{job.source.name}' skipped: a split body cannot carry a flexfile")
+        if cache is not None:
+            cache.misses += 1
         
-        # Copier la collision
-        if scene.compilation_props.collision_mesh:
-            src = os.path.join(temp_path, f"{scene.compilation_props.collision_mesh.name}.smd")
-            dst = os.path.join(game_dir, f"{scene.compilation_props.collision_mesh.name}.smd")
+        on_object = stage.add_object if stage is not None else None
+        filenames = []
+        for index, part in enumerate(parts):
+            filename = job.filename if index == 0 else plan.add_part(job)
+            filenames.append(filename)
+            for objects, triangles in iter_split_part(os.path.join(temp_path, filename), part, skeleton, formatter, on_object):
+                export_progress.advance(objects, triangles)
+                yield
+            print(f"[SPLIT] {filename}: {limits.describe(part.vertices, part.triangles, len(part.materials))}")
+        
+        if cache is not None:
+            for filename in filenames[1:]:
+                cache.store(os.path.join(temp_path, filename), fingerprint)
+            cache.store(path, fingerprint, filenames[1:])
+        return True
+    
+    def check_split_body(self, context, job, part_count):
+        """Le découpage automatique ne s'applique qu'à un $body unique"""
+        if single_body(context.scene) is None:
+            raise Exception(
+                f"Body '{job.source.name}' exceeds the studiomdl limits ({part_count} parts needed); "
+                f"automatic splitting only applies to a single $body"
+            )
+    
+    def export_sequences(self, context, temp_path, plan):
+        """Exporte le SMD d'animation de chaque séquence du plan"""
+        workers = context.scene.compilation_props.export_workers
+        formatter = ParallelFormatter(workers) if workers > 1 and len(plan.sequence_jobs) > 1 else None
+        try:
+            frame_count = export_sequence_smds(context.scene, plan.sequence_jobs, temp_path, formatter)
+        finally:
+            if formatter is not None:
+                formatter.close()
+        print(f"[SEQUENCES] {len(plan.sequence_jobs)} animation(s), {frame_count} frame(s)")
+    
+    def export_flexes(self, context, temp_path, plan, stage=None):
+        """Écrit le VTA des shape keys de chaque body qui en a"""
+        tolerance = context.scene.compilation_props.flex_tolerance
+        depsgraph = context.evaluated_depsgraph_get()
+        for job in plan.flex_jobs:
+            path = os.path.join(temp_path, job.filename)
+            if self.changed_sources is not None and job.body_job.source.as_pointer() not in self.changed_sources and os.path.exists(path):
+                continue
+            vertices = write_vta(path, job.objects, job.names, depsgraph, tolerance)
+            if stage is not None:
+                stage.bytes += os.path.getsize(path)
+            print(f"[FLEX] {job.filename}: {len(job.names)} flex(es), {vertices} moved vertex line(s)")
+    
+    def copy_files_to_game_dir(self, context, temp_path, game_dir, plan):
+        """Copie vers le répertoire du jeu les fichiers SMD et QC dont le contenu a changé"""
+        copied = 0
+        copied_bytes = 0
+        unchanged = 0
+        for filename in plan.filenames() + ["model_compile.qc"]:
+            src = os.path.join(temp_path, filename)
+            dst = os.path.join(game_dir, filename)
             if os.path.exists(src):
-                shutil.copy2(src, dst)
+                if sync_file(src, dst):
+                    copied += 1
+                    copied_bytes += os.path.getsize(dst)
+                else:
+                    unchanged += 1
         
-        # Copier le QC
-        src = os.path.join(temp_path, "model_compile.qc")
-        dst = os.path.join(game_dir, "model_compile.qc")
-        if os.path.exists(src):
-            shutil.copy2(src, dst)
+        print(f"[STAGING] {copied} file(s) copied, {unchanged} unchanged")
+        return copied_bytes
     
-    def export_collection_to_smd(self, collection, path, is_collision_smd):
+    def export_objects_to_smd(self, objects, path, is_collision_smd, depsgraph, cache=None, formatter=None, stage=None, instancer=None):
+        """Exporte des objets en SMD, en réutilisant le fichier existant si son empreinte n'a pas changé
+
+        Avec un instancer de collection, ses instances sont écrites à la place :
+        chaque mesh unique n'est évalué qu'une fois, puis placé par instance.
+        """
+        run_to_end(self.iter_export_objects(objects, path, is_collision_smd, depsgraph, cache, formatter, stage, instancer))
+    
+    def iter_export_objects(self, objects, path, is_collision_smd, depsgraph, cache=None, formatter=None, stage=None, instancer=None, fingerprint=None):
+        """export_objects_to_smd découpé en blocs de triangles (générateur)
+
+        fingerprint : empreinte déjà calculée par l'appelant, sinon calculée ici.
+        """
+        if cache is not None:
+            if fingerprint is None:
+                fingerprint = fingerprint_objects(objects, depsgraph, is_collision_smd, instancer)
+            if cache.is_fresh(path, fingerprint):
+                cache.hits += 1
+                print(f"[CACHE] Reusing {os.path.basename(path)}")
+                if stage is not None:
+                    for obj in objects:
+                        stage.add_object(obj.name, 0, 0, 0.0, 0.0, cached=True)
+                return
+            cache.misses += 1
+        
+        on_object = stage.add_object if stage is not None else None
+        if instancer is not None:
+            instanced = InstancedMeshes(instancer, depsgraph, is_collision_smd)
+            print(f"[INSTANCES] {instancer.name}: {len(instanced.instances)} instance(s) of {len(instanced.meshes)} unique mesh(es)")
+            if path.endswith(DMX_EXTENSION):
+                writer = iter_instances_to_dmx(path, instanced, on_object=on_object)
+            else:
+                writer = iter_instances_to_smd(path, instanced, formatter=formatter, on_object=on_object)
+        elif path.endswith(DMX_EXTENSION):
+            writer = iter_objects_to_dmx(path, objects, depsgraph, is_collision_smd, on_object=on_object)
+        else:
+            writer = iter_objects_to_smd(path, objects, depsgraph, is_collision_smd, formatter=formatter, on_object=on_object)
+        for written_objects, triangles in writer:
+            export_progress.advance(written_objects, triangles)
+            yield
+        
+        if cache is not None:
+            cache.store(path, fingerprint)
+    
+    def export_collection_to_smd(self, collection, path, is_collision_smd, depsgraph=None, cache=None):
         """Exporte tous les meshes d'une collection en SMD"""
         # Récupérer tous les objets mesh de la collection
         mesh_objects = [obj for obj in collection.all_objects if obj.type == 'MESH']
@@ -880,151 +1524,121 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
         if bpy.context.mode != 'OBJECT':
             bpy.ops.object.mode_set(mode='OBJECT')
         
-        # Écrire l'en-tête du SMD
-        with open(path, "w") as f:
-            f.write("version 1\nnodes\n0 \"root\" -1\nend\nskeleton\ntime 0\n0 0 0 0 0 0 0\nend\ntriangles\n")
-            
-            sb = StringIO()
-            
-            # Exporter chaque mesh
-            for obj in mesh_objects:
-                depsgraph = bpy.context.evaluated_depsgraph_get()
-                object_eval = obj.evaluated_get(depsgraph)
-                mesh = object_eval.to_mesh()
-                mesh.calc_loop_triangles()
-                mesh.transform(obj.matrix_world)
-                
-                has_materials = len(obj.material_slots) > 0
-                
-                if is_collision_smd:
-                    self.export_mesh_smd_collision(sb, mesh)
-                else:
-                    if has_materials:
-                        self.export_mesh_smd_with_materials(sb, obj, mesh)
-                    else:
-                        self.export_mesh_smd_no_materials(sb, mesh)
-            
-            f.write(sb.getvalue())
-            f.write("end\n")
+        if depsgraph is None:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
+        
+        # Écriture en flux : un seul depsgraph, chaque mesh évalué est libéré après écriture
+        self.export_objects_to_smd(mesh_objects, path, is_collision_smd, depsgraph, cache)
         
         if current_mode != 'OBJECT' and bpy.context.object:
             bpy.ops.object.mode_set(mode=current_mode)
     
-    def export_mesh_to_smd(self, obj, path, is_collision_smd):
+    def export_mesh_to_smd(self, obj, path, is_collision_smd, depsgraph=None, cache=None):
         """Exporte un mesh en SMD - adapté de SanjiMDL"""
         current_mode = bpy.context.object.mode if bpy.context.object else 'OBJECT'
         if bpy.context.mode != 'OBJECT':
             bpy.ops.object.mode_set(mode='OBJECT')
         
-        depsgraph = bpy.context.evaluated_depsgraph_get()
-        object_eval = obj.evaluated_get(depsgraph)
-        mesh = object_eval.to_mesh()
-        mesh.calc_loop_triangles()
-        mesh.transform(obj.matrix_world)
+        if depsgraph is None:
+            depsgraph = bpy.context.evaluated_depsgraph_get()
         
-        with open(path, "w") as f:
-            f.write("version 1\nnodes\n0 \"root\" -1\nend\nskeleton\ntime 0\n0 0 0 0 0 0 0\nend\ntriangles\n")
-            
-            sb = StringIO()
-            has_materials = len(obj.material_slots) > 0
-            
-            if is_collision_smd:
-                self.export_mesh_smd_collision(sb, mesh)
-            else:
-                if has_materials:
-                    self.export_mesh_smd_with_materials(sb, obj, mesh)
-                else:
-                    self.export_mesh_smd_no_materials(sb, mesh)
-            
-            f.write(sb.getvalue())
-            f.write("end\n")
+        self.export_objects_to_smd([obj], path, is_collision_smd, depsgraph, cache)
         
         if current_mode != 'OBJECT' and bpy.context.object:
             bpy.ops.object.mode_set(mode=current_mode)
     
-    def export_mesh_smd_collision(self, sb, mesh):
-        """Export collision mesh"""
-        for tri in mesh.loop_triangles:
-            material_name = "Phy"
-            
-            vert_a = mesh.vertices[tri.vertices[0]]
-            vert_b = mesh.vertices[tri.vertices[1]]
-            vert_c = mesh.vertices[tri.vertices[2]]
-            
-            pos_a = vert_a.co
-            pos_b = vert_b.co
-            pos_c = vert_c.co
-            
-            normal_a = vert_a.normal
-            normal_b = vert_b.normal
-            normal_c = vert_c.normal
-            
-            uv_a = mesh.uv_layers.active.data[tri.loops[0]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            uv_b = mesh.uv_layers.active.data[tri.loops[1]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            uv_c = mesh.uv_layers.active.data[tri.loops[2]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            
-            sb.write(f"{material_name}\n0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a[0]:.6f} {uv_a[1]:.6f} 0\n0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b[0]:.6f} {uv_b[1]:.6f} 0\n0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c[0]:.6f} {uv_c[1]:.6f} 0\n")
+    def artifact_cache_for(self, context):
+        """Store d'artefacts compilés, ou None s'il est désactivé"""
+        props = context.scene.compilation_props
+        if not props.use_artifact_cache:
+            return None
+        
+        if props.artifact_cache_path:
+            directory = bpy.path.abspath(props.artifact_cache_path)
+        else:
+            directory = bpy.utils.user_resource('DATAFILES', path="lw_artifact_cache", create=True)
+        return ArtifactCache(directory, props.artifact_cache_size_mb * 1024 * 1024)
     
-    def export_mesh_smd_with_materials(self, sb, obj, mesh):
-        """Export mesh with materials"""
-        for tri in mesh.loop_triangles:
-            material_name = obj.material_slots[tri.material_index].name if tri.material_index < len(obj.material_slots) else "default"
-            
-            vert_a = mesh.vertices[tri.vertices[0]]
-            vert_b = mesh.vertices[tri.vertices[1]]
-            vert_c = mesh.vertices[tri.vertices[2]]
-            
-            pos_a = vert_a.co
-            pos_b = vert_b.co
-            pos_c = vert_c.co
-            
-            normal_a = vert_a.normal
-            normal_b = vert_b.normal
-            normal_c = vert_c.normal
-            
-            if not tri.use_smooth:
-                normal = (pos_b - pos_a).cross(pos_c - pos_a).normalized()
-                normal_a = normal
-                normal_b = normal
-                normal_c = normal
-            
-            uv_a = mesh.uv_layers.active.data[tri.loops[0]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            uv_b = mesh.uv_layers.active.data[tri.loops[1]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            uv_c = mesh.uv_layers.active.data[tri.loops[2]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            
-            sb.write(f"{material_name}\n0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a[0]:.6f} {uv_a[1]:.6f} 0\n0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b[0]:.6f} {uv_b[1]:.6f} 0\n0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c[0]:.6f} {uv_c[1]:.6f} 0\n")
+    def restore_artifacts(self, context, game_dir, qc_path):
+        """Restaure .mdl/.vvd/.vtx/.phy si un compile aux entrées identiques est en cache
+
+        Retourne True si studiomdl peut être évité.
+        """
+        self.artifact_key = None
+        cache = self.artifact_cache_for(context)
+        if cache is None or self.compile_plan is None:
+            return False
+        
+        props = context.scene.compilation_props
+        input_dir = os.path.dirname(qc_path)
+        inputs = [os.path.join(input_dir, filename) for filename in self.compile_plan.filenames()]
+        self.artifact_key = compile_key(
+            qc_path, [path for path in inputs if os.path.exists(path)], props.studiomdl_path, props.gameinfo_path
+        )
+        
+        if cache.restore(self.artifact_key, model_artifact_base(game_dir, props.modelname)):
+            print(f"[ARTIFACTS] Restored {props.modelname} from cache ({self.artifact_key})")
+            self.artifacts_restored = True
+            return True
+        return False
+    
+    def store_artifacts(self, context, game_dir):
+        """Ajoute au store les fichiers produits par le dernier studiomdl réussi"""
+        cache = self.artifact_cache_for(context)
+        if cache is None or self.artifact_key is None:
+            return
+        
+        props = context.scene.compilation_props
+        if cache.store(self.artifact_key, model_artifact_base(game_dir, props.modelname)):
+            print(f"[ARTIFACTS] Stored {props.modelname} ({self.artifact_key})")
     
-    def export_mesh_smd_no_materials(self, sb, mesh):
-        """Export mesh without materials"""
-        for tri in mesh.loop_triangles:
-            material_name = "None"
-            
-            vert_a = mesh.vertices[tri.vertices[0]]
-            vert_b = mesh.vertices[tri.vertices[1]]
-            vert_c = mesh.vertices[tri.vertices[2]]
-            
-            pos_a = vert_a.co
-            pos_b = vert_b.co
-            pos_c = vert_c.co
-            
-            normal_a = vert_a.normal
-            normal_b = vert_b.normal
-            normal_c = vert_c.normal
-            
-            if not tri.use_smooth:
-                normal = (pos_b - pos_a).cross(pos_c - pos_a).normalized()
-                normal_a = normal
-                normal_b = normal
-                normal_c = normal
-            
-            uv_a = mesh.uv_layers.active.data[tri.loops[0]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            uv_b = mesh.uv_layers.active.data[tri.loops[1]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            uv_c = mesh.uv_layers.active.data[tri.loops[2]].uv if mesh.uv_layers.active else (0.0, 0.0)
-            
-            sb.write(f"{material_name}\n0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a[0]:.6f} {uv_a[1]:.6f} 0\n0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b[0]:.6f} {uv_b[1]:.6f} 0\n0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c[0]:.6f} {uv_c[1]:.6f} 0\n")
+    def report_model_stats(self, context, game_dir):
+        """Lit les fichiers compilés et retourne leur résumé ; signale les écarts avec le compile précédent
+
+        Le compile précédent est relu dans <modèle>.stats.json, sinon pris
+        dans la session. Avec write_model_stats, les nouvelles valeurs
+        remplacent ce fichier.
+        """
+        props = context.scene.compilation_props
+        artifact_base = model_artifact_base(game_dir, props.modelname)
+        stats = read_model_stats(artifact_base)
+        
+        previous = load_stats(artifact_base)
+        if previous is None and model_stats.stats is not None and model_stats.stats["model"] == stats["model"]:
+            previous = model_stats.stats
+        model_stats.stats = stats
+        model_stats.changes = stats_changes(previous, stats) if previous is not None else []
+        
+        summary = stats_summary(stats)
+        print(f"[MODEL] {summary}")
+        for change in model_stats.changes:
+            print(f"[MODEL] Changed: {change}")
+        for problem in stats["problems"]:
+            print(f"[MODEL] {problem}")
+            self.report({'WARNING'}, problem)
+        
+        if props.write_model_stats and "mdl" in stats:
+            write_stats(artifact_base, stats)
+        return summary
     
-    def run_studiomdl(self, context, game_dir):
-        """Exécute studiomdl.exe"""
+    def finish_instrumentation(self, context, status):
+        """Écrit le rapport de temps/mémoire du compile à côté du QC
+
+        Seul un compile complet (aucun fichier réutilisé, aucun artefact
+        restauré) entre dans la comparaison SMD/DMX, avec la taille réelle
+        des fichiers de mesh écrits.
+        """
+        if self.profiler is None:
+            return
+        props = context.scene.compilation_props
+        mesh_paths = None
+        if status == "succeeded" and self.compile_plan is not None and not self.reused_files and not self.artifacts_restored:
+            mesh_paths = [os.path.join(self.report_dir, filename) for job in self.compile_plan.jobs for filename in job.filenames]
+        finish_profiler(self.profiler, self.report_dir, status, props.write_run_report, mesh_paths)
+        self.profiler = None
+    
+    def studiomdl_command(self, context, game_dir, qc_full_path):
+        """Vérifie les chemins et retourne la commande studiomdl.exe"""
         props = context.scene.compilation_props
         
         if not os.path.exists(game_dir):
@@ -1033,54 +1647,549 @@ class COMPILATION_OT_CompileModel(bpy.types.Operator):
         if not os.path.exists(props.studiomdl_path):
             raise Exception(f"studiomdl.exe not found: {props.studiomdl_path}")
         
-        qc_full_path = os.path.join(game_dir, "model_compile.qc")
-        
         if not os.path.exists(qc_full_path):
             raise Exception(f"QC file not found: {qc_full_path}")
         
         print(f"[DEBUG] studiomdl path: {props.studiomdl_path}")
         print(f"[DEBUG] game directory: {game_dir}")
         print(f"[DEBUG] QC file: {qc_full_path}")
-        print(f"[DEBUG] Working directory: {game_dir}")
+        print(f"[DEBUG] Working directory: {os.path.dirname(qc_full_path)}")
         
         # Vérifier que studiomdl.exe est bien exécutable
         if not os.access(props.studiomdl_path, os.X_OK):
             print(f"[WARNING] studiomdl.exe may not be executable")
         
-        studiomdl_args = [
-            props.studiomdl_path,
-            "-game", game_dir,
-            "-nop4",
-            qc_full_path
-        ]
+        studiomdl_args = build_studiomdl_args(props.studiomdl_path, game_dir, qc_full_path)
         
         print(f"[DEBUG] Command: {' '.join(studiomdl_args)}")
+        return studiomdl_args
+    
+    def start_studiomdl(self, context, game_dir, qc_full_path):
+        """Lance studiomdl.exe sans attendre sa fin"""
+        props = context.scene.compilation_props
+        studiomdl_args = self.studiomdl_command(context, game_dir, qc_full_path)
         
         try:
-            result = subprocess.run(
-                studiomdl_args, 
-                cwd=game_dir,
-                capture_output=True,
-                text=True,
-                timeout=120,
-                shell=False
-            )
-            
-            # Afficher la sortie pour debug
-            print(f"[STUDIOMDL] Return code: {result.returncode}")
-            if result.stdout:
-                print(f"[STUDIOMDL STDOUT]\n{result.stdout}")
-            if result.stderr:
-                print(f"[STUDIOMDL STDERR]\n{result.stderr}")
-            
-            if result.returncode != 0:
-                error_msg = f"studiomdl.exe failed with exit code {result.returncode}"
-                if result.stderr:
-                    error_msg += f"\nSTDERR: {result.stderr}"
-                if result.stdout:
-                    error_msg += f"\nSTDOUT: {result.stdout}"
-                raise Exception(error_msg)
+            return StudiomdlProcess(studiomdl_args, os.path.dirname(qc_full_path), props.studiomdl_timeout)
         except FileNotFoundError as e:
             raise Exception(f"Cannot find studiomdl.exe: {e}")
+    
+    def handle_studiomdl_line(self, stream, line):
+        """Ajoute une ligne de sortie de studiomdl au log et la classe au fil de l'eau"""
+        compile_log.add(stream, line)
+        message = studiomdl_output.feed(stream, line)
+        print(f"[STUDIOMDL {stream.upper()}] {line}")
+        if message.kind == "error" and message.objects:
+            print(f"[STUDIOMDL] Error caused by: {', '.join(message.objects)}")
+    
+    def studiomdl_file_objects(self):
+        """Fichiers d'entrée du QC et objets Blender écrits dans chacun"""
+        plan = self.compile_plan
+        if plan is None:
+            return {}
+        
+        file_objects = {}
+        for job in plan.jobs:
+            names = [job.source.name] + [obj.name for obj in job.objects if obj != job.source]
+            for filename in job.filenames:
+                file_objects[filename] = names
+        for job in plan.sequence_jobs:
+            seq = job.sequence
+            source = seq.animation_armature if seq.animation_mode == 'ARMATURE' else seq.animation_mesh
+            file_objects[job.filename] = [source.name] if source is not None else []
+        for job in plan.flex_jobs:
+            file_objects[job.filename] = [obj.name for obj in job.objects]
+        file_objects["model_compile.qc"] = ["QC"]
+        return file_objects
+    
+    def start_studiomdl_log(self):
+        """Remet à zéro le log et l'analyse de la sortie avant un lancement de studiomdl"""
+        studiomdl_output.reset(self.studiomdl_file_objects())
+        compile_log.start()
+    
+    def run_studiomdl(self, context, game_dir, qc_full_path):
+        """Exécute studiomdl.exe et attend sa fin"""
+        process = self.start_studiomdl(context, game_dir, qc_full_path)
+        self.start_studiomdl_log()
+        
+        try:
+            if self.profiler is not None:
+                with self.profiler.stage("studiomdl"):
+                    returncode = process.wait(self.handle_studiomdl_line)
+            else:
+                returncode = process.wait(self.handle_studiomdl_line)
         except subprocess.TimeoutExpired:
-            raise Exception("studiomdl.exe timeout (exceeded 120 seconds)")
+            compile_log.finish("Timeout")
+            raise Exception(f"studiomdl.exe timeout (exceeded {process.timeout} seconds)")
+        
+        print(f"[STUDIOMDL] Return code: {returncode}")
+        print(f"[STUDIOMDL] {studiomdl_output.summary()[0]}")
+        
+        if returncode != 0:
+            compile_log.finish(f"Failed ({returncode})")
+            raise Exception(studiomdl_error_message(returncode, compile_log.lines, studiomdl_output))
+        
+        compile_log.finish("Succeeded")
+
+
+class COMPILATION_OT_CompileModel(CompilePipeline, bpy.types.Operator):
+    """Compiler le modèle"""
+    bl_idname = "lw_pannel.compile_model"
+    bl_label = "Compile Model"
+    bl_description = "Compile model to Source Engine MDL format"
+    
+    incremental: bpy.props.BoolProperty(
+        name="Incremental",
+        description="Only re-export the meshes changed since the last watch compile",
+        default=False,
+        options={'HIDDEN', 'SKIP_SAVE'}
+    )
+    
+    _timer = None
+    _process = None
+    _export = None
+    _game_dir = ""
+    
+    def report_success(self, context, game_dir, restored=False):
+        details = [self.cache_summary] if self.cache_summary else []
+        details.append(self.report_model_stats(context, game_dir))
+        if model_stats.changes:
+            details.append(f"changed: {', '.join(model_stats.changes)}")
+        if restored:
+            details.append("studiomdl skipped, artifacts restored from cache")
+        elif studiomdl_output.counts["warning"]:
+            details.append(f"{studiomdl_output.counts['warning']} studiomdl warning(s)")
+        
+        if details:
+            self.report({'INFO'}, f"Compilation successful! ({'; '.join(details)})")
+        else:
+            self.report({'INFO'}, "Compilation successful!")
+    
+    def execute(self, context):
+        # Mode bloquant (scripts, ligne de commande)
+        if not self.check_compile_config(context):
+            return {'CANCELLED'}
+        self.changed_sources = watch_state.take_changes() if self.incremental else None
+        
+        try:
+            game_dir, qc_path = self.prepare_compile(context)
+            
+            # Entrées identiques à un compile précédent : pas de studiomdl
+            if self.restore_artifacts(context, game_dir, qc_path):
+                self.finish_instrumentation(context, "restored")
+                self.report_success(context, game_dir, restored=True)
+                return {'FINISHED'}
+            
+            self.run_studiomdl(context, game_dir, qc_path)
+            self.store_artifacts(context, game_dir)
+            
+            self.finish_instrumentation(context, "succeeded")
+            self.report_success(context, game_dir)
+            return {'FINISHED'}
+        except Exception as e:
+            watch_state.restore(self.changed_sources)
+            self.finish_instrumentation(context, "failed")
+            self.report({'ERROR'}, f"Compilation failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return {'CANCELLED'}
+    
+    def invoke(self, context, event):
+        # Depuis l'interface : export découpé en tranches puis studiomdl en arrière-plan (modal)
+        if compile_log.running or export_progress.running:
+            self.report({'WARNING'}, "A compilation is already running")
+            return {'CANCELLED'}
+        
+        if not self.check_compile_config(context):
+            return {'CANCELLED'}
+        self.changed_sources = watch_state.take_changes() if self.incremental else None
+        
+        # bpy.context plutôt que le contexte d'invoke, qui n'est plus valide aux appels modaux suivants
+        self._export = self.iter_prepare_compile(bpy.context)
+        compile_log.cancel_requested = False
+        wm = context.window_manager
+        wm.progress_begin(0, 1000)
+        self._timer = wm.event_timer_add(0.01, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        if self._export is not None:
+            return self.modal_export(context, event)
+        
+        if (event.type == 'ESC' and event.value == 'PRESS') or compile_log.cancel_requested:
+            self._process.terminate()
+            self.finish_modal(context, "Cancelled")
+            self.report({'WARNING'}, "Compilation cancelled")
+            return {'CANCELLED'}
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        for stream, line in self._process.drain():
+            self.handle_studiomdl_line(stream, line)
+        
+        if self._process.timed_out():
+            self._process.terminate()
+            self.finish_modal(context, "Timeout")
+            self.report({'ERROR'}, f"Compilation failed: studiomdl.exe timeout (exceeded {self._process.timeout} seconds)")
+            return {'CANCELLED'}
+        
+        returncode = self._process.poll()
+        if returncode is None:
+            tag_compilation_redraw(context)
+            return {'PASS_THROUGH'}
+        
+        for stream, line in self._process.drain():
+            self.handle_studiomdl_line(stream, line)
+        print(f"[STUDIOMDL] Return code: {returncode}")
+        print(f"[STUDIOMDL] {studiomdl_output.summary()[0]}")
+        
+        if returncode != 0:
+            self.finish_modal(context, f"Failed ({returncode})")
+            self.report({'ERROR'}, f"Compilation failed: {studiomdl_error_message(returncode, compile_log.lines, studiomdl_output)}")
+            return {'CANCELLED'}
+        
+        self.finish_modal(context, "Succeeded")
+        self.store_artifacts(context, self._game_dir)
+        self.report_success(context, self._game_dir)
+        return {'FINISHED'}
+    
+    def modal_export(self, context, event):
+        """Phase d'export : une tranche de travail par tick, dans le budget de temps par frame"""
+        wm = context.window_manager
+        if (event.type == 'ESC' and event.value == 'PRESS') or compile_log.cancel_requested:
+            # Fermer le générateur supprime le fichier en cours d'écriture
+            self.stop_export(context)
+            watch_state.restore(self.changed_sources)
+            self.finish_instrumentation(context, "cancelled")
+            self.report({'WARNING'}, "Export cancelled")
+            return {'CANCELLED'}
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        budget = context.scene.compilation_props.export_frame_budget / 1000.0
+        try:
+            with watch_state.suspend():
+                done, result = run_slice(self._export, budget)
+        except Exception as e:
+            self.stop_export(context)
+            watch_state.restore(self.changed_sources)
+            self.finish_instrumentation(context, "failed")
+            self.report({'ERROR'}, f"Compilation failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return {'CANCELLED'}
+        
+        wm.progress_update(int(export_progress.fraction * 1000))
+        tag_compilation_redraw(context)
+        if not done:
+            return {'PASS_THROUGH'}
+        
+        self.stop_export(context)
+        game_dir, qc_path = result
+        try:
+            if self.restore_artifacts(context, game_dir, qc_path):
+                self.finish_instrumentation(context, "restored")
+                self.report_success(context, game_dir, restored=True)
+                return {'FINISHED'}
+            
+            self._game_dir = game_dir
+            self._process = self.start_studiomdl(context, game_dir, qc_path)
+        except Exception as e:
+            watch_state.restore(self.changed_sources)
+            self.finish_instrumentation(context, "failed")
+            self.report({'ERROR'}, f"Compilation failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return {'CANCELLED'}
+        
+        self.start_studiomdl_log()
+        self._timer = wm.event_timer_add(0.1, window=context.window)
+        return {'PASS_THROUGH'}
+    
+    def stop_export(self, context):
+        """Ferme le générateur d'export et retire la barre de progression et le timer"""
+        if self._export is not None:
+            self._export.close()
+            self._export = None
+        wm = context.window_manager
+        wm.progress_end()
+        if self._timer is not None:
+            wm.event_timer_remove(self._timer)
+            self._timer = None
+        tag_compilation_redraw(context)
+    
+    def finish_modal(self, context, status):
+        compile_log.finish(status)
+        if self.profiler is not None:
+            self.profiler.add_stage("studiomdl", self._process.elapsed)
+            self.finish_instrumentation(context, status.lower())
+        if self._timer is not None:
+            context.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+        tag_compilation_redraw(context)
+
+
+class COMPILATION_OT_BatchCompile(CompilePipeline, bpy.types.Operator):
+    """Compiler toutes les scènes cochées en parallèle"""
+    bl_idname = "lw_pannel.batch_compile"
+    bl_label = "Batch Compile"
+    bl_description = "Export every scene marked for batch into its own sandbox and run studiomdl in parallel"
+    
+    _timer = None
+    
+    def build_queue(self, context):
+        """Exporte chaque scène dans son sandbox et retourne la file prête à compiler"""
+        props = context.scene.compilation_props
+        scenes = [sc for sc in bpy.data.scenes if sc.compilation_props.batch_include]
+        if not scenes:
+            raise Exception("No scene is marked for batch compilation")
+        
+        sandbox_root = bpy.path.abspath(props.batch_sandbox_path) or os.path.join(bpy.app.tempdir, "lw_batch")
+        os.makedirs(sandbox_root, exist_ok=True)
+        
+        queue = BatchQueue(props.batch_concurrency)
+        window = context.window
+        original_scene = window.scene
+        
+        # L'export utilise bpy : il reste séquentiel, seul studiomdl tourne en parallèle
+        try:
+            for sc in scenes:
+                job = queue.add(BatchJob(sc.name, os.path.join(sandbox_root, bpy.path.clean_name(sc.name))))
+                window.scene = sc
+                if not self.check_compile_config(bpy.context):
+                    job.fail("Invalid compilation configuration")
+                    continue
+                
+                export_start = time.monotonic()
+                try:
+                    game_dir, qc_path = self.prepare_compile(bpy.context, job.sandbox_dir)
+                    if self.restore_artifacts(bpy.context, game_dir, qc_path):
+                        job.restored()
+                    else:
+                        args = self.studiomdl_command(bpy.context, game_dir, qc_path)
+                        job.ready(args, job.sandbox_dir, sc.compilation_props.studiomdl_timeout)
+                        cache = self.artifact_cache_for(bpy.context)
+                        if cache is not None:
+                            artifact_base = model_artifact_base(game_dir, sc.compilation_props.modelname)
+                            job.on_success = lambda cache=cache, key=self.artifact_key, base=artifact_base: cache.store(key, base)
+                except Exception as e:
+                    job.fail(str(e))
+                job.export_duration = time.monotonic() - export_start
+                self.finish_instrumentation(bpy.context, job.status.lower())
+        finally:
+            window.scene = original_scene
+        
+        batch_status.queue = queue
+        batch_status.summary_path = os.path.join(sandbox_root, "batch_summary.json")
+        return queue
+    
+    def finish_batch(self, queue):
+        queue.write_summary(batch_status.summary_path)
+        print(f"[BATCH] {queue.summary()} - {batch_status.summary_path}")
+        for job in queue.jobs:
+            if job.status == 'FAILED':
+                print(f"[BATCH] {job.name} failed: {job.error}")
+        
+        if queue.counts().get('FAILED', 0):
+            self.report({'ERROR'}, f"Batch compile: {queue.summary()}")
+        else:
+            self.report({'INFO'}, f"Batch compile: {queue.summary()}")
+    
+    def execute(self, context):
+        try:
+            queue = self.build_queue(context)
+        except Exception as e:
+            self.report({'ERROR'}, f"Batch compile failed: {str(e)}")
+            return {'CANCELLED'}
+        
+        queue.run()
+        self.finish_batch(queue)
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        if batch_status.running:
+            self.report({'WARNING'}, "A batch compilation is already running")
+            return {'CANCELLED'}
+        
+        try:
+            self.build_queue(context)
+        except Exception as e:
+            self.report({'ERROR'}, f"Batch compile failed: {str(e)}")
+            return {'CANCELLED'}
+        
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.2, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        queue = batch_status.queue
+        
+        if event.type == 'ESC' and event.value == 'PRESS':
+            queue.cancel()
+            self.finish_modal(context)
+            self.finish_batch(queue)
+            return {'CANCELLED'}
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        if not queue.step():
+            tag_compilation_redraw(context)
+            return {'PASS_THROUGH'}
+        
+        self.finish_modal(context)
+        self.finish_batch(queue)
+        return {'FINISHED'}
+    
+    def finish_modal(self, context):
+        if self._timer is not None:
+            context.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+        tag_compilation_redraw(context)
+
+class COMPILATION_OT_CompileTargets(CompilePipeline, bpy.types.Operator):
+    """Compiler un seul export pour toutes les cibles activées"""
+    bl_idname = "lw_pannel.compile_targets"
+    bl_label = "Compile All Targets"
+    bl_description = "Export the SMDs and QC once, then run every enabled target's studiomdl concurrently on the shared files"
+    
+    _timer = None
+    
+    def build_queue(self, context):
+        """Exporte une fois dans un répertoire partagé et retourne la file des cibles"""
+        scene = context.scene
+        props = scene.compilation_props
+        targets = [target for target in scene.compile_target_list if target.enabled]
+        if not targets:
+            raise Exception("No compile target is enabled")
+        
+        # Deux cibles sur le même jeu écriraient les mêmes fichiers compilés en même temps
+        game_dirs = [os.path.normcase(os.path.abspath(target.game_dir)) for target in targets]
+        if len(set(game_dirs)) != len(game_dirs):
+            raise Exception("Two enabled targets use the same game directory")
+        
+        if props.smd_output_path and os.path.exists(props.smd_output_path):
+            shared_dir = os.path.join(props.smd_output_path, "lw_targets")
+        else:
+            shared_dir = os.path.join(bpy.app.tempdir, "lw_targets")
+        
+        _, qc_path = self.prepare_compile(context, shared_dir)
+        inputs = [os.path.join(shared_dir, filename) for filename in self.compile_plan.filenames()]
+        inputs = [path for path in inputs if os.path.exists(path)]
+        cache = self.artifact_cache_for(context)
+        
+        # Toutes les cibles démarrent ensemble : la concurrence est le nombre de cibles
+        queue = BatchQueue(len(targets))
+        for target in targets:
+            job = queue.add(BatchJob(target.name, os.path.join(shared_dir, "targets", bpy.path.clean_name(target.name))))
+            os.makedirs(job.sandbox_dir, exist_ok=True)
+            problem = target_problem(target)
+            if problem:
+                job.fail(problem)
+                continue
+            
+            artifact_base = model_artifact_base(target.game_dir, props.modelname)
+            output_dir = bpy.path.abspath(target.output_path) if target.output_path else ""
+            key = compile_key(qc_path, inputs, target.studiomdl_path, target.gameinfo_path) if cache is not None else None
+            
+            def on_success(cache=cache, key=key, base=artifact_base, output_dir=output_dir):
+                if cache is not None:
+                    cache.store(key, base)
+                if output_dir:
+                    copy_artifacts(base, output_dir)
+            
+            if cache is not None and cache.restore(key, artifact_base):
+                self.artifacts_restored = True
+                job.restored()
+                if output_dir:
+                    copy_artifacts(artifact_base, output_dir)
+                continue
+            
+            args = build_studiomdl_args(target.studiomdl_path, target.game_dir, qc_path)
+            job.ready(args, shared_dir, props.studiomdl_timeout)
+            job.on_success = on_success
+        
+        target_status.queue = queue
+        target_status.summary_path = os.path.join(shared_dir, "targets_summary.json")
+        return queue
+    
+    def finish_targets(self, context, queue):
+        queue.write_summary(target_status.summary_path)
+        print(f"[TARGETS] {queue.summary()} - {target_status.summary_path}")
+        for job in queue.jobs:
+            if job.status == 'FAILED':
+                print(f"[TARGETS] {job.name} failed: {job.error}")
+        
+        failed = queue.counts().get('FAILED', 0)
+        if self.profiler is not None:
+            self.profiler.add_stage("studiomdl", time.monotonic() - queue.start_time)
+        self.finish_instrumentation(context, "failed" if failed else "succeeded")
+        
+        if failed:
+            self.report({'ERROR'}, f"Compile targets: {queue.summary()}")
+        else:
+            self.report({'INFO'}, f"Compile targets: {queue.summary()}")
+    
+    def start(self, context):
+        if not self.check_compile_config(context, require_paths=False):
+            return None
+        try:
+            return self.build_queue(context)
+        except Exception as e:
+            self.finish_instrumentation(context, "failed")
+            self.report({'ERROR'}, f"Compile targets failed: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            return None
+    
+    def execute(self, context):
+        queue = self.start(context)
+        if queue is None:
+            return {'CANCELLED'}
+        
+        queue.run()
+        self.finish_targets(context, queue)
+        return {'FINISHED'}
+    
+    def invoke(self, context, event):
+        if target_status.running or compile_log.running:
+            self.report({'WARNING'}, "A compilation is already running")
+            return {'CANCELLED'}
+        
+        if self.start(context) is None:
+            return {'CANCELLED'}
+        
+        wm = context.window_manager
+        self._timer = wm.event_timer_add(0.2, window=context.window)
+        wm.modal_handler_add(self)
+        return {'RUNNING_MODAL'}
+    
+    def modal(self, context, event):
+        queue = target_status.queue
+        
+        if event.type == 'ESC' and event.value == 'PRESS':
+            queue.cancel()
+            self.finish_modal(context)
+            self.finish_targets(context, queue)
+            return {'CANCELLED'}
+        
+        if event.type != 'TIMER':
+            return {'PASS_THROUGH'}
+        
+        if not queue.step():
+            tag_compilation_redraw(context)
+            return {'PASS_THROUGH'}
+        
+        self.finish_modal(context)
+        self.finish_targets(context, queue)
+        return {'FINISHED'}
+    
+    def finish_modal(self, context):
+        if self._timer is not None:
+            context.window_manager.event_timer_remove(self._timer)
+            self._timer = None
+        tag_compilation_redraw(context)
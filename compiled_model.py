@@ -0,0 +1,343 @@
+import os
+import mmap
+import json
+import struct
+from contextlib import contextmanager
+
+from .staging import atomic_write
+
+
+# En-têtes des fichiers compilés (public/studio.h, optimize.h, phyfile.h ; branche Source 2013)
+MDL_ID = b"IDST"
+VVD_ID = b"IDSV"
+VPHY_ID = b"VPHY"
+
+# studiohdr_t jusqu'à bodypartindex : id, version, checksum, name[64], length,
+# 6 vecteurs, flags puis 21 entiers (bones ... bodyparts)
+_MDL_HEADER = struct.Struct("<4sii64si18fi21i")
+# mstudiotexture_t : sznameindex puis 15 entiers
+_MDL_TEXTURE = struct.Struct("<i")
+_MDL_TEXTURE_SIZE = 64
+# mstudiobodyparts_t : sznameindex, nummodels, base, modelindex
+_MDL_BODYPART = struct.Struct("<iiii")
+# mstudiomodel_t : name[64], type, boundingradius, nummeshes, meshindex, numvertices
+_MDL_MODEL = struct.Struct("<64sifiii")
+_MDL_MODEL_SIZE = 148
+
+# vertexFileHeader_t : id, version, checksum, numLODs, numLODVertexes[8], fixups, offsets
+_VVD_HEADER = struct.Struct("<4siii8iiiii")
+
+# OptimizedModel::FileHeader_t et ses tables (structures packées sur 1 octet)
+_VTX_HEADER = struct.Struct("<iiHHiiiiii")
+_VTX_BODYPART = struct.Struct("<ii")
+_VTX_MODEL = struct.Struct("<ii")
+_VTX_MODEL_LOD = struct.Struct("<iif")
+_VTX_MESH = struct.Struct("<iiB")
+# StripGroupHeader_t : numVerts, vertOffset, numIndices, indexOffset, numStrips, stripOffset, flags
+_VTX_STRIP_GROUP = struct.Struct("<iiiiiiB")
+# Les MDL version 49 ajoutent numTopologyIndices et topologyOffset à chaque strip group
+_VTX_STRIP_GROUP_V49_EXTRA = 8
+
+# phyheader_t : size, id, solidCount, checkSum
+_PHY_HEADER = struct.Struct("<iiii")
+# compactsurfaceheader_t : vphysicsID, version, modelType, surfaceSize, dragAxisAreas, axisMapSize
+_PHY_SURFACE_HEADER = struct.Struct("<4shhi3fi")
+# IVP_Compact_Surface (48 octets) : offset_ledgetree_root à l'octet 32
+_IVP_SURFACE_SIZE = 48
+_IVP_LEDGETREE_OFFSET = 32
+# IVP_Compact_Ledge (16 octets) : c_point_offset, client_data, flags/size_div_16, n_triangles
+_IVP_LEDGE = struct.Struct("<iiIhh")
+
+# Position de la somme de contrôle dans l'en-tête de chaque fichier (le .ani n'en a pas)
+_CHECKSUM_OFFSETS = {".mdl": 8, ".vvd": 8, ".vtx": 16, ".phy": 12}
+# studiohdr_t : numanimblocks, nombre de blocs d'animation rangés dans le .ani
+_MDL_NUMANIMBLOCKS_OFFSET = 352
+
+
+@contextmanager
+def mapped_file(path):
+    """Fichier projeté en mémoire en lecture seule (les tables sont lues sans copie)"""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"Empty file: {path}")
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield data
+        finally:
+            data.close()
+
+
+def _cstring(data, offset):
+    end = data.find(b"\0", offset)
+    if end < 0:
+        end = len(data)
+    return data[offset:end].decode("utf-8", errors="replace")
+
+
+def _read_int(path, offset):
+    """Entier 32 bits lu à offset, ou None si le fichier est trop court"""
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read(4)
+    return struct.unpack("<i", data)[0] if len(data) == 4 else None
+
+
+def read_checksum(path):
+    """Somme de contrôle de l'en-tête d'un fichier compilé, sans lire le reste ; None si le format n'en a pas"""
+    offset = _CHECKSUM_OFFSETS.get(os.path.splitext(path)[1].lower())
+    if offset is None:
+        return None
+    return _read_int(path, offset)
+
+
+def mdl_anim_blocks(path):
+    """Nombre de blocs d'animation que le .mdl va chercher dans son .ani"""
+    return _read_int(path, _MDL_NUMANIMBLOCKS_OFFSET) or 0
+
+
+def read_mdl(path):
+    """En-tête et tables d'un .mdl : os, matériaux, chemins, skins, bodyparts et leurs modèles"""
+    with mapped_file(path) as data:
+        header = _MDL_HEADER.unpack_from(data, 0)
+        if header[0] != MDL_ID:
+            raise ValueError(f"Not a studio model: {path}")
+        version, checksum = header[1], header[2]
+        # header[23] : flags ; puis les 21 entiers de numbones à bodypartindex
+        counts = header[24:]
+        (numbones, _, _, _, _, _, _, _, numlocalseq, _, _, _,
+         numtextures, textureindex, numcdtextures, cdtextureindex,
+         numskinref, numskinfamilies, _, numbodyparts, bodypartindex) = counts
+
+        materials = []
+        for index in range(numtextures):
+            offset = textureindex + index * _MDL_TEXTURE_SIZE
+            name_offset, = _MDL_TEXTURE.unpack_from(data, offset)
+            materials.append(_cstring(data, offset + name_offset))
+
+        cdmaterials = []
+        for index in range(numcdtextures):
+            name_offset, = struct.unpack_from("<i", data, cdtextureindex + index * 4)
+            cdmaterials.append(_cstring(data, name_offset))
+
+        bodyparts = []
+        for index in range(numbodyparts):
+            offset = bodypartindex + index * _MDL_BODYPART.size
+            name_offset, nummodels, _, modelindex = _MDL_BODYPART.unpack_from(data, offset)
+            models = []
+            for model in range(nummodels):
+                name, _, _, nummeshes, _, numvertices = _MDL_MODEL.unpack_from(data, offset + modelindex + model * _MDL_MODEL_SIZE)
+                models.append({
+                    "name": name.split(b"\0", 1)[0].decode("utf-8", errors="replace"),
+                    "meshes": nummeshes,
+                    "vertices": numvertices,
+                })
+            bodyparts.append({"name": _cstring(data, offset + name_offset), "models": models})
+
+        return {
+            "version": version,
+            "checksum": checksum,
+            "name": header[3].split(b"\0", 1)[0].decode("utf-8", errors="replace"),
+            "bones": numbones,
+            "sequences": numlocalseq,
+            "materials": materials,
+            "cdmaterials": cdmaterials,
+            "skin_families": numskinfamilies,
+            "skin_references": numskinref,
+            "bodyparts": bodyparts,
+        }
+
+
+def read_vvd(path):
+    """En-tête d'un .vvd : nombre de sommets par LOD"""
+    with mapped_file(path) as data:
+        header = _VVD_HEADER.unpack_from(data, 0)
+        if header[0] != VVD_ID:
+            raise ValueError(f"Not a studio vertex file: {path}")
+        num_lods = header[3]
+        return {
+            "version": header[1],
+            "checksum": header[2],
+            "lod_vertices": list(header[4:4 + num_lods]),
+        }
+
+
+def read_vtx(path, mdl_version=48):
+    """Parcourt les tables d'un .dx90.vtx : triangles (index / 3) par LOD, tous bodyparts confondus"""
+    strip_group_size = _VTX_STRIP_GROUP.size + (_VTX_STRIP_GROUP_V49_EXTRA if mdl_version >= 49 else 0)
+    with mapped_file(path) as data:
+        (version, _, _, _, _, checksum, num_lods, _, numbodyparts, bodypart_offset) = _VTX_HEADER.unpack_from(data, 0)
+        triangles = [0] * num_lods
+        meshes = [0] * num_lods
+        for bodypart in range(numbodyparts):
+            bodypart_pos = bodypart_offset + bodypart * _VTX_BODYPART.size
+            nummodels, model_offset = _VTX_BODYPART.unpack_from(data, bodypart_pos)
+            for model in range(nummodels):
+                model_pos = bodypart_pos + model_offset + model * _VTX_MODEL.size
+                model_lods, lod_offset = _VTX_MODEL.unpack_from(data, model_pos)
+                for lod in range(min(model_lods, num_lods)):
+                    lod_pos = model_pos + lod_offset + lod * _VTX_MODEL_LOD.size
+                    nummeshes, mesh_offset, _ = _VTX_MODEL_LOD.unpack_from(data, lod_pos)
+                    meshes[lod] += nummeshes
+                    for mesh in range(nummeshes):
+                        mesh_pos = lod_pos + mesh_offset + mesh * _VTX_MESH.size
+                        numstripgroups, group_offset, _ = _VTX_MESH.unpack_from(data, mesh_pos)
+                        for group in range(numstripgroups):
+                            group_pos = mesh_pos + group_offset + group * strip_group_size
+                            _, _, numindices, _, _, _, _ = _VTX_STRIP_GROUP.unpack_from(data, group_pos)
+                            triangles[lod] += numindices // 3
+        return {
+            "version": version,
+            "checksum": checksum,
+            "lod_triangles": triangles,
+            "lod_meshes": meshes,
+        }
+
+
+def _count_ledges(data, surface_pos, end):
+    """Nombre d'enveloppes convexes (ledges IVP) d'une surface compacte
+
+    Les ledges se suivent après l'en-tête de surface ; leurs points
+    commencent juste après le dernier, l'arbre des ledges après les points.
+    """
+    tree_offset, = struct.unpack_from("<i", data, surface_pos + _IVP_LEDGETREE_OFFSET)
+    limit = min(end, surface_pos + tree_offset) if tree_offset > 0 else end
+    pos = surface_pos + _IVP_SURFACE_SIZE
+    ledges = 0
+    while pos + _IVP_LEDGE.size <= limit:
+        point_offset, _, flags, _, _ = _IVP_LEDGE.unpack_from(data, pos)
+        size = (flags >> 8) * 16
+        if size <= 0:
+            break
+        ledges += 1
+        if point_offset > 0:
+            limit = min(limit, pos + point_offset)
+        pos += size
+    return ledges
+
+
+def read_phy(path):
+    """En-tête et solides d'un .phy : nombre de solides et d'enveloppes convexes"""
+    with mapped_file(path) as data:
+        header_size, _, solid_count, checksum = _PHY_HEADER.unpack_from(data, 0)
+        pos = header_size
+        hulls = []
+        for _ in range(solid_count):
+            solid_size, = struct.unpack_from("<i", data, pos)
+            solid_pos = pos + 4
+            solid_end = solid_pos + solid_size
+            surface_pos = solid_pos
+            if data[solid_pos:solid_pos + 4] == VPHY_ID:
+                surface_pos += _PHY_SURFACE_HEADER.size
+            hulls.append(_count_ledges(data, surface_pos, solid_end))
+            pos = solid_end
+        return {
+            "checksum": checksum,
+            "solids": solid_count,
+            "hulls": sum(hulls),
+            "solid_hulls": hulls,
+        }
+
+
+def read_model_stats(artifact_base):
+    """Statistiques d'un modèle compilé à partir de ses fichiers (<base>.mdl, .vvd, .dx90.vtx, .phy)
+
+    Un fichier absent est ignoré ; un fichier illisible est signalé dans
+    "problems" sans interrompre la lecture des autres.
+    """
+    stats = {"model": os.path.basename(artifact_base), "problems": []}
+    mdl = None
+    readers = (
+        ("mdl", ".mdl", read_mdl),
+        ("vvd", ".vvd", read_vvd),
+        ("vtx", ".dx90.vtx", lambda path: read_vtx(path, mdl["version"] if mdl else 48)),
+        ("phy", ".phy", read_phy),
+    )
+    for key, extension, reader in readers:
+        path = artifact_base + extension
+        if not os.path.exists(path):
+            continue
+        try:
+            stats[key] = reader(path)
+        except (ValueError, struct.error, OSError) as e:
+            stats["problems"].append(f"{os.path.basename(path)}: {e}")
+            continue
+        if key == "mdl":
+            mdl = stats[key]
+
+    # Les fichiers d'un même compile partagent la somme de contrôle du .mdl
+    if mdl is not None:
+        for key in ("vvd", "vtx", "phy"):
+            if key in stats and stats[key]["checksum"] != mdl["checksum"]:
+                stats["problems"].append(f"{key} checksum does not match the .mdl (stale file?)")
+    return stats
+
+
+def stats_summary(stats):
+    """Ligne courte : triangles par LOD, os, matériaux, enveloppes de collision"""
+    parts = []
+    if "vtx" in stats:
+        parts.append(", ".join(f"LOD{lod} {tris:,} tris" for lod, tris in enumerate(stats["vtx"]["lod_triangles"])))
+    if "mdl" in stats:
+        parts.append(f"{stats['mdl']['bones']} bone(s)")
+        parts.append(f"{len(stats['mdl']['materials'])} material(s)")
+    if "phy" in stats:
+        parts.append(f"{stats['phy']['hulls']} hull(s) in {stats['phy']['solids']} solid(s)")
+    return "; ".join(parts) if parts else "no compiled files found"
+
+
+def _key_values(stats):
+    values = {}
+    if "vtx" in stats:
+        for lod, tris in enumerate(stats["vtx"]["lod_triangles"]):
+            values[f"LOD{lod} tris"] = tris
+    if "mdl" in stats:
+        values["bones"] = stats["mdl"]["bones"]
+        values["materials"] = len(stats["mdl"]["materials"])
+    if "phy" in stats:
+        values["hulls"] = stats["phy"]["hulls"]
+    return values
+
+
+def stats_changes(previous, current):
+    """Différences des valeurs clés entre deux compiles (ex. "LOD0 tris 1200 -> 1450")"""
+    before = _key_values(previous)
+    after = _key_values(current)
+    return [
+        f"{key} {before.get(key, 0)} -> {after.get(key, 0)}"
+        for key in sorted(set(before) | set(after))
+        if before.get(key, 0) != after.get(key, 0)
+    ]
+
+
+def stats_path(artifact_base):
+    return artifact_base + ".stats.json"
+
+
+def write_stats(artifact_base, stats):
+    """Enregistre les statistiques à côté du .mdl (fichier inchangé si les valeurs le sont)"""
+    with atomic_write(stats_path(artifact_base)) as f:
+        json.dump(stats, f, indent=2)
+
+
+def load_stats(artifact_base):
+    """Statistiques enregistrées par le compile précédent, ou None"""
+    try:
+        with open(stats_path(artifact_base), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class ModelStats:
+    """Statistiques du dernier modèle compilé, affichées par le panel"""
+
+    def __init__(self):
+        self.stats = None
+        self.changes = []
+
+    @property
+    def summary(self):
+        return stats_summary(self.stats) if self.stats is not None else ""
+
+
+model_stats = ModelStats()
@@ -21,9 +21,11 @@ from .compilation import (
     BodyPropGroup,
     SequencePropGroup,
     LODPropGroup,
+    CompileTargetPropGroup,
     COMPILATION_UL_BodyList,
     COMPILATION_UL_SequenceList,
     COMPILATION_UL_LODList,
+    COMPILATION_UL_TargetList,
     COMPILATION_OT_AddBody,
     COMPILATION_OT_RemoveBody,
     COMPILATION_OT_AddSequence,
@@ -31,6 +33,14 @@ from .compilation import (
     COMPILATION_OT_AddLOD,
     COMPILATION_OT_RemoveLOD,
     COMPILATION_OT_CompileModel,
+    COMPILATION_OT_CancelCompile,
+    COMPILATION_OT_BatchCompile,
+    COMPILATION_OT_ToggleWatch,
+    COMPILATION_OT_PreflightCheck,
+    COMPILATION_OT_SelectErrorObjects,
+    COMPILATION_OT_AddTarget,
+    COMPILATION_OT_RemoveTarget,
+    COMPILATION_OT_CompileTargets,
 )
 
 from .panel import (
@@ -41,6 +51,9 @@ from .panel import (
     COMPILATION_PT_SequencesPanel,
     COMPILATION_PT_PathsPanel,
     COMPILATION_PT_LODPanel,
+    COMPILATION_PT_LogPanel,
+    COMPILATION_PT_BatchPanel,
+    COMPILATION_PT_TargetsPanel,
 )
 
 
@@ -72,11 +85,13 @@ classes = (
     BodyPropGroup,
     SequencePropGroup,
     LODPropGroup,
+    CompileTargetPropGroup,
     
     # UI Lists
     COMPILATION_UL_BodyList,
     COMPILATION_UL_SequenceList,
     COMPILATION_UL_LODList,
+    COMPILATION_UL_TargetList,
     
     # Panels
     RELINKER_PT_Panel,
@@ -86,6 +101,9 @@ classes = (
     COMPILATION_PT_SequencesPanel,
     COMPILATION_PT_PathsPanel,
     COMPILATION_PT_LODPanel,
+    COMPILATION_PT_LogPanel,
+    COMPILATION_PT_BatchPanel,
+    COMPILATION_PT_TargetsPanel,
     
     # Opérateurs originaux
     RELINKER_OT_RelinkTextures,
@@ -114,4 +132,12 @@ classes = (
     COMPILATION_OT_AddLOD,
     COMPILATION_OT_RemoveLOD,
     COMPILATION_OT_CompileModel,
+    COMPILATION_OT_CancelCompile,
+    COMPILATION_OT_BatchCompile,
+    COMPILATION_OT_ToggleWatch,
+    COMPILATION_OT_PreflightCheck,
+    COMPILATION_OT_SelectErrorObjects,
+    COMPILATION_OT_AddTarget,
+    COMPILATION_OT_RemoveTarget,
+    COMPILATION_OT_CompileTargets,
 )
\ No newline at end of file
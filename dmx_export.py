@@ -0,0 +1,106 @@
+import os
+import time
+
+from .smd_export import SMD_WRITE_BUFFER, extract_mesh_buffers, material_lookup
+from .dmx_format import indexed_mesh_arrays, mesh_dag, model_root, write_binary_dmx
+from .staging import atomic_write
+from .export_progress import run_to_end
+
+
+def object_dag(obj, depsgraph, is_collision_smd, materials):
+    """Évalue un objet et retourne (DmeDag, triangles, octets des tableaux)"""
+    object_eval = obj.evaluated_get(depsgraph)
+    mesh = object_eval.to_mesh()
+    try:
+        mesh.calc_loop_triangles()
+        mesh.transform(obj.matrix_world)
+        buffers = extract_mesh_buffers(mesh)
+    finally:
+        object_eval.to_mesh_clear()
+
+    names, name_index = material_lookup(obj, buffers["material_index"], is_collision_smd)
+    # La collision garde les normales des sommets, comme en SMD
+    return buffers_dag(obj.name, buffers, names, name_index, not is_collision_smd, materials)
+
+
+def buffers_dag(name, buffers, names, name_index, flat_shading, materials):
+    """DmeDag de buffers extraits ; retourne (DmeDag, triangles, octets des tableaux)"""
+    arrays = indexed_mesh_arrays(buffers, names, name_index, flat_shading)
+    payload = sum(arrays[key].nbytes for key in arrays if key != "face_sets")
+    payload += sum(faces.nbytes for _, faces in arrays["face_sets"])
+    return mesh_dag(name, arrays, materials), len(name_index), payload
+
+
+def iter_objects_to_dmx(path, objects, depsgraph, is_collision_smd, on_object=None):
+    """Écrit les objets dans un DMX binaire (un DmeDag par objet, matériaux partagés)
+
+    Chaque mesh évalué est libéré dès que ses tableaux indexés sont construits.
+    on_object reçoit, comme pour le SMD, nom, triangles, octets (taille des
+    tableaux binaires de l'objet), temps mur et temps CPU. Générateur :
+    produit (1, triangles) après chaque objet et retourne le nombre de
+    triangles écrits ; le fichier n'est écrit qu'à la fin.
+    """
+    materials = {}
+    dags = []
+    tri_count = 0
+    for obj in objects:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        dag, obj_tri_count, payload = object_dag(obj, depsgraph, is_collision_smd, materials)
+        dags.append(dag)
+        tri_count += obj_tri_count
+        if on_object is not None:
+            on_object(
+                obj.name,
+                obj_tri_count,
+                payload,
+                time.perf_counter() - wall_start,
+                time.process_time() - cpu_start,
+            )
+        yield 1, obj_tri_count
+
+    root = model_root(os.path.splitext(os.path.basename(path))[0], dags)
+    with atomic_write(path, "wb", buffering=SMD_WRITE_BUFFER) as f:
+        write_binary_dmx(f, root)
+    return tri_count
+
+
+def stream_objects_to_dmx(path, objects, depsgraph, is_collision_smd, on_object=None):
+    """Écrit les objets dans un DMX binaire d'une traite ; retourne le nombre de triangles"""
+    return run_to_end(iter_objects_to_dmx(path, objects, depsgraph, is_collision_smd, on_object))
+
+
+def iter_instances_to_dmx(path, instanced, on_object=None):
+    """Écrit les instances d'un InstancedMeshes dans un DMX binaire (un DmeDag par instance)
+
+    Même contrat que iter_objects_to_dmx.
+    """
+    materials = {}
+    dags = []
+    tri_count = 0
+    for name, key, matrix in instanced.instances:
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        buffers, names, name_index = instanced.world_buffers(key, matrix)
+        dag, instance_tri_count, payload = buffers_dag(name, buffers, names, name_index, instanced.flat_shading, materials)
+        dags.append(dag)
+        tri_count += instance_tri_count
+        if on_object is not None:
+            on_object(
+                name,
+                instance_tri_count,
+                payload,
+                time.perf_counter() - wall_start,
+                time.process_time() - cpu_start,
+            )
+        yield 1, instance_tri_count
+
+    root = model_root(os.path.splitext(os.path.basename(path))[0], dags)
+    with atomic_write(path, "wb", buffering=SMD_WRITE_BUFFER) as f:
+        write_binary_dmx(f, root)
+    return tri_count
+
+
+def stream_instances_to_dmx(path, instanced, on_object=None):
+    """Écrit les instances d'un InstancedMeshes dans un DMX binaire d'une traite"""
+    return run_to_end(iter_instances_to_dmx(path, instanced, on_object))
@@ -0,0 +1,250 @@
+import struct
+import uuid
+
+import numpy as np
+
+from .smd_format import flat_normals
+
+
+# Encodage écrit : keyvalues2 binaire version 2 (table de chaînes pour les
+# types et noms d'attributs), format model 1, lu par le studiomdl de Garry's
+# Mod et des branches Source 2007-2013.
+DMX_ENCODING_VERSION = 2
+DMX_FORMAT = "model"
+DMX_FORMAT_VERSION = 1
+
+DMX_EXTENSION = ".dmx"
+
+# Types d'attributs (datamodel/attributetypes.h)
+AT_ELEMENT = 1
+AT_INT = 2
+AT_FLOAT = 3
+AT_BOOL = 4
+AT_STRING = 5
+AT_VECTOR3 = 10
+AT_QUATERNION = 13
+AT_ELEMENT_ARRAY = 15
+AT_INT_ARRAY = 16
+AT_STRING_ARRAY = 19
+AT_VECTOR2_ARRAY = 23
+AT_VECTOR3_ARRAY = 24
+
+# Espace de noms des identifiants d'éléments : ids stables d'un export à l'autre
+_ID_NAMESPACE = uuid.UUID("5b0f1c4e-8a47-4c5e-9d61-3f0c2a7b9e10")
+
+
+class DmxElement:
+    """Élément DMX : type, nom, identifiant et attributs ordonnés"""
+
+    def __init__(self, type_name, name, id_seed):
+        self.type_name = type_name
+        self.name = name
+        self.id = uuid.uuid5(_ID_NAMESPACE, id_seed).bytes
+        self.attributes = []
+
+    def set(self, name, attribute_type, value):
+        self.attributes.append((name, attribute_type, value))
+        return value
+
+
+def _cstring(text):
+    return text.encode("utf-8") + b"\0"
+
+
+def _collect_elements(root):
+    """Éléments atteignables depuis root, root en premier (ordre de parcours stable)"""
+    elements = []
+    index = {}
+    stack = [root]
+    while stack:
+        element = stack.pop()
+        if id(element) in index:
+            continue
+        index[id(element)] = len(elements)
+        elements.append(element)
+
+        children = []
+        for _, attribute_type, value in element.attributes:
+            if attribute_type == AT_ELEMENT and value is not None:
+                children.append(value)
+            elif attribute_type == AT_ELEMENT_ARRAY:
+                children.extend(value)
+        stack.extend(reversed(children))
+    return elements, index
+
+
+def write_binary_dmx(f, root):
+    """Sérialise root et ses éléments en DMX binaire dans le fichier binaire f"""
+    elements, index = _collect_elements(root)
+
+    # Table de chaînes : types d'éléments et noms d'attributs
+    strings = []
+    symbols = {}
+    for element in elements:
+        for text in [element.type_name] + [name for name, _, _ in element.attributes]:
+            if text not in symbols:
+                symbols[text] = len(strings)
+                strings.append(text)
+
+    f.write(_cstring(
+        f"<!-- dmx encoding binary {DMX_ENCODING_VERSION} format {DMX_FORMAT} {DMX_FORMAT_VERSION} -->\n"
+    ))
+    f.write(struct.pack("<H", len(strings)))
+    f.write(b"".join(_cstring(text) for text in strings))
+
+    f.write(struct.pack("<i", len(elements)))
+    for element in elements:
+        f.write(struct.pack("<H", symbols[element.type_name]))
+        f.write(_cstring(element.name))
+        f.write(element.id)
+
+    for element in elements:
+        f.write(struct.pack("<i", len(element.attributes)))
+        for name, attribute_type, value in element.attributes:
+            f.write(struct.pack("<HB", symbols[name], attribute_type))
+            f.write(_encode_value(attribute_type, value, index))
+
+
+def _encode_value(attribute_type, value, index):
+    if attribute_type == AT_ELEMENT:
+        return struct.pack("<i", index[id(value)] if value is not None else -1)
+    if attribute_type == AT_INT:
+        return struct.pack("<i", value)
+    if attribute_type == AT_FLOAT:
+        return struct.pack("<f", value)
+    if attribute_type == AT_BOOL:
+        return struct.pack("<B", 1 if value else 0)
+    if attribute_type == AT_STRING:
+        return _cstring(value)
+    if attribute_type in (AT_VECTOR3, AT_QUATERNION):
+        return np.asarray(value, dtype="<f4").tobytes()
+    if attribute_type == AT_ELEMENT_ARRAY:
+        return struct.pack("<i", len(value)) + np.array([index[id(item)] for item in value], dtype="<i4").tobytes()
+    if attribute_type == AT_STRING_ARRAY:
+        return struct.pack("<i", len(value)) + b"".join(_cstring(item) for item in value)
+    if attribute_type == AT_INT_ARRAY:
+        return struct.pack("<i", len(value)) + np.ascontiguousarray(value, dtype="<i4").tobytes()
+    if attribute_type in (AT_VECTOR2_ARRAY, AT_VECTOR3_ARRAY):
+        return struct.pack("<i", len(value)) + np.ascontiguousarray(value, dtype="<f4").tobytes()
+    raise ValueError(f"Unsupported DMX attribute type {attribute_type}")
+
+
+def _transform(name, id_seed):
+    transform = DmxElement("DmeTransform", name, id_seed)
+    transform.set("position", AT_VECTOR3, (0.0, 0.0, 0.0))
+    transform.set("orientation", AT_QUATERNION, (0.0, 0.0, 0.0, 1.0))
+    return transform
+
+
+def indexed_mesh_arrays(buffers, names, name_index, flat_shading=True):
+    """Tableaux indexés d'un mesh extrait (mêmes buffers que l'export SMD)
+
+    Positions et normales lisses sont partagées par sommet, les normales
+    plates ajoutées une fois par triangle non lissé, les UVs dédupliqués.
+    Retourne un dict : positions, normals, uvs, leurs index par coin
+    (triangle * 3 + coin) et les faces par nom de matériau.
+    """
+    tri_verts = buffers["tri_verts"]
+    tri_count = len(tri_verts)
+
+    positions = buffers["co"]
+    normals = buffers["normals"]
+    normal_index = tri_verts.copy()
+    if flat_shading:
+        flat = np.flatnonzero(~buffers["use_smooth"])
+        if len(flat):
+            normal_index[flat] = (len(normals) + np.arange(len(flat)))[:, None]
+            normals = np.concatenate((normals, flat_normals(positions[tri_verts[flat]])))
+
+    if buffers["loop_uvs"] is not None:
+        corner_uvs = np.ascontiguousarray(buffers["loop_uvs"][buffers["tri_loops"]].reshape(-1, 2))
+        _, uv_first, uv_index = np.unique(
+            corner_uvs.view(np.int64).ravel(), return_index=True, return_inverse=True
+        )
+        uvs = corner_uvs[uv_first]
+    else:
+        uvs = np.zeros((1, 2), dtype=np.float32)
+        uv_index = np.zeros(tri_count * 3, dtype=np.int64)
+
+    corners = np.arange(tri_count * 3, dtype=np.int32).reshape(tri_count, 3)
+    face_sets = []
+    for material, name in enumerate(names):
+        selected = np.flatnonzero(name_index == material)
+        if len(selected) == 0:
+            continue
+        faces = np.empty((len(selected), 4), dtype=np.int32)
+        faces[:, :3] = corners[selected]
+        faces[:, 3] = -1
+        face_sets.append((name, faces.ravel()))
+
+    return {
+        "positions": positions,
+        "position_indices": tri_verts.ravel(),
+        "normals": normals,
+        "normal_indices": normal_index.ravel(),
+        "uvs": uvs,
+        "uv_indices": uv_index.ravel(),
+        "face_sets": face_sets,
+    }
+
+
+def mesh_dag(name, arrays, materials):
+    """DmeDag + DmeMesh + DmeVertexData d'un objet ; materials partage les DmeMaterial par nom"""
+    vertex_data = DmxElement("DmeVertexData", "bind", f"{name}:bind")
+    vertex_data.set("vertexFormat", AT_STRING_ARRAY, ["positions", "normals", "textureCoordinates"])
+    vertex_data.set("flipVCoordinates", AT_BOOL, True)
+    vertex_data.set("jointCount", AT_INT, 0)
+    vertex_data.set("positions", AT_VECTOR3_ARRAY, arrays["positions"])
+    vertex_data.set("positionsIndices", AT_INT_ARRAY, arrays["position_indices"])
+    vertex_data.set("normals", AT_VECTOR3_ARRAY, arrays["normals"])
+    vertex_data.set("normalsIndices", AT_INT_ARRAY, arrays["normal_indices"])
+    vertex_data.set("textureCoordinates", AT_VECTOR2_ARRAY, arrays["uvs"])
+    vertex_data.set("textureCoordinatesIndices", AT_INT_ARRAY, arrays["uv_indices"])
+
+    face_sets = []
+    for material_name, faces in arrays["face_sets"]:
+        material = materials.get(material_name)
+        if material is None:
+            material = DmxElement("DmeMaterial", material_name, f"material:{material_name}")
+            material.set("mtlName", AT_STRING, material_name)
+            materials[material_name] = material
+        face_set = DmxElement("DmeFaceSet", material_name, f"{name}:faceset:{material_name}")
+        face_set.set("faces", AT_INT_ARRAY, faces)
+        face_set.set("material", AT_ELEMENT, material)
+        face_sets.append(face_set)
+
+    mesh = DmxElement("DmeMesh", name, f"{name}:mesh")
+    mesh.set("visible", AT_BOOL, True)
+    mesh.set("bindState", AT_ELEMENT, vertex_data)
+    mesh.set("currentState", AT_ELEMENT, vertex_data)
+    mesh.set("baseStates", AT_ELEMENT_ARRAY, [vertex_data])
+    mesh.set("deltaStates", AT_ELEMENT_ARRAY, [])
+    mesh.set("faceSets", AT_ELEMENT_ARRAY, face_sets)
+
+    dag = DmxElement("DmeDag", name, f"{name}:dag")
+    dag.transform = dag.set("transform", AT_ELEMENT, _transform(name, f"{name}:transform"))
+    dag.set("shape", AT_ELEMENT, mesh)
+    dag.set("visible", AT_BOOL, True)
+    dag.set("children", AT_ELEMENT_ARRAY, [])
+    return dag
+
+
+def model_root(name, dags):
+    """Racine d'un DMX model : un DmeModel (skeleton et model) dont chaque mesh est un joint"""
+    base_transforms = [_transform(dag.name, f"{dag.name}:base") for dag in dags]
+    base_state = DmxElement("DmeTransformList", "base", f"{name}:base")
+    base_state.set("transforms", AT_ELEMENT_ARRAY, base_transforms)
+
+    model = DmxElement("DmeModel", name, f"{name}:model")
+    model.set("transform", AT_ELEMENT, _transform(name, f"{name}:transform"))
+    model.set("shape", AT_ELEMENT, None)
+    model.set("visible", AT_BOOL, True)
+    model.set("children", AT_ELEMENT_ARRAY, dags)
+    model.set("jointList", AT_ELEMENT_ARRAY, list(dags))
+    model.set("jointTransforms", AT_ELEMENT_ARRAY, [dag.transform for dag in dags])
+    model.set("baseStates", AT_ELEMENT_ARRAY, [base_state])
+
+    root = DmxElement("DmElement", name, f"{name}:root")
+    root.set("skeleton", AT_ELEMENT, model)
+    root.set("model", AT_ELEMENT, model)
+    return root
@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+import numpy as np
+from .staging import atomic_write
+from .smd_export import Skeleton, find_armature, vertex_weight_table
+
+
+# Nom du fichier de cache écrit à côté des SMD
+EXPORT_CACHE_FILENAME = "smd_export_cache.json"
+
+# À incrémenter quand le format de sortie SMD change (invalide tout le cache)
+EXPORT_CACHE_VERSION = 3
+
+
+def _hash_collection(digest, collection, attribute, dtype, components):
+    """Ajoute au hash le buffer d'un attribut lu en bloc avec foreach_get"""
+    buffer = np.empty(len(collection) * components, dtype=dtype)
+    if len(buffer):
+        collection.foreach_get(attribute, buffer)
+    digest.update(attribute.encode())
+    digest.update(np.int64(len(buffer)).tobytes())
+    digest.update(buffer.tobytes())
+
+
+def _hash_instancer(digest, instancer):
+    """Ajoute au hash la place de l'instancer et de chaque objet des collections instanciées"""
+    digest.update(np.array(instancer.matrix_world, dtype=np.float32).tobytes())
+    pending = [instancer.instance_collection]
+    visited = set()
+    while pending:
+        collection = pending.pop(0)
+        if collection.as_pointer() in visited:
+            continue
+        visited.add(collection.as_pointer())
+        digest.update(collection.name.encode() + b"\0")
+        digest.update(np.array(collection.instance_offset, dtype=np.float32).tobytes())
+        for obj in collection.all_objects:
+            digest.update(obj.name.encode() + b"\0")
+            digest.update(np.array(obj.matrix_world, dtype=np.float32).tobytes())
+            if obj.type == 'EMPTY' and obj.instance_type == 'COLLECTION' and obj.instance_collection is not None:
+                pending.append(obj.instance_collection)
+
+
+def fingerprint_objects(objects, depsgraph, is_collision_smd, instancer=None):
+    """Calcule l'empreinte des meshes évalués d'un export SMD
+
+    L'empreinte couvre sommets, loops, taille des faces, UVs, index de
+    matériaux, lissage, matrice monde, noms des slots de matériaux et le
+    flag collision, plus os, pose et poids des sommets pour un mesh déformé
+    par une armature. Le mesh évalué est lu directement, sans to_mesh().
+    Avec un instancer, la place de chaque instance (matrices des objets et
+    des collections) est ajoutée.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    digest.update(f"v{EXPORT_CACHE_VERSION}:collision={bool(is_collision_smd)}".encode())
+    if instancer is not None:
+        _hash_instancer(digest, instancer)
+
+    for obj in objects:
+        object_eval = obj.evaluated_get(depsgraph)
+        mesh = object_eval.data
+
+        digest.update(obj.name.encode())
+        digest.update(np.array(obj.matrix_world, dtype=np.float32).tobytes())
+        for slot in obj.material_slots:
+            digest.update(slot.name.encode() + b"\0")
+
+        _hash_collection(digest, mesh.vertices, "co", np.float32, 3)
+        _hash_collection(digest, mesh.loops, "vertex_index", np.int32, 1)
+        # Même ordre de loops, faces redécoupées (quad + quad -> tri + pentagone) : autres loop_triangles
+        _hash_collection(digest, mesh.polygons, "loop_total", np.int32, 1)
+        _hash_collection(digest, mesh.polygons, "material_index", np.int32, 1)
+        _hash_collection(digest, mesh.polygons, "use_smooth", bool, 1)
+
+        uv_layer = mesh.uv_layers.active
+        if uv_layer:
+            _hash_collection(digest, uv_layer.data, "uv", np.float32, 2)
+        else:
+            digest.update(b"no-uv")
+
+        armature = find_armature(obj)
+        if armature is not None:
+            skeleton = Skeleton(armature)
+            digest.update("\0".join(skeleton.names).encode())
+            digest.update(np.array(skeleton.parents, dtype=np.int32).tobytes())
+            digest.update(skeleton.world_matrices().astype(np.float32).tobytes())
+            for group in obj.vertex_groups:
+                digest.update(group.name.encode() + b"\0")
+            for array in vertex_weight_table(mesh):
+                digest.update(array.tobytes())
+
+    return digest.hexdigest()
+
+
+class SMDExportCache:
+    """Cache persistant des SMD exportés, indexé par empreinte de mesh"""
+
+    def __init__(self, directory):
+        self.path = os.path.join(directory, EXPORT_CACHE_FILENAME)
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+        if os.path.exists(self.path):
+            try:
+                with open(self.path, "r") as f:
+                    data = json.load(f)
+                if data.get("version") == EXPORT_CACHE_VERSION:
+                    self.entries = data.get("entries", {})
+            except (OSError, ValueError):
+                print(f"[CACHE] Ignoring unreadable export cache: {self.path}")
+
+    def is_fresh(self, smd_path, fingerprint):
+        """Vrai si le SMD existant correspond à l'empreinte"""
+        entry = self.entries.get(os.path.basename(smd_path))
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return False
+        return os.path.exists(smd_path) and os.path.getsize(smd_path) == entry.get("size")
+
+    def store(self, smd_path, fingerprint, parts=()):
+        """Enregistre un SMD ; parts : fichiers des autres parts d'un body découpé"""
+        entry = {
+            "fingerprint": fingerprint,
+            "size": os.path.getsize(smd_path),
+        }
+        if parts:
+            entry["parts"] = list(parts)
+        self.entries[os.path.basename(smd_path)] = entry
+
+    def parts(self, smd_path):
+        """Autres parts enregistrées avec un SMD (vide pour un body non découpé)"""
+        return self.entries.get(os.path.basename(smd_path), {}).get("parts", [])
+
+    def save(self):
+        with atomic_write(self.path) as f:
+            json.dump({"version": EXPORT_CACHE_VERSION, "entries": self.entries}, f, indent=1)
+
+    def summary(self):
+        return f"SMD cache: {self.hits} hit(s), {self.misses} miss(es)"
@@ -0,0 +1,240 @@
+import os
+import bpy
+
+from .flex_export import flex_objects, flex_names
+from .smd_export import find_armature
+from .dmx_format import DMX_EXTENSION
+
+
+def is_collection_instancer(obj):
+    """Vrai pour un EMPTY qui instancie une collection"""
+    return obj.type == 'EMPTY' and obj.instance_type == 'COLLECTION' and obj.instance_collection is not None
+
+
+def instanced_mesh_objects(collection):
+    """Objets mesh uniques d'une collection, collections instanciées imbriquées comprises"""
+    meshes = []
+    seen = set()
+    pending = [collection]
+    visited = set()
+    while pending:
+        current = pending.pop(0)
+        if current.as_pointer() in visited:
+            continue
+        visited.add(current.as_pointer())
+        for obj in current.all_objects:
+            if obj.type == 'MESH' and obj.as_pointer() not in seen:
+                seen.add(obj.as_pointer())
+                meshes.append(obj)
+            elif is_collection_instancer(obj):
+                pending.append(obj.instance_collection)
+    return meshes
+
+
+class ExportJob:
+    """Un fichier SMD ou DMX à écrire : une source (objet ou collection) et un flag collision"""
+
+    def __init__(self, source, is_collision, filename):
+        self.source = source
+        self.is_collision = is_collision
+        self.filename = filename
+        self.roles = []
+        # Fichiers supplémentaires d'un body découpé sous les limites de studiomdl
+        self.part_filenames = []
+
+    @property
+    def model_name(self):
+        """Nom du modèle tel que référencé dans le QC (sans extension)"""
+        return os.path.splitext(self.filename)[0]
+
+    @property
+    def is_body(self):
+        return any(role.startswith("body:") for role in self.roles)
+
+    @property
+    def filenames(self):
+        """Fichier principal puis parts éventuelles"""
+        return [self.filename] + self.part_filenames
+
+    @property
+    def is_instancer(self):
+        return isinstance(self.source, bpy.types.Object) and is_collection_instancer(self.source)
+
+    @property
+    def objects(self):
+        """Objets mesh à écrire dans ce SMD (meshes uniques instanciés pour un instancer)"""
+        if isinstance(self.source, bpy.types.Collection):
+            return [obj for obj in self.source.all_objects if obj.type == 'MESH']
+        if self.is_instancer:
+            return instanced_mesh_objects(self.source.instance_collection)
+        return [self.source]
+
+
+class SequenceJob:
+    """Un SMD d'animation à écrire pour une séquence activée"""
+
+    def __init__(self, sequence, filename):
+        self.sequence = sequence
+        self.filename = filename
+
+
+class FlexJob:
+    """Un VTA à écrire pour les shape keys des meshes d'un body"""
+
+    def __init__(self, body_job, objects, names, filename):
+        self.body_job = body_job
+        self.objects = objects
+        self.names = names
+        self.filename = filename
+
+
+class ExportPlan:
+    """Plan d'export : chaque couple (source, collision) n'est évalué et écrit qu'une fois"""
+
+    def __init__(self, mesh_format='SMD'):
+        self.mesh_format = mesh_format
+        self.jobs = []
+        self.sequence_jobs = []
+        self.flex_jobs = []
+        self._by_key = {}
+        self._sequences = {}
+        self._flexes = {}
+        self._used_filenames = set()
+
+    def add(self, source, is_collision, role):
+        """Ajoute un rôle pour une source et retourne le job correspondant"""
+        key = (source.as_pointer(), bool(is_collision))
+        job = self._by_key.get(key)
+        if job is None:
+            job = ExportJob(source, bool(is_collision), None)
+            job.filename = self._unique_filename(source.name, is_collision, self._mesh_extension(job))
+            self._by_key[key] = job
+            self.jobs.append(job)
+        job.roles.append(role)
+        return job
+
+    def _mesh_extension(self, job):
+        # Le DMX écrit des meshes statiques : les meshes skinnés restent en SMD
+        if self.mesh_format == 'DMX' and not any(find_armature(obj) for obj in job.objects):
+            return DMX_EXTENSION
+        return ".smd"
+
+    def qc_reference(self, job):
+        """Nom à écrire dans le QC : sans extension pour un SMD, fichier complet pour un DMX"""
+        if job.filename.endswith(DMX_EXTENSION):
+            return job.filename
+        return job.model_name
+
+    def add_part(self, job):
+        """Réserve le fichier de la part suivante d'un body découpé"""
+        extension = os.path.splitext(job.filename)[1]
+        filename = self._unique_filename(f"{job.model_name}_part{len(job.part_filenames) + 2}", False, extension)
+        job.part_filenames.append(filename)
+        return filename
+
+    def get(self, source, is_collision=False):
+        return self._by_key.get((source.as_pointer(), bool(is_collision)))
+
+    def add_sequence(self, sequence):
+        job = SequenceJob(sequence, self._unique_filename(f"{sequence.name}_anim", False))
+        self._sequences[sequence.as_pointer()] = job
+        self.sequence_jobs.append(job)
+        return job
+
+    def get_sequence(self, sequence):
+        return self._sequences.get(sequence.as_pointer())
+
+    def add_flex(self, body_job, objects, names):
+        job = FlexJob(body_job, objects, names, self._unique_filename(body_job.model_name, False, ".vta"))
+        self._flexes[body_job.source.as_pointer()] = job
+        self.flex_jobs.append(job)
+        return job
+
+    def get_flex(self, source):
+        return self._flexes.get(source.as_pointer())
+
+    def remove_flex(self, body_job):
+        job = self._flexes.pop(body_job.source.as_pointer(), None)
+        if job is not None:
+            self.flex_jobs.remove(job)
+        return job
+
+    def filenames(self):
+        return (
+            [filename for job in self.jobs for filename in job.filenames]
+            + [job.filename for job in self.sequence_jobs]
+            + [job.filename for job in self.flex_jobs]
+        )
+
+    def _unique_filename(self, name, is_collision, extension=".smd"):
+        filename = f"{name}{extension}"
+        if filename in self._used_filenames and is_collision:
+            filename = f"{name}_phy{extension}"
+        index = 2
+        while filename in self._used_filenames:
+            filename = f"{name}_{index}{extension}"
+            index += 1
+        self._used_filenames.add(filename)
+        return filename
+
+
+def single_body(scene):
+    """Le body écrit en $body (un seul body, non blank), sinon None"""
+    if len(scene.body_list) == 1 and not scene.body_list[0].blank:
+        return scene.body_list[0]
+    return None
+
+
+def body_groups(scene):
+    """Bodygroups dans l'ordre de première apparition : [(nom, [bodies])]"""
+    groups = {}
+    for body in scene.body_list:
+        groups.setdefault(body.bodygroup or "Body", []).append(body)
+    return list(groups.items())
+
+
+def reference_body(scene):
+    """Premier body non blank (référence des séquences), ou le premier body"""
+    return next((body for body in scene.body_list if not body.blank), scene.body_list[0])
+
+
+def build_export_plan(scene):
+    """Construit le plan d'export à partir des bodies, LODs, shadow LOD et collision"""
+    props = scene.compilation_props
+    plan = ExportPlan(props.output_format)
+
+    # Un même objet utilisé dans plusieurs bodygroups n'est évalué et écrit qu'une fois
+    for body in scene.body_list:
+        if body.mesh_object and not body.blank:
+            plan.add(body.mesh_object, False, f"body:{body.name}")
+
+    # Les flexes ne sont possibles que dans un $model : un seul body, hors instancer
+    # (un mesh instancé plusieurs fois n'a pas d'index de sommets stable dans le VTA)
+    body = single_body(scene)
+    body_job = plan.get(body.mesh_object) if body is not None and body.mesh_object else None
+    if props.export_flexes and body_job is not None and not body_job.is_instancer:
+        objects = flex_objects(body_job.objects)
+        names = flex_names(objects)
+        if names:
+            plan.add_flex(body_job, objects, names)
+
+    # Seuls les LODs complets (from ET to) sont écrits dans le QC
+    for lod in scene.lod_list:
+        if lod.replace_model_from_obj and lod.replace_model_to_obj:
+            plan.add(lod.replace_model_from_obj, False, f"lod{lod.lod_level}:from")
+            plan.add(lod.replace_model_to_obj, False, f"lod{lod.lod_level}:to")
+
+    if props.enable_shadowlod and props.shadowlod_replace_from_obj and props.shadowlod_replace_to_obj:
+        plan.add(props.shadowlod_replace_from_obj, False, "shadowlod:from")
+        plan.add(props.shadowlod_replace_to_obj, False, "shadowlod:to")
+
+    if props.collision_mesh and props.collision_mesh.type == 'MESH':
+        plan.add(props.collision_mesh, True, "collision")
+
+    # Une animation par séquence activée qui a une source
+    for seq in scene.sequence_list:
+        source = seq.animation_armature if seq.animation_mode == 'ARMATURE' else seq.animation_mesh
+        if seq.enabled and source is not None:
+            plan.add_sequence(seq)
+
+    return plan
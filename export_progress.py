@@ -0,0 +1,102 @@
+import time
+
+
+class ExportProgress:
+    """Avancement de l'export découpé en tranches, affiché par le panel et la barre de progression
+
+    Les totaux sont des estimations lues sur les meshes évalués ; chaque
+    job terminé recale les compteurs sur ses totaux, un job réutilisé
+    (cache, watch) avance donc d'un coup.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.running = False
+        self.stage = ""
+        self.objects_done = 0
+        self.objects_total = 0
+        self.triangles_done = 0
+        self.triangles_total = 0
+        self.start_time = None
+        self._job_objects = (0, 0)
+        self._job_triangles = (0, 0)
+
+    def start(self):
+        self.reset()
+        self.running = True
+        self.start_time = time.monotonic()
+        self.stage = "Preparing"
+
+    def finish(self):
+        self.running = False
+
+    def add_totals(self, objects, triangles):
+        self.objects_total += objects
+        self.triangles_total += triangles
+
+    def begin_job(self, objects, triangles):
+        self._job_objects = (self.objects_done, objects)
+        self._job_triangles = (self.triangles_done, triangles)
+
+    def advance(self, objects=0, triangles=0):
+        self.objects_done += objects
+        self.triangles_done += triangles
+
+    def end_job(self):
+        start, count = self._job_objects
+        self.objects_done = max(self.objects_done, start + count)
+        start, count = self._job_triangles
+        self.triangles_done = max(self.triangles_done, start + count)
+
+    @property
+    def fraction(self):
+        if self.triangles_total > 0:
+            return min(self.triangles_done / self.triangles_total, 1.0)
+        if self.objects_total > 0:
+            return min(self.objects_done / self.objects_total, 1.0)
+        return 0.0
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        return time.monotonic() - self.start_time
+
+    @property
+    def eta(self):
+        """Secondes restantes estimées au rythme actuel, ou None au début de l'export"""
+        fraction = self.fraction
+        if fraction <= 0.0:
+            return None
+        return self.elapsed * (1.0 - fraction) / fraction
+
+
+# Avancement partagé entre l'opérateur modal et le panel
+export_progress = ExportProgress()
+
+
+def run_to_end(generator):
+    """Exécute un générateur d'export jusqu'au bout et retourne sa valeur de retour"""
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return stop.value
+
+
+def run_slice(generator, budget):
+    """Avance un générateur d'export pendant au plus budget secondes
+
+    Retourne (terminé, valeur de retour). Une étape commencée va toujours
+    jusqu'à son prochain envoi : le budget est dépassé d'au plus un bloc.
+    """
+    deadline = time.perf_counter() + budget
+    while True:
+        try:
+            next(generator)
+        except StopIteration as stop:
+            return True, stop.value
+        if time.perf_counter() >= deadline:
+            return False, None
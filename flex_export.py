@@ -0,0 +1,172 @@
+import re
+
+import numpy as np
+
+from .smd_format import format_vertex_frame, format_vta_header
+from .smd_export import SMD_WRITE_BUFFER
+from .staging import atomic_write
+
+
+# Déplacement minimal (unités Blender) pour qu'un sommet soit écrit dans une frame de flex
+DEFAULT_FLEX_TOLERANCE = 1.0e-4
+
+# Groupe des flexcontrollers générés dans le QC
+FLEX_CONTROLLER_GROUP = "shapekeys"
+
+
+def flex_objects(objects):
+    """Meshes qui ont au moins une shape key en plus de la clé de référence"""
+    return [
+        obj for obj in objects
+        if obj.type == 'MESH' and obj.data.shape_keys is not None and len(obj.data.shape_keys.key_blocks) > 1
+    ]
+
+
+def flex_key_blocks(obj):
+    """Shape keys exportées d'un objet (hors clé de référence et clés muettes)"""
+    shape_keys = obj.data.shape_keys
+    return [key for key in shape_keys.key_blocks if key != shape_keys.reference_key and not key.mute]
+
+
+def qc_flex_name(name):
+    """Nom utilisable comme flex/flexcontroller dans le QC"""
+    return re.sub(r"[^A-Za-z0-9_]", "_", name)
+
+
+def flex_names(objects):
+    """Noms QC des flexes, dans l'ordre de première apparition, sans doublon"""
+    names = []
+    for obj in objects:
+        for key in flex_key_blocks(obj):
+            name = qc_flex_name(key.name)
+            if name not in names:
+                names.append(name)
+    return names
+
+
+def _key_positions(key_block, vert_count):
+    co = np.empty(vert_count * 3, dtype=np.float32)
+    key_block.data.foreach_get("co", co)
+    return co.reshape(vert_count, 3)
+
+
+def _key_normals(key_block):
+    return np.array(key_block.normals_vertex_get(), dtype=np.float32).reshape(-1, 3)
+
+
+def evaluated_vertex_count(obj, depsgraph):
+    """Sommets du mesh évalué : différent de obj.data si un modificateur change la topologie"""
+    return len(obj.evaluated_get(depsgraph).data.vertices)
+
+
+class FlexSource:
+    """Shape keys d'un objet, transformées en espace monde comme le SMD de référence
+
+    La frame 0 est lue sur le mesh évalué, celui du SMD de référence
+    (modificateurs et valeurs courantes des shape keys appliqués) : studiomdl
+    y retrouve les sommets du modèle. Les flexes ajoutent à ces positions
+    le déplacement de chaque clé par rapport à sa clé relative.
+    """
+
+    def __init__(self, obj, first_index, depsgraph):
+        self.obj = obj
+        self.first_index = first_index
+        self.vert_count = len(obj.data.vertices)
+        mesh = obj.evaluated_get(depsgraph).data
+        if len(mesh.vertices) != self.vert_count:
+            raise Exception(
+                f"Flexes of '{obj.name}': modifiers change the vertex count "
+                f"({self.vert_count} -> {len(mesh.vertices)}), apply them or disable flex export"
+            )
+        self.keys = {qc_flex_name(key.name): key for key in flex_key_blocks(obj)}
+
+        matrix = np.array(obj.matrix_world, dtype=np.float64)
+        self._rotation = matrix[:3, :3].T
+        self._translation = matrix[:3, 3]
+        self._normal_matrix = np.linalg.inv(matrix[:3, :3])
+
+        self.reference_positions = _key_positions(obj.data.shape_keys.reference_key, self.vert_count)
+        self.base_positions = np.empty(self.vert_count * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("co", self.base_positions)
+        self.base_positions = self.base_positions.reshape(-1, 3)
+        self.base_normals = np.empty(self.vert_count * 3, dtype=np.float32)
+        mesh.vertices.foreach_get("normal", self.base_normals)
+        self.base_normals = self.base_normals.reshape(-1, 3)
+
+    def world_positions(self, positions):
+        return positions @ self._rotation + self._translation
+
+    def world_normals(self, normals):
+        normals = normals @ self._normal_matrix
+        length = np.linalg.norm(normals, axis=1, keepdims=True)
+        return normals / np.where(length > 0.0, length, 1.0)
+
+    def base_frame(self):
+        indices = self.first_index + np.arange(self.vert_count)
+        return format_vertex_frame(indices, self.world_positions(self.base_positions), self.world_normals(self.base_normals))
+
+    def flex_frame(self, name, tolerance):
+        """Sommets déplacés de plus de tolerance pour un flex ("" si l'objet n'a pas cette clé)"""
+        key = self.keys.get(name)
+        if key is None:
+            return ""
+
+        positions = _key_positions(key, self.vert_count)
+        relative = key.relative_key
+        relative_positions = self.reference_positions if relative == key.id_data.reference_key else _key_positions(relative, self.vert_count)
+        delta = positions - relative_positions
+
+        moved = np.flatnonzero(np.einsum("ij,ij->i", delta, delta) > tolerance * tolerance)
+        if len(moved) == 0:
+            return ""
+
+        normals = _key_normals(key)[moved]
+        return format_vertex_frame(
+            self.first_index + moved,
+            self.world_positions(self.base_positions[moved] + delta[moved]),
+            self.world_normals(normals),
+        )
+
+
+def write_vta(path, objects, names, depsgraph, tolerance=DEFAULT_FLEX_TOLERANCE):
+    """Écrit un VTA creux : frame 0 complète, puis seulement les sommets déplacés de chaque flex
+
+    depsgraph donne les meshes évalués écrits dans le SMD de référence.
+    Retourne le nombre de lignes de sommets écrites dans les frames de flex.
+    """
+    sources = []
+    first_index = 0
+    for obj in objects:
+        source = FlexSource(obj, first_index, depsgraph)
+        sources.append(source)
+        first_index += source.vert_count
+
+    written = 0
+    with atomic_write(path, "w", buffering=SMD_WRITE_BUFFER) as f:
+        f.write(format_vta_header(len(names) + 1))
+        f.write("time 0\n")
+        for source in sources:
+            f.write(source.base_frame())
+        for frame, name in enumerate(names, start=1):
+            f.write(f"time {frame}\n")
+            for source in sources:
+                text = source.flex_frame(name, tolerance)
+                written += text.count("\n")
+                f.write(text)
+        f.write("end\n")
+    return written
+
+
+def write_flex_model(f, body_name, smd_filename, vta_filename, names):
+    """Bloc $model avec flexfile, flexcontrollers et règles de flex pour un body"""
+    f.write(f'$model "{body_name}" "{smd_filename}" {{\n')
+    f.write(f'\tflexfile "{vta_filename}" {{\n')
+    f.write('\t\tdefaultflex frame 0\n')
+    for frame, name in enumerate(names, start=1):
+        f.write(f'\t\tflex "{name}" frame {frame}\n')
+    f.write('\t}\n')
+    for name in names:
+        f.write(f'\tflexcontroller {FLEX_CONTROLLER_GROUP} range 0 1 "{name}"\n')
+    for name in names:
+        f.write(f'\t%{name} = {name}\n')
+    f.write('}\n\n')
@@ -0,0 +1,257 @@
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+
+import bpy
+
+from .compilation import CompilePipeline
+from .studiomdl_runner import compile_log
+from .studiomdl_output import studiomdl_output
+from .compiled_model import model_stats
+from .batch_compile import BatchJob, BatchQueue
+
+
+# Point d'entrée en ligne de commande (build farm, sans interface).
+#
+# Compiler une scène d'un .blend :
+#   blender -b model.blend --python-expr "import sys; from lw_ModelToGmodHelper import headless; sys.exit(headless.main())" -- --result result.json
+#
+# Options (après le "--") :
+#   --scene NOM          scène à compiler (répétable, défaut : scène active)
+#   --overrides FICHIER  JSON qui remplace compilation_props / body_list / lod_list / sequence_list
+#   --result FICHIER     rapport JSON lisible par machine (statut, erreurs, durées, log studiomdl)
+#   --blend FICHIER      compile ces .blend, chacun dans son propre Blender en arrière-plan (répétable)
+#   --jobs N             nombre de .blend compilés en parallèle avec --blend
+#   --sandbox DOSSIER    écrit QC et SMD dans ce dossier (un sous-dossier par scène) au lieu du jeu
+#
+# Avec le module bpy de pip, le même point d'entrée s'utilise avec
+#   python -m lw_ModelToGmodHelper.headless --open model.blend --result result.json
+#
+# Le code de retour vaut 0 si toutes les compilations ont réussi, 1 sinon.
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+
+
+class HeadlessContext:
+    """Contexte minimal (scene + depsgraph) utilisable sans fenêtre"""
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.view_layer = scene.view_layers[0]
+
+    def evaluated_depsgraph_get(self):
+        depsgraph = self.view_layer.depsgraph
+        depsgraph.update()
+        return depsgraph
+
+
+class HeadlessCompile(CompilePipeline):
+    """Pipeline de compilation sans opérateur : les messages sont collectés"""
+
+    def __init__(self):
+        self.messages = []
+
+    def report(self, level, message):
+        for kind in level:
+            self.messages.append({"level": kind, "message": message})
+        print(f"[{'/'.join(sorted(level))}] {message}")
+
+
+def _resolve_pointer(prop, value):
+    """Retrouve le datablock nommé value pour une PointerProperty"""
+    if value is None or value == "":
+        return None
+    if prop.fixed_type.identifier == 'Collection':
+        return bpy.data.collections[value]
+    if prop.fixed_type.identifier == 'Action':
+        return bpy.data.actions[value]
+    return bpy.data.objects[value]
+
+
+def apply_property_values(target, values):
+    """Applique un dictionnaire de valeurs JSON sur un PropertyGroup
+
+    Les PointerProperty reçoivent le nom du datablock (objet ou collection).
+    """
+    for key, value in values.items():
+        prop = target.bl_rna.properties.get(key)
+        if prop is None:
+            raise KeyError(f"Unknown property '{key}' on {target.bl_rna.identifier}")
+        if prop.type == 'POINTER':
+            value = _resolve_pointer(prop, value)
+        setattr(target, key, value)
+
+
+def apply_overrides(scene, overrides):
+    """Applique un fichier d'overrides JSON à la scène"""
+    if "compilation_props" in overrides:
+        apply_property_values(scene.compilation_props, overrides["compilation_props"])
+
+    for list_name in ("body_list", "lod_list", "sequence_list"):
+        if list_name not in overrides:
+            continue
+        collection = getattr(scene, list_name)
+        collection.clear()
+        for values in overrides[list_name]:
+            apply_property_values(collection.add(), values)
+
+
+def compile_scene(scene, sandbox_dir=None):
+    """Exécute QC → export → staging → studiomdl pour une scène, retourne un rapport
+
+    Avec sandbox_dir, QC et SMD restent dans ce répertoire et studiomdl les
+    y lit : plusieurs compiles en parallèle pour un même jeu ne partagent ni
+    model_compile.qc ni les SMD de même nom.
+    """
+    context = HeadlessContext(scene)
+    runner = HeadlessCompile()
+    result = {
+        "scene": scene.name,
+        "status": "failed",
+        "error": "",
+        "qc": "",
+        "game_dir": "",
+        "cache": "",
+        "from_cache": False,
+        "seconds": 0.0,
+    }
+    start = time.monotonic()
+
+    try:
+        if not runner.check_compile_config(context):
+            # La pré-vérification peut signaler plusieurs erreurs (et des avertissements)
+            errors = [message["message"] for message in runner.messages if message["level"] == 'ERROR']
+            raise Exception("; ".join(errors) if errors else "Invalid compilation configuration")
+
+        game_dir, qc_path = runner.prepare_compile(context, sandbox_dir)
+        result["game_dir"] = game_dir
+        result["qc"] = qc_path
+        result["cache"] = runner.cache_summary
+
+        if runner.restore_artifacts(context, game_dir, qc_path):
+            result["from_cache"] = True
+        else:
+            runner.run_studiomdl(context, game_dir, qc_path)
+            runner.store_artifacts(context, game_dir)
+        result["status"] = "succeeded"
+        runner.report_model_stats(context, game_dir)
+        result["model_stats"] = model_stats.stats
+    except Exception as e:
+        result["error"] = str(e)
+        traceback.print_exc()
+
+    if runner.profiler is not None:
+        result["stages"] = runner.profiler.to_dict(result["status"])["stages"]
+    runner.finish_instrumentation(context, result["status"])
+
+    result["seconds"] = round(time.monotonic() - start, 3)
+    result["messages"] = runner.messages
+    result["studiomdl_log"] = [f"[{stream}] {line}" for stream, line in compile_log.lines]
+    result["studiomdl_summary"] = studiomdl_output.to_dict()
+    return result
+
+
+def compile_blend_files(blend_files, jobs, result_dir):
+    """Compile plusieurs .blend en parallèle, un Blender en arrière-plan par fichier"""
+    queue = BatchQueue(jobs)
+    package = __package__ or "lw_ModelToGmodHelper"
+    expr = f"import sys; from {package} import headless; sys.exit(headless.main())"
+
+    for blend_file in blend_files:
+        name = os.path.splitext(os.path.basename(blend_file))[0]
+        sandbox = os.path.join(result_dir, name)
+        os.makedirs(sandbox, exist_ok=True)
+        job = queue.add(BatchJob(name, sandbox))
+        job.ready(
+            [bpy.app.binary_path, "-b", os.path.abspath(blend_file), "--python-expr", expr,
+             "--", "--result", os.path.join(sandbox, "result.json"), "--sandbox", sandbox],
+            sandbox,
+            0,
+        )
+
+    queue.run()
+    queue.write_summary(os.path.join(result_dir, "batch_summary.json"))
+    print(f"[HEADLESS] {queue.summary()}")
+
+    results = []
+    for job in queue.jobs:
+        result_path = os.path.join(job.sandbox_dir, "result.json")
+        if os.path.exists(result_path):
+            with open(result_path, "r") as f:
+                results.extend(json.load(f).get("results", []))
+        else:
+            results.append({"scene": job.name, "status": "failed", "error": job.error})
+    return results
+
+
+def _script_args(argv):
+    # Sous Blender, les arguments du script suivent "--"
+    if argv is None:
+        argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else sys.argv[1:]
+    return argv
+
+
+def main(argv=None):
+    """Point d'entrée : retourne le code de sortie du process"""
+    parser = argparse.ArgumentParser(prog="headless", description="LW ModelToGmodHelper headless compile")
+    parser.add_argument("--open", help=".blend file to open first (bpy module usage)")
+    parser.add_argument("--scene", action="append", default=[], help="Scene to compile (repeatable)")
+    parser.add_argument("--overrides", help="JSON file overriding the scene compile settings")
+    parser.add_argument("--result", help="Machine-readable JSON result file")
+    parser.add_argument("--blend", action="append", default=[], help=".blend file to compile in its own process (repeatable)")
+    parser.add_argument("--sandbox", help="Directory for the QC and SMD files instead of the game directory")
+    parser.add_argument("--jobs", type=int, default=max(1, (os.cpu_count() or 2) // 2), help="Parallel .blend compiles")
+    args = parser.parse_args(_script_args(argv))
+
+    if args.open:
+        bpy.ops.wm.open_mainfile(filepath=os.path.abspath(args.open))
+
+    # Avec le module bpy, l'addon n'est pas enregistré automatiquement
+    if not hasattr(bpy.types.Scene, "compilation_props"):
+        from . import register
+        register()
+
+    start = time.monotonic()
+    try:
+        if args.blend:
+            result_dir = os.path.dirname(os.path.abspath(args.result)) if args.result else bpy.app.tempdir
+            results = compile_blend_files(args.blend, args.jobs, result_dir)
+        else:
+            overrides = {}
+            if args.overrides:
+                with open(args.overrides, "r") as f:
+                    overrides = json.load(f)
+
+            scene_names = args.scene or [bpy.context.scene.name]
+            results = []
+            for scene_name in scene_names:
+                scene = bpy.data.scenes[scene_name]
+                apply_overrides(scene, overrides)
+                sandbox_dir = os.path.join(os.path.abspath(args.sandbox), bpy.path.clean_name(scene.name)) if args.sandbox else None
+                results.append(compile_scene(scene, sandbox_dir))
+    except Exception as e:
+        traceback.print_exc()
+        results = [{"scene": "", "status": "failed", "error": str(e)}]
+
+    succeeded = all(result["status"] == "succeeded" for result in results)
+    report = {
+        "status": "succeeded" if succeeded else "failed",
+        "seconds": round(time.monotonic() - start, 3),
+        "blend_file": bpy.data.filepath,
+        "results": results,
+    }
+
+    if args.result:
+        with open(args.result, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"[HEADLESS] {report['status']} in {report['seconds']} s")
+    return EXIT_OK if succeeded else EXIT_FAILED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,214 @@
+import os
+import json
+import time
+import cProfile
+import tracemalloc
+from contextlib import contextmanager
+
+
+class StageRecord:
+    """Mesures d'une étape du pipeline (et de ses objets exportés)"""
+
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.peak_memory = 0
+        self.triangles = 0
+        self.bytes = 0
+        self.objects = []
+
+    def add_object(self, name, triangles, bytes_written, wall, cpu, cached=False):
+        self.objects.append({
+            "name": name,
+            "triangles": triangles,
+            "bytes": bytes_written,
+            "wall_seconds": round(wall, 4),
+            "cpu_seconds": round(cpu, 4),
+            "cached": cached,
+        })
+        self.triangles += triangles
+        self.bytes += bytes_written
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "wall_seconds": round(self.wall, 4),
+            "cpu_seconds": round(self.cpu, 4),
+            "peak_memory_bytes": self.peak_memory,
+            "triangles": self.triangles,
+            "bytes": self.bytes,
+            "objects": self.objects,
+        }
+
+
+class CompileProfiler:
+    """Instrumentation du compile : temps mur/CPU, mémoire tracée, triangles et octets par étape
+
+    trace_memory active tracemalloc (pic mémoire Python/NumPy par étape,
+    avec un surcoût). profile active cProfile sur tout le compile ; les
+    statistiques sont sauvées au format pstats par save_profile().
+    """
+
+    def __init__(self, trace_memory=False, profile=False):
+        self.stages = []
+        self.trace_memory = trace_memory
+        self.start_time = time.perf_counter()
+        self._started_tracemalloc = False
+        self._profiler = None
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if profile:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    @contextmanager
+    def stage(self, name):
+        record = StageRecord(name)
+        self.stages.append(record)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - wall_start
+            record.cpu = time.process_time() - cpu_start
+            if self.trace_memory:
+                record.peak_memory = tracemalloc.get_traced_memory()[1]
+
+    def add_stage(self, name, wall, cpu=0.0):
+        """Enregistre une étape mesurée ailleurs (ex. studiomdl en mode modal)"""
+        record = StageRecord(name)
+        record.wall = wall
+        record.cpu = cpu
+        self.stages.append(record)
+        return record
+
+    def stop(self):
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def save_profile(self, path):
+        """Écrit les statistiques cProfile au format pstats"""
+        if self._profiler is None:
+            return None
+        self._profiler.dump_stats(path)
+        return path
+
+    def to_dict(self, status=""):
+        return {
+            "status": status,
+            "total_seconds": round(time.perf_counter() - self.start_time, 4),
+            "stages": [stage.to_dict() for stage in self.stages],
+        }
+
+    def write_report(self, path, status=""):
+        with open(path, "w") as f:
+            json.dump(self.to_dict(status), f, indent=2)
+        return path
+
+    def summary_lines(self):
+        lines = []
+        for stage in self.stages:
+            line = f"{stage.name}: {stage.wall:.2f} s"
+            if stage.triangles:
+                line += f", {stage.triangles} tris"
+            if stage.bytes:
+                line += f", {stage.bytes / (1024 * 1024):.1f} MB"
+            if stage.peak_memory:
+                line += f", peak {stage.peak_memory / (1024 * 1024):.1f} MB"
+            lines.append(line)
+        return lines
+
+
+# Derniers chiffres par format de mesh (SMD/DMX), écrits à côté du QC
+FORMAT_STATS_FILENAME = "compile_format_stats.json"
+
+
+def _stage_value(profiler, name, attribute):
+    return sum(getattr(stage, attribute) for stage in profiler.stages if stage.name == name)
+
+
+def record_format_run(profiler, output_dir, mesh_paths):
+    """Mémorise taille et temps du compile pour son format et retourne la ligne de comparaison (ou "")
+
+    La taille est celle des fichiers de mesh écrits (mesh_paths). Le format
+    est lu sur leurs extensions : un compile qui mélange SMD et DMX (meshes
+    skinnés restés en SMD) n'est pas comparable et n'est pas enregistré.
+    """
+    extensions = {os.path.splitext(mesh_path)[1].lower() for mesh_path in mesh_paths}
+    if len(extensions) != 1:
+        return ""
+    output_format = extensions.pop().lstrip(".").upper()
+
+    path = os.path.join(output_dir, FORMAT_STATS_FILENAME)
+    stats = {}
+    if os.path.exists(path):
+        try:
+            with open(path, "r") as f:
+                stats = json.load(f)
+        except (OSError, ValueError):
+            stats = {}
+
+    stats[output_format] = {
+        "bytes": sum(os.path.getsize(mesh_path) for mesh_path in mesh_paths if os.path.exists(mesh_path)),
+        "export_seconds": round(_stage_value(profiler, "export_meshes", "wall"), 4),
+        "studiomdl_seconds": round(_stage_value(profiler, "studiomdl", "wall"), 4),
+        "total_seconds": round(time.perf_counter() - profiler.start_time, 4),
+    }
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=2)
+
+    other_format = "SMD" if output_format == "DMX" else "DMX"
+    current = stats[output_format]
+    other = stats.get(other_format)
+    if not other or not other["bytes"] or not other["total_seconds"]:
+        return ""
+    return (
+        f"{output_format} vs {other_format}: {current['bytes'] / other['bytes']:.0%} size, "
+        f"{current['total_seconds'] / other['total_seconds']:.0%} compile time "
+        f"(studiomdl {current['studiomdl_seconds']:.2f} s vs {other['studiomdl_seconds']:.2f} s)"
+    )
+
+
+class RunStats:
+    """Résumé du dernier compile, affiché par le panel"""
+
+    def __init__(self):
+        self.lines = []
+        self.report_path = ""
+        self.profile_path = ""
+
+
+run_stats = RunStats()
+
+
+def finish_profiler(profiler, output_dir, status, write_report=True, mesh_paths=None):
+    """Arrête le profiler, écrit le rapport JSON (et le pstats) et met à jour run_stats
+
+    Avec mesh_paths (fichiers de mesh d'un compile complet), un compile
+    réussi est comparé au dernier compile réussi dans l'autre format.
+    """
+    profiler.stop()
+    os.makedirs(output_dir, exist_ok=True)
+
+    run_stats.lines = profiler.summary_lines()
+    if mesh_paths and status == "succeeded":
+        comparison = record_format_run(profiler, output_dir, mesh_paths)
+        if comparison:
+            run_stats.lines.append(comparison)
+    run_stats.report_path = ""
+    run_stats.profile_path = profiler.save_profile(os.path.join(output_dir, "compile_profile.prof")) or ""
+
+    if write_report:
+        run_stats.report_path = profiler.write_report(os.path.join(output_dir, "compile_report.json"), status)
+
+    for line in run_stats.lines:
+        print(f"[TIMING] {line}")
@@ -0,0 +1,279 @@
+import functools
+import os
+import time
+
+import numpy as np
+
+from .smd_format import corner_keys, triangle_subset
+from .smd_export import (
+    InstancedMeshes,
+    SMD_HEADER,
+    SMD_WRITE_BUFFER,
+    find_skeleton,
+    iter_buffer_triangles,
+    mesh_triangle_buffers,
+)
+from .dmx_export import buffers_dag
+from .dmx_format import DMX_EXTENSION, model_root, write_binary_dmx
+from .staging import atomic_write
+
+
+# Limites d'un modèle compilé par studiomdl (public/studio.h, branche Source 2013)
+MAX_STUDIO_VERTICES = 65536
+MAX_STUDIO_TRIANGLES = 65536
+MAX_STUDIO_MATERIALS = 32
+
+
+class SplitLimits:
+    """Limites par modèle au-delà desquelles un body est découpé"""
+
+    def __init__(self, max_vertices=MAX_STUDIO_VERTICES, max_triangles=MAX_STUDIO_TRIANGLES, max_materials=MAX_STUDIO_MATERIALS):
+        self.max_vertices = max_vertices
+        self.max_triangles = max_triangles
+        self.max_materials = max_materials
+
+    def fits(self, vertices, triangles, materials):
+        return vertices <= self.max_vertices and triangles <= self.max_triangles and materials <= self.max_materials
+
+    @property
+    def key(self):
+        """Limites sous forme de texte, ajoutées à l'empreinte du cache d'export"""
+        return f"{self.max_vertices}/{self.max_triangles}/{self.max_materials}"
+
+    def describe(self, vertices, triangles, materials):
+        return (
+            f"{vertices}/{self.max_vertices} vertices, {triangles}/{self.max_triangles} triangles, "
+            f"{materials}/{self.max_materials} materials"
+        )
+
+
+def unique_vertex_count(keys):
+    """Nombre de sommets après unification studiomdl pour un ensemble de clés de coins"""
+    return len(np.unique(keys.ravel()))
+
+
+def split_material_group(keys, triangles, limits):
+    """Découpe les triangles d'un matériau en morceaux sous les limites
+
+    Les triangles gardent l'ordre du mesh (voisins proches) ; un morceau
+    trop gros est coupé en deux jusqu'à respecter les limites. Retourne
+    une liste de (triangles, sommets).
+    """
+    vertices = unique_vertex_count(keys[triangles])
+    if (vertices <= limits.max_vertices and len(triangles) <= limits.max_triangles) or len(triangles) <= 1:
+        return [(triangles, vertices)]
+    half = len(triangles) // 2
+    return split_material_group(keys, triangles[:half], limits) + split_material_group(keys, triangles[half:], limits)
+
+
+class SplitPart:
+    """Un fichier de sortie : morceaux (objet, triangles) et totaux du modèle"""
+
+    def __init__(self):
+        self.pieces = []
+        self.vertices = 0
+        self.triangles = 0
+        self.materials = set()
+
+    def accepts(self, material, triangles, vertices, limits):
+        materials = len(self.materials | {material})
+        return limits.fits(self.vertices + vertices, self.triangles + len(triangles), materials)
+
+    def add(self, owner, material, triangles, vertices):
+        self.pieces.append((owner, triangles))
+        self.vertices += vertices
+        self.triangles += len(triangles)
+        self.materials.add(material)
+
+    def objects(self):
+        """(objet, triangles triés) de la part, un seul bloc par objet, dans l'ordre d'arrivée"""
+        grouped = {}
+        for owner, triangles in self.pieces:
+            grouped.setdefault(owner, []).append(triangles)
+        return [(owner, np.sort(np.concatenate(groups))) for owner, groups in grouped.items()]
+
+
+def pack_pieces(pieces, limits):
+    """Range les morceaux (objet, matériau, triangles, sommets) dans des parts sous les limites
+
+    Deux matériaux ne partagent jamais de sommet : les comptes s'additionnent.
+    Chaque morceau va dans la première part qui l'accepte, dans l'ordre.
+    """
+    parts = []
+    for owner, material, triangles, vertices in pieces:
+        for part in parts:
+            if part.accepts(material, triangles, vertices, limits):
+                break
+        else:
+            part = SplitPart()
+            parts.append(part)
+        part.add(owner, material, triangles, vertices)
+    return parts
+
+
+def estimate_objects(objects, depsgraph):
+    """Majorant rapide (coins, triangles, matériaux) lu sur les meshes évalués, sans extraction"""
+    corners = 0
+    materials = set()
+    for obj in objects:
+        mesh = obj.evaluated_get(depsgraph).data
+        corners += 3 * (len(mesh.loops) - 2 * len(mesh.polygons))
+        materials.update(slot.name for slot in obj.material_slots)
+        if len(obj.material_slots) == 0:
+            materials.add("None")
+    return corners, corners // 3, len(materials)
+
+
+def estimate_instances(instancer, depsgraph):
+    """Même majorant pour les instances mesh d'un instancer de collection"""
+    corners = 0
+    materials = set()
+    for instance in depsgraph.object_instances:
+        if not instance.is_instance or instance.parent is None or instance.parent.original != instancer:
+            continue
+        obj = instance.object
+        if obj.type != 'MESH':
+            continue
+        corners += 3 * (len(obj.data.loops) - 2 * len(obj.data.polygons))
+        materials.update(slot.name for slot in obj.material_slots)
+        if len(obj.material_slots) == 0:
+            materials.add("None")
+    return corners, corners // 3, len(materials)
+
+
+def instance_count(instancer, depsgraph):
+    """Nombre d'instances mesh d'un instancer de collection (objets écrits par son export)"""
+    return sum(
+        1 for instance in depsgraph.object_instances
+        if instance.is_instance and instance.parent is not None
+        and instance.parent.original == instancer and instance.object.type == 'MESH'
+    )
+
+
+def load_object_buffers(obj, depsgraph, skeleton=None):
+    """(buffers monde, noms, index de matériau) d'un objet, extraits de son mesh évalué"""
+    object_eval = obj.evaluated_get(depsgraph)
+    mesh = object_eval.to_mesh()
+    try:
+        mesh.calc_loop_triangles()
+        mesh.transform(obj.matrix_world)
+        return mesh_triangle_buffers(obj, mesh, False, skeleton)
+    finally:
+        object_eval.to_mesh_clear()
+
+
+class SplitSource:
+    """Objet ou instance d'un body découpé
+
+    Les buffers monde ne sont pas gardés : load() les recalcule au moment
+    de compter les sommets, puis à l'écriture de chaque part qui contient
+    des triangles de la source.
+    """
+
+    def __init__(self, name, load):
+        self.name = name
+        self.load = load
+
+    def pieces(self, limits):
+        """Morceaux (self, matériau, triangles, sommets) de la source, un ou plusieurs par matériau"""
+        buffers, names, name_index = self.load()
+        keys = corner_keys(buffers)
+        pieces = []
+        for material, name in enumerate(names):
+            triangles = np.flatnonzero(name_index == material)
+            if len(triangles) == 0:
+                continue
+            for group, vertices in split_material_group(keys, triangles, limits):
+                pieces.append((self, name, group, vertices))
+        return pieces
+
+
+def body_sources(job, depsgraph):
+    """(sources, squelette) d'un job de body ; une instance ne garde que sa matrice"""
+    if job.is_instancer:
+        instanced = InstancedMeshes(job.source, depsgraph, False)
+        sources = [
+            SplitSource(name, functools.partial(instanced.world_buffers, key, matrix))
+            for name, key, matrix in instanced.instances
+        ]
+        return sources, None
+    skeleton = find_skeleton(job.objects)
+    sources = [
+        SplitSource(obj.name, functools.partial(load_object_buffers, obj, depsgraph, skeleton))
+        for obj in job.objects
+    ]
+    return sources, skeleton
+
+
+def split_sources(sources, limits):
+    """Parts sous les limites ; les buffers de chaque source sont libérés dès ses morceaux comptés"""
+    pieces = []
+    for source in sources:
+        pieces.extend(source.pieces(limits))
+    return pack_pieces(pieces, limits)
+
+
+def iter_split_part(path, part, skeleton=None, formatter=None, on_object=None):
+    """Écrit une part en SMD ou en DMX selon l'extension de path
+
+    Générateur : produit (objets, triangles) au fil de l'écriture, comme
+    iter_objects_to_smd, et retourne le nombre de triangles de la part.
+    """
+    if path.endswith(DMX_EXTENSION):
+        materials = {}
+        dags = []
+        for owner, triangles in part.objects():
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            buffers, names, name_index = owner.load()
+            dag, tri_count, payload = buffers_dag(
+                owner.name, triangle_subset(buffers, triangles), names, name_index[triangles], True, materials
+            )
+            dags.append(dag)
+            if on_object is not None:
+                on_object(owner.name, tri_count, payload, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+            yield 1, tri_count
+        with atomic_write(path, "wb", buffering=SMD_WRITE_BUFFER) as f:
+            write_binary_dmx(f, model_root(os.path.splitext(os.path.basename(path))[0], dags))
+        return part.triangles
+
+    with atomic_write(path, "w", buffering=SMD_WRITE_BUFFER) as f:
+        f.write(skeleton.header() if skeleton is not None else SMD_HEADER)
+        for owner, triangles in part.objects():
+            position = f.tell()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            buffers, names, name_index = owner.load()
+            buffers, name_index = triangle_subset(buffers, triangles), name_index[triangles]
+            tri_count = 0
+            for chunk in iter_buffer_triangles(f, buffers, names, name_index, formatter=formatter):
+                tri_count += chunk
+                yield 0, chunk
+            if on_object is not None:
+                on_object(owner.name, tri_count, f.tell() - position, time.perf_counter() - wall_start, time.process_time() - cpu_start)
+            yield 1, 0
+        f.write("end\n")
+    return part.triangles
+
+
+def split_body_if_needed(job, depsgraph, limits):
+    """Retourne (parts, squelette) si le body d'un job doit être découpé, sinon None
+
+    Le test rapide ne lit que les tailles des meshes évalués ; seuls les
+    bodies qui peuvent dépasser sont extraits et comptés exactement, une
+    source à la fois. Un body qui tient finalement en une part retourne
+    None et suit l'export normal. Un instancer de collection est lu
+    instance par instance (statique).
+    """
+    if job.is_instancer:
+        estimate = estimate_instances(job.source, depsgraph)
+    else:
+        estimate = estimate_objects(job.objects, depsgraph)
+    if limits.fits(*estimate):
+        return None
+
+    sources, skeleton = body_sources(job, depsgraph)
+    parts = split_sources(sources, limits)
+    if len(parts) == 1:
+        return None
+    return parts, skeleton
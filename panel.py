@@ -1,5 +1,13 @@
 import bpy
 from .compilation import validate_compilation_config
+from .studiomdl_runner import compile_log
+from .batch_compile import batch_status, target_status
+from .watch_mode import watch_state
+from .instrumentation import run_stats
+from .export_progress import export_progress
+from .preflight import preflight_report
+from .studiomdl_output import studiomdl_output
+from .compiled_model import model_stats
 
 
 class RELINKER_PT_Panel(bpy.types.Panel):
@@ -70,6 +78,24 @@ class RELINKER_PT_Panel(bpy.types.Panel):
         layout.operator("lw_pannel.create_collision", icon='MESH_CUBE')
 
 
+def draw_export_progress(layout):
+    """Barre d'avancement de l'export en cours (objets, triangles, temps restant)"""
+    eta = export_progress.eta
+    box = layout.box()
+    box.progress(
+        factor=export_progress.fraction,
+        type='BAR',
+        text=f"{export_progress.stage} - ETA {eta:.0f} s" if eta is not None else export_progress.stage
+    )
+    col = box.column(align=True)
+    col.scale_y = 0.8
+    col.label(text=f"Objects: {export_progress.objects_done}/{export_progress.objects_total}")
+    col.label(text=f"Triangles: {export_progress.triangles_done:,}/{export_progress.triangles_total:,}")
+    row = box.row()
+    row.label(text="Press Esc to cancel", icon='EVENT_ESC')
+    row.operator("lw_pannel.cancel_compile", icon='CANCEL', text="Cancel")
+
+
 class COMPILATION_PT_MainPanel(bpy.types.Panel):
     """Panel principal pour la compilation Source Engine"""
     bl_label = "Source Compilation"
@@ -129,14 +155,44 @@ class COMPILATION_PT_MainPanel(bpy.types.Panel):
             box.label(text=f"Body: {body.name}", icon='MESH_DATA')
             
             box.prop(body, "name", text="Name")
+            box.prop(body, "bodygroup", text="Bodygroup")
+            box.prop(body, "blank", text="Blank Option")
             # Utiliser prop avec type filter pour afficher seulement les Mesh
-            box.prop(body, "mesh_object", text="Mesh", icon='MESH_DATA')
+            row = box.row()
+            row.enabled = not body.blank
+            row.prop(body, "mesh_object", text="Mesh", icon='MESH_DATA')
         
         # Bouton de compilation principal
         layout.separator()
         row = layout.row()
         row.scale_y = 2.0
         row.operator("lw_pannel.compile_model", icon='PLAY')
+        if export_progress.running:
+            draw_export_progress(layout)
+        
+        # Pré-vérification : problèmes trouvés par le dernier check (bouton ou compile)
+        row = layout.row(align=True)
+        row.operator("lw_pannel.preflight_check", icon='CHECKMARK')
+        if preflight_report.checked:
+            errors = len(preflight_report.errors)
+            warnings = len(preflight_report.problems) - errors
+            row.label(text=f"{errors} error(s), {warnings} warning(s) - {preflight_report.elapsed * 1000:.0f} ms")
+            if preflight_report.problems:
+                col = layout.box().column(align=True)
+                col.scale_y = 0.8
+                for problem in preflight_report.problems:
+                    col.label(text=str(problem), icon='ERROR' if problem.severity == 'ERROR' else 'INFO')
+        
+        row = layout.row(align=True)
+        row.operator(
+            "lw_pannel.toggle_watch",
+            text="Stop Watching" if watch_state.active else "Watch Mode",
+            icon='HIDE_OFF' if watch_state.active else 'HIDE_ON',
+            depress=watch_state.active
+        )
+        row.prop(props, "watch_debounce", text="Debounce")
+        if watch_state.active:
+            layout.label(text=f"Watching '{watch_state.scene_name}' - {watch_state.compiles} recompile(s)", icon='TIME')
 
 
 class COMPILATION_PT_CollisionPanel(bpy.types.Panel):
@@ -313,6 +369,7 @@ class COMPILATION_PT_SequencesPanel(bpy.types.Panel):
             else:  # ARMATURE
                 box.prop(seq, "animation_armature", text="Armature")
                 box.label(text="Select armature with animation data", icon='INFO')
+            box.prop(seq, "action", text="Action")
             
             box.separator()
             box.label(text="Sequence Options", icon='SETTINGS')
@@ -359,13 +416,37 @@ class COMPILATION_PT_PathsPanel(bpy.types.Panel):
         props = context.scene.compilation_props
         
         layout.label(text="SMD Files", icon='EXPORT')
-        layout.prop(props, "smd_output_path", text="SMD Output Path")
-        layout.label(text="Leave empty to use temp directory", icon='INFO')
+        layout.prop(props, "staging_mode", text="Staging")
+        if props.staging_mode == 'STAGED':
+            layout.prop(props, "smd_output_path", text="SMD Output Path")
+            layout.label(text="Leave empty to use temp directory", icon='INFO')
+        layout.prop(props, "output_format", text="Format")
+        layout.prop(props, "use_export_cache", text="Reuse Unchanged SMDs")
+        layout.prop(props, "export_workers", text="Export Workers")
+        layout.prop(props, "export_frame_budget", text="Export Slice (ms)")
+        row = layout.row(align=True)
+        row.prop(props, "export_flexes", text="Flexes")
+        sub = row.row(align=True)
+        sub.enabled = props.export_flexes
+        sub.prop(props, "flex_tolerance", text="Tolerance")
+        layout.prop(props, "auto_split", text="Auto Split Oversized Bodies")
+        col = layout.column(align=True)
+        col.enabled = props.auto_split
+        col.prop(props, "split_max_vertices", text="Max Vertices")
+        col.prop(props, "split_max_triangles", text="Max Triangles")
+        col.prop(props, "split_max_materials", text="Max Materials")
         
         layout.separator()
         layout.label(text="Compiled Model", icon='OUTPUT')
         layout.prop(props, "model_output_path", text="Model Output Path")
         layout.label(text="Leave empty to use game directory", icon='INFO')
+        
+        layout.separator()
+        layout.label(text="Artifact Cache", icon='FILE_CACHE')
+        layout.prop(props, "use_artifact_cache", text="Skip Unchanged Compiles")
+        if props.use_artifact_cache:
+            layout.prop(props, "artifact_cache_path", text="Store")
+            layout.prop(props, "artifact_cache_size_mb", text="Max Size (MB)")
 
 
 class COMPILATION_PT_LODPanel(bpy.types.Panel):
@@ -424,6 +505,205 @@ class COMPILATION_PT_LODPanel(bpy.types.Panel):
                 layout.prop(lod, "replace_material_to", text="To Material")
 
 
+class COMPILATION_PT_LogPanel(bpy.types.Panel):
+    """Panel du log de studiomdl"""
+    bl_label = "Compile Log"
+    bl_idname = "COMPILATION_PT_log"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'lw_pannel'
+    bl_parent_id = "COMPILATION_PT_main"
+    bl_options = {'DEFAULT_CLOSED'}
+    
+    @classmethod
+    def poll(cls, context):
+        return validate_compilation_config(context)
+    
+    def draw(self, context):
+        layout = self.layout
+        props = context.scene.compilation_props
+        
+        layout.prop(props, "studiomdl_timeout", text="Timeout (s, 0 = none)")
+        
+        # Instrumentation
+        row = layout.row(align=True)
+        row.prop(props, "write_run_report", text="Report")
+        row.prop(props, "profile_memory", text="Memory")
+        row.prop(props, "profile_cprofile", text="cProfile")
+        layout.prop(props, "write_model_stats", text="Store Model Stats")
+        
+        # Statistiques lues dans les fichiers compilés (.mdl/.vvd/.vtx/.phy)
+        if model_stats.stats is not None:
+            box = layout.box()
+            box.label(text=f"Last Build: {model_stats.stats['model']}", icon='MESH_DATA')
+            col = box.column(align=True)
+            col.label(text=model_stats.summary)
+            for change in model_stats.changes:
+                col.label(text=f"Changed: {change}", icon='ERROR')
+            for problem in model_stats.stats["problems"]:
+                col.label(text=problem, icon='ERROR')
+        
+        if run_stats.lines:
+            box = layout.box()
+            box.label(text="Last Run", icon='TIME')
+            col = box.column(align=True)
+            for line in run_stats.lines:
+                col.label(text=line)
+            if run_stats.report_path:
+                col.label(text=run_stats.report_path, icon='FILE')
+            if run_stats.profile_path:
+                col.label(text=run_stats.profile_path, icon='FILE')
+        
+        if compile_log.start_time is None:
+            layout.label(text="No compilation yet", icon='INFO')
+            return
+        
+        # Statut et temps écoulé
+        row = layout.row()
+        icon = 'SORTTIME' if compile_log.running else 'INFO'
+        row.label(text=f"{compile_log.status} - {compile_log.elapsed:.1f} s", icon=icon)
+        if compile_log.running:
+            row.operator("lw_pannel.cancel_compile", icon='CANCEL', text="Cancel")
+            layout.label(text="Press Esc to cancel", icon='EVENT_ESC')
+        
+        # Résumé de l'analyse de la sortie, mis à jour pendant le compile
+        counts = studiomdl_output.counts
+        box = layout.box()
+        row = box.row()
+        row.label(text=f"{counts['error']} error(s)", icon='ERROR' if counts['error'] else 'CHECKMARK')
+        row.label(text=f"{counts['warning']} warning(s)", icon='INFO')
+        row.label(text=f"{len(studiomdl_output.files)} file(s)", icon='FILE')
+        col = box.column(align=True)
+        col.scale_y = 0.8
+        for line in studiomdl_output.summary()[1:]:
+            col.label(text=line)
+        for error in studiomdl_output.errors[:5]:
+            col.label(text=error.describe(), icon='CANCEL')
+        if counts['error'] > 5:
+            col.label(text=f"... {counts['error'] - 5} more error(s)")
+        if studiomdl_output.error_objects():
+            box.operator("lw_pannel.select_error_objects", icon='RESTRICT_SELECT_OFF')
+        
+        # Fenêtre de lignes défilable depuis la fin du log
+        row = layout.row(align=True)
+        row.prop(props, "log_lines_shown", text="Lines")
+        row.prop(props, "log_scroll", text="Scroll")
+        
+        lines = list(compile_log.lines)
+        end = max(0, len(lines) - props.log_scroll)
+        start = max(0, end - props.log_lines_shown)
+        
+        box = layout.box()
+        col = box.column(align=True)
+        col.scale_y = 0.7
+        if not lines:
+            col.label(text="(no output)")
+        for stream, line in lines[start:end]:
+            col.label(text=line, icon='ERROR' if stream == "stderr" else 'NONE')
+
+
+class COMPILATION_PT_BatchPanel(bpy.types.Panel):
+    """Panel de la file de compilation batch"""
+    bl_label = "Batch Compile"
+    bl_idname = "COMPILATION_PT_batch"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'lw_pannel'
+    bl_parent_id = "COMPILATION_PT_main"
+    bl_options = {'DEFAULT_CLOSED'}
+    
+    @classmethod
+    def poll(cls, context):
+        return validate_compilation_config(context)
+    
+    def draw(self, context):
+        layout = self.layout
+        props = context.scene.compilation_props
+        
+        # Scènes à compiler
+        box = layout.box()
+        box.label(text="Scenes", icon='SCENE_DATA')
+        for sc in bpy.data.scenes:
+            box.prop(sc.compilation_props, "batch_include", text=sc.name)
+        
+        layout.prop(props, "batch_concurrency", text="Concurrent Jobs")
+        layout.prop(props, "batch_sandbox_path", text="Sandbox Path")
+        
+        row = layout.row()
+        row.scale_y = 1.5
+        row.enabled = not batch_status.running
+        row.operator("lw_pannel.batch_compile", icon='SEQ_STRIP_DUPLICATE')
+        
+        queue = batch_status.queue
+        if queue is None:
+            return
+        
+        layout.separator()
+        box = layout.box()
+        box.label(text=queue.summary(), icon='INFO')
+        if batch_status.running:
+            box.label(text="Press Esc to cancel", icon='EVENT_ESC')
+        for job in queue.jobs:
+            row = box.row()
+            row.label(text=job.name)
+            row.label(text=job.status)
+            row.label(text=f"{job.duration:.1f} s")
+
+
+class COMPILATION_PT_TargetsPanel(bpy.types.Panel):
+    """Panel des cibles de compile (un export, plusieurs jeux)"""
+    bl_label = "Compile Targets"
+    bl_idname = "COMPILATION_PT_targets"
+    bl_space_type = 'VIEW_3D'
+    bl_region_type = 'UI'
+    bl_category = 'lw_pannel'
+    bl_parent_id = "COMPILATION_PT_main"
+    bl_options = {'DEFAULT_CLOSED'}
+    
+    def draw(self, context):
+        layout = self.layout
+        scene = context.scene
+        
+        row = layout.row()
+        row.template_list(
+            "COMPILATION_UL_TargetList", "",
+            scene, "compile_target_list",
+            scene, "compile_target_list_index",
+            rows=3
+        )
+        col = row.column(align=True)
+        col.operator("lw_pannel.add_target", icon='ADD', text="")
+        col.operator("lw_pannel.remove_target", icon='REMOVE', text="")
+        
+        if len(scene.compile_target_list) > 0 and scene.compile_target_list_index < len(scene.compile_target_list):
+            target = scene.compile_target_list[scene.compile_target_list_index]
+            box = layout.box()
+            box.prop(target, "name", text="Name")
+            box.prop(target, "studiomdl_path", text="studiomdl.exe")
+            box.prop(target, "gameinfo_path", text="gameinfo.txt")
+            box.prop(target, "output_path", text="Output Path")
+        
+        row = layout.row()
+        row.scale_y = 1.5
+        row.enabled = not target_status.running
+        row.operator("lw_pannel.compile_targets", icon='EXPORT')
+        
+        queue = target_status.queue
+        if queue is None:
+            return
+        
+        layout.separator()
+        box = layout.box()
+        box.label(text=queue.summary(), icon='INFO')
+        if target_status.running:
+            box.label(text="Press Esc to cancel", icon='EVENT_ESC')
+        for job in queue.jobs:
+            row = box.row()
+            row.label(text=job.name)
+            row.label(text="RESTORED" if job.from_cache else job.status)
+            row.label(text=f"{job.duration:.1f} s")
+
+
 # Classes du panel à exporter
 panel_classes = (
     RELINKER_PT_Panel,
@@ -433,4 +713,7 @@ panel_classes = (
     COMPILATION_PT_SequencesPanel,
     COMPILATION_PT_PathsPanel,
     COMPILATION_PT_LODPanel,
+    COMPILATION_PT_LogPanel,
+    COMPILATION_PT_BatchPanel,
+    COMPILATION_PT_TargetsPanel,
 )
\ No newline at end of file
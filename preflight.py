@@ -0,0 +1,214 @@
+import os
+import time
+
+import numpy as np
+
+from .export_plan import build_export_plan, single_body
+from .flex_export import evaluated_vertex_count
+from .mesh_split import MAX_STUDIO_MATERIALS, estimate_instances, estimate_objects
+
+
+# Nombre de morceaux convexes accepté par studiomdl sans $maxconvexpieces
+DEFAULT_MAX_CONVEX_PIECES = 20
+
+# Caractères qui ferment ou coupent une chaîne entre guillemets dans le QC
+QC_FORBIDDEN_CHARACTERS = ('"', "\n", "\r")
+
+
+class PreflightProblem:
+    """Problème détecté avant l'export : gravité ('ERROR' bloque le compile, 'WARNING' non), élément, message"""
+
+    def __init__(self, severity, subject, message):
+        self.severity = severity
+        self.subject = subject
+        self.message = message
+
+    def __str__(self):
+        return f"{self.subject}: {self.message}"
+
+
+class PreflightReport:
+    """Résultat de la dernière vérification, affiché par le panel"""
+
+    def __init__(self):
+        self.problems = []
+        self.elapsed = 0.0
+        self.checked = False
+
+    @property
+    def errors(self):
+        return [problem for problem in self.problems if problem.severity == 'ERROR']
+
+
+preflight_report = PreflightReport()
+
+
+def loose_part_count(edges, used_vertices, vertex_count):
+    """Nombre de parties connexes formées par les sommets utilisés (union-find vectorisé)
+
+    Chaque passe accroche la racine la plus haute de chaque arête à la plus
+    basse, puis compresse les chemins ; quelques passes suffisent.
+    """
+    parent = np.arange(vertex_count)
+    while len(edges):
+        a = parent[edges[:, 0]]
+        b = parent[edges[:, 1]]
+        linked = a != b
+        if not linked.any():
+            break
+        np.minimum.at(parent, np.maximum(a, b)[linked], np.minimum(a, b)[linked])
+        while True:
+            compressed = parent[parent]
+            if np.array_equal(compressed, parent):
+                break
+            parent = compressed
+    return len(np.unique(parent[used_vertices]))
+
+
+def mesh_loose_parts(mesh):
+    """Parties séparées d'un mesh évalué, lues en bloc (arêtes et sommets des faces)"""
+    edges = np.empty(len(mesh.edges) * 2, dtype=np.int32)
+    mesh.edges.foreach_get("vertices", edges)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    return loose_part_count(edges.reshape(-1, 2), np.unique(loop_vertices), len(mesh.vertices))
+
+
+def check_qc_name(problems, subject, value):
+    """Signale une chaîne écrite entre guillemets dans le QC qui le casserait"""
+    if any(character in value for character in QC_FORBIDDEN_CHARACTERS):
+        problems.append(PreflightProblem('ERROR', subject, f"'{value}' contains a quote or a line break"))
+
+
+def check_names(scene, plan, problems):
+    props = scene.compilation_props
+    check_qc_name(problems, "$modelname", props.modelname)
+    check_qc_name(problems, "$cdmaterials", props.cdmaterials)
+    check_qc_name(problems, "$surfaceprop", props.surfaceprop)
+    for body in scene.body_list:
+        check_qc_name(problems, f"Body '{body.name}'", body.name)
+        check_qc_name(problems, f"Body '{body.name}' bodygroup", body.bodygroup)
+    for seq in scene.sequence_list:
+        if seq.enabled:
+            check_qc_name(problems, f"Sequence '{seq.name}'", seq.name)
+            if seq.enable_activity:
+                check_qc_name(problems, f"Sequence '{seq.name}' activity", seq.activity)
+    # Les fichiers prennent le nom des objets et sont référencés entre guillemets
+    for filename in plan.filenames():
+        check_qc_name(problems, "File", filename)
+
+
+def check_meshes(scene, plan, depsgraph, problems):
+    """Triangles et matériaux de chaque job, comptés sur les meshes évalués sans extraction"""
+    props = scene.compilation_props
+    # Un body unique trop gros est découpé en parts : les matériaux en trop ne bloquent pas
+    splits = props.auto_split and single_body(scene) is not None
+    for job in plan.jobs:
+        if job.is_instancer:
+            _, triangles, materials = estimate_instances(job.source, depsgraph)
+        else:
+            _, triangles, materials = estimate_objects(job.objects, depsgraph)
+        subject = f"'{job.source.name}'"
+        if triangles == 0:
+            problems.append(PreflightProblem('ERROR', subject, f"{job.filename} would have no triangles"))
+        if job.is_body and not splits and materials > MAX_STUDIO_MATERIALS:
+            problems.append(PreflightProblem(
+                'ERROR', subject, f"{materials} materials, studiomdl allows {MAX_STUDIO_MATERIALS} per model"
+            ))
+
+
+def check_lods(scene, plan, problems):
+    """replacemodel ne peut remplacer qu'un modèle déclaré par un body"""
+    props = scene.compilation_props
+    replaced = [(f"LOD {lod.lod_level}", lod.replace_model_from_obj, lod.replace_model_to_obj) for lod in scene.lod_list]
+    if props.enable_shadowlod:
+        replaced.append(("Shadow LOD", props.shadowlod_replace_from_obj, props.shadowlod_replace_to_obj))
+    for subject, source, target in replaced:
+        if source is None or target is None:
+            continue
+        job = plan.get(source)
+        if job is None or not job.is_body:
+            problems.append(PreflightProblem('ERROR', subject, f"'{source.name}' is not the mesh of a body"))
+
+
+def check_flexes(plan, depsgraph, problems):
+    """La frame 0 du VTA doit reprendre les sommets du SMD de référence, un par sommet du mesh"""
+    for job in plan.flex_jobs:
+        for obj in job.objects:
+            evaluated = evaluated_vertex_count(obj, depsgraph)
+            if evaluated != len(obj.data.vertices):
+                problems.append(PreflightProblem(
+                    'ERROR', f"Flexes of '{obj.name}'",
+                    f"modifiers change the vertex count ({len(obj.data.vertices)} -> {evaluated}); "
+                    f"apply them or disable flex export"
+                ))
+
+
+def check_collision(scene, depsgraph, problems):
+    """Morceaux convexes du mesh de collision (parties séparées) contre la limite de studiomdl
+
+    Seul le dépassement de $maxconvexpieces bloque le compile.
+    """
+    props = scene.compilation_props
+    obj = props.collision_mesh
+    if obj is None or obj.type != 'MESH' or props.collision_type != 'MODEL':
+        return
+    pieces = mesh_loose_parts(obj.evaluated_get(depsgraph).data)
+    # Sans $concave, studiomdl enveloppe tous les sommets dans une seule coque : pas d'échec
+    if pieces > 1 and not props.collision_concave:
+        problems.append(PreflightProblem(
+            'WARNING', f"Collision '{obj.name}'",
+            f"{pieces} separate pieces will be merged into one convex hull; enable Concave to keep {pieces} pieces"
+        ))
+        return
+    limit = props.collision_maxconvexpieces if props.collision_enable_maxconvex else DEFAULT_MAX_CONVEX_PIECES
+    if pieces > limit:
+        problems.append(PreflightProblem(
+            'ERROR', f"Collision '{obj.name}'", f"{pieces} convex pieces, limit is {limit} ($maxconvexpieces)"
+        ))
+
+
+def check_cdmaterials(scene, game_dir, problems):
+    """Chaque chemin $cdmaterials doit contenir au moins un VMT dans le répertoire du jeu
+
+    Un avertissement seulement : les matériaux peuvent venir d'un contenu
+    monté (VPK, autre jeu) invisible depuis ce répertoire.
+    """
+    for path in scene.compilation_props.cdmaterials.splitlines():
+        path = path.strip().strip("/\\")
+        if not path:
+            continue
+        directory = os.path.join(game_dir, "materials", path)
+        try:
+            with os.scandir(directory) as entries:
+                has_vmt = any(entry.name.lower().endswith(".vmt") for entry in entries)
+        except OSError:
+            has_vmt = False
+        if not has_vmt:
+            problems.append(PreflightProblem('WARNING', "$cdmaterials", f"no VMT found in {directory}"))
+
+
+def run_preflight(scene, depsgraph, game_dir=None):
+    """Vérifie tout le plan de compile sans rien écrire ; retourne la liste des problèmes
+
+    Seules des lectures en bloc sont faites (tailles des meshes évalués,
+    arêtes du mesh de collision, contenu d'un répertoire) : quelques
+    millisecondes avant l'export. game_dir=None saute la vérification des
+    matériaux. Le résultat est aussi gardé dans preflight_report.
+    """
+    start = time.perf_counter()
+    plan = build_export_plan(scene)
+    problems = []
+    check_names(scene, plan, problems)
+    check_meshes(scene, plan, depsgraph, problems)
+    check_lods(scene, plan, problems)
+    check_flexes(plan, depsgraph, problems)
+    check_collision(scene, depsgraph, problems)
+    if game_dir:
+        check_cdmaterials(scene, game_dir, problems)
+
+    preflight_report.problems = problems
+    preflight_report.elapsed = time.perf_counter() - start
+    preflight_report.checked = True
+    print(f"[PREFLIGHT] {len(problems)} problem(s) in {preflight_report.elapsed * 1000:.1f} ms")
+    return problems
@@ -0,0 +1,385 @@
+import time
+from itertools import chain
+from operator import attrgetter
+import numpy as np
+from .smd_format import (
+    TRIANGLE_CHUNK_SIZE,
+    format_triangle_range,
+    format_nodes,
+    format_skeleton,
+    format_vertex_links,
+    limit_vertex_links,
+    local_bone_matrices,
+    transform_buffers,
+)
+from .staging import atomic_write
+from .export_progress import run_to_end
+
+
+SMD_HEADER = "version 1\nnodes\n0 \"root\" -1\nend\nskeleton\ntime 0\n0 0 0 0 0 0 0\nend\ntriangles\n"
+
+# Taille du tampon d'écriture des fichiers SMD (octets)
+SMD_WRITE_BUFFER = 1 << 20
+
+
+def find_armature(obj):
+    """Armature qui déforme un objet (modificateur Armature, sinon parent armature)"""
+    for modifier in obj.modifiers:
+        if modifier.type == 'ARMATURE' and modifier.object is not None and modifier.show_viewport:
+            return modifier.object
+    if obj.parent is not None and obj.parent.type == 'ARMATURE':
+        return obj.parent
+    return None
+
+
+class Skeleton:
+    """Nœuds SMD d'une armature, ordonnés parent avant enfant"""
+
+    def __init__(self, armature):
+        self.armature = armature
+
+        ordered = []
+        pending = [bone for bone in armature.data.bones if bone.parent is None]
+        while pending:
+            bone = pending.pop(0)
+            ordered.append(bone)
+            pending[:0] = bone.children
+
+        self.names = [bone.name for bone in ordered]
+        self.index = {name: index for index, name in enumerate(self.names)}
+        self.parents = [self.index[bone.parent.name] if bone.parent else -1 for bone in ordered]
+
+        pose_order = {bone.name: index for index, bone in enumerate(armature.pose.bones)}
+        self._pose_order = np.array([pose_order[name] for name in self.names], dtype=np.int64)
+
+    def pose_matrices(self, buffer):
+        """Convertit un buffer foreach_get("matrix") des pose bones (..., n * 16) en (..., B, 4, 4) ordonné"""
+        # foreach_get rend les matrices colonne par colonne
+        matrices = buffer.reshape(buffer.shape[:-1] + (-1, 4, 4)).swapaxes(-1, -2)
+        return matrices[..., self._pose_order, :, :]
+
+    def world_matrices(self):
+        """Matrices monde (B, 4, 4) des os dans la pose courante, lues en bloc"""
+        pose_bones = self.armature.pose.bones
+        buffer = np.empty(len(pose_bones) * 16, dtype=np.float32)
+        pose_bones.foreach_get("matrix", buffer)
+        return np.array(self.armature.matrix_world, dtype=np.float64) @ self.pose_matrices(buffer)
+
+    def header(self):
+        """En-tête SMD (nodes + skeleton à la pose courante) jusqu'au bloc triangles"""
+        local = local_bone_matrices(self.world_matrices()[None], self.parents)
+        return "version 1\n" + format_nodes(self.names, self.parents) + format_skeleton(local) + "triangles\n"
+
+    def group_bones(self, obj):
+        """Index d'os de chaque groupe de sommets de obj (-1 si le groupe n'est pas un os)"""
+        return np.array([self.index.get(group.name, -1) for group in obj.vertex_groups], dtype=np.int32)
+
+    def rigid_parent(self, obj):
+        """Os auquel sont rattachés les sommets sans influence"""
+        if obj.parent is self.armature and obj.parent_type == 'BONE':
+            return self.index.get(obj.parent_bone, 0)
+        return 0
+
+
+def find_skeleton(objects):
+    """Squelette du premier objet déformé par une armature, ou None pour un export statique"""
+    for obj in objects:
+        armature = find_armature(obj)
+        if armature is not None and len(armature.data.bones):
+            return Skeleton(armature)
+    return None
+
+
+def vertex_weight_table(mesh):
+    """Couples (sommet, groupe, poids) de tout le mesh, lus en une seule passe
+
+    L'API n'expose pas les poids de deform en bloc (ni attribut ni
+    foreach_get sur mesh.vertices) : les éléments de tous les sommets sont
+    enchaînés et lus par des boucles C (map, attrgetter) directement dans
+    des tableaux typés, sans tuple par élément.
+    """
+    groups = [vertex.groups for vertex in mesh.vertices]
+    counts = np.fromiter(map(len, groups), dtype=np.int64, count=len(groups))
+    elements = list(chain.from_iterable(groups))
+    vertex_index = np.repeat(np.arange(len(groups), dtype=np.int64), counts)
+    group_index = np.fromiter(map(attrgetter("group"), elements), dtype=np.int64, count=len(elements))
+    weights = np.fromiter(map(attrgetter("weight"), elements), dtype=np.float64, count=len(elements))
+    return vertex_index, group_index, weights
+
+
+def add_vertex_links(buffers, obj, mesh, skeleton):
+    """Ajoute aux buffers l'os parent et le texte des influences de chaque sommet"""
+    vert_count = len(mesh.vertices)
+    vertex_index, group_index, weights = vertex_weight_table(mesh)
+
+    group_bones = skeleton.group_bones(obj)
+    valid = group_index < len(group_bones)
+    bone_index = np.full(len(group_index), -1, dtype=np.int64)
+    bone_index[valid] = group_bones[group_index[valid]]
+
+    bones, link_weights, counts = limit_vertex_links(vertex_index, bone_index, weights, vert_count)
+
+    parents = np.where(counts > 0, bones[:, 0], skeleton.rigid_parent(obj)).astype(np.int32)
+    buffers["vertex_parent"] = parents
+    buffers["vertex_links"] = format_vertex_links(bones, link_weights, counts)
+
+
+def extract_mesh_buffers(mesh):
+    """Extrait en bloc (foreach_get) les buffers d'un mesh évalué
+
+    Le mesh doit déjà être transformé et avoir ses loop_triangles calculés.
+    Les données par sommet de triangle sont reconstruites bloc par bloc avec
+    smd_format.triangle_chunk() pour garder une mémoire bornée.
+    """
+    vert_count = len(mesh.vertices)
+    tri_count = len(mesh.loop_triangles)
+
+    co = np.empty(vert_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+
+    vert_normals = np.empty(vert_count * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("normal", vert_normals)
+
+    tri_verts = np.empty(tri_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", tri_verts)
+
+    tri_loops = np.empty(tri_count * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("loops", tri_loops)
+
+    material_index = np.empty(tri_count, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("material_index", material_index)
+
+    use_smooth = np.empty(tri_count, dtype=bool)
+    mesh.loop_triangles.foreach_get("use_smooth", use_smooth)
+
+    loop_uvs = None
+    uv_layer = mesh.uv_layers.active
+    if uv_layer:
+        loop_uvs = np.empty(len(mesh.loops) * 2, dtype=np.float32)
+        uv_layer.data.foreach_get("uv", loop_uvs)
+        loop_uvs = loop_uvs.reshape(-1, 2)
+
+    return {
+        "co": co.reshape(vert_count, 3),
+        "normals": vert_normals.reshape(vert_count, 3),
+        "tri_verts": tri_verts.reshape(tri_count, 3),
+        "tri_loops": tri_loops.reshape(tri_count, 3),
+        "material_index": material_index,
+        "use_smooth": use_smooth,
+        "loop_uvs": loop_uvs,
+    }
+
+
+def material_lookup(obj, material_index, is_collision_smd):
+    """Retourne (noms, index) : le nom de matériau du triangle i est noms[index[i]]"""
+    if is_collision_smd:
+        return ["Phy"], np.zeros(len(material_index), dtype=np.int32)
+
+    if len(obj.material_slots) == 0:
+        return ["None"], np.zeros(len(material_index), dtype=np.int32)
+
+    # Les index hors des slots tombent sur "default"
+    slot_names = [slot.name for slot in obj.material_slots] + ["default"]
+    return slot_names, np.minimum(material_index, len(slot_names) - 1).astype(np.int32)
+
+
+def mesh_triangle_buffers(obj, mesh, is_collision_smd, skeleton=None):
+    """Retourne (buffers, noms, index) d'un mesh évalué, prêts à être formatés
+
+    Avec un squelette, les buffers reçoivent l'os parent et les influences
+    de chaque sommet.
+    """
+    buffers = extract_mesh_buffers(mesh)
+    names, name_index = material_lookup(obj, buffers["material_index"], is_collision_smd)
+    if skeleton is not None:
+        add_vertex_links(buffers, obj, mesh, skeleton)
+    return buffers, names, name_index
+
+
+def iter_buffer_triangles(sb, buffers, names, name_index, flat_shading=True, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None):
+    """Écrit les triangles de buffers extraits dans sb, par blocs ou via le formatter parallèle
+
+    Générateur : rend la main après chaque bloc écrit et produit son nombre
+    de triangles (un seul envoi pour le formatter parallèle).
+    """
+    tri_count = len(name_index)
+    if formatter is not None and "vertex_links" not in buffers and formatter.should_parallelize(tri_count):
+        formatter.write(sb, buffers, names, name_index, flat_shading)
+        yield tri_count
+        return
+
+    for start in range(0, tri_count, chunk_size):
+        end = min(start + chunk_size, tri_count)
+        sb.write(format_triangle_range(buffers, names, name_index, start, end, flat_shading))
+        yield end - start
+
+
+def write_buffer_triangles(sb, buffers, names, name_index, flat_shading=True, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None):
+    """Écrit les triangles de buffers extraits dans sb ; retourne le nombre de triangles"""
+    return sum(iter_buffer_triangles(sb, buffers, names, name_index, flat_shading, chunk_size, formatter))
+
+
+def write_mesh_triangles(sb, obj, mesh, is_collision_smd, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, skeleton=None):
+    """Écrit les triangles d'un mesh évalué dans sb (fichier ou StringIO)
+
+    Si un formatter parallèle est fourni, le formatage des gros meshes est
+    réparti entre ses processus ; la sortie est identique. Avec un squelette,
+    chaque coin reçoit son os parent et ses influences (les meshes skinnés
+    restent formatés dans ce processus).
+    """
+    buffers, names, name_index = mesh_triangle_buffers(obj, mesh, is_collision_smd, skeleton)
+    # La collision garde les normales des sommets
+    return write_buffer_triangles(sb, buffers, names, name_index, not is_collision_smd, chunk_size, formatter)
+
+
+class InstancedMeshes:
+    """Instances mesh d'un instancer de collection, lues dans depsgraph.object_instances
+
+    Chaque mesh évalué unique (données et slots de matériaux) n'est extrait
+    qu'une fois, en espace local ; une instance ne garde que sa matrice et
+    ses buffers monde sont calculés au moment de l'écrire.
+    """
+
+    def __init__(self, instancer, depsgraph, is_collision_smd):
+        self.flat_shading = not is_collision_smd
+        self.instances = []
+        self.meshes = {}
+        seen = {}
+
+        # Les objets d'instance ne sont valides que pendant l'itération : extraction immédiate
+        for instance in depsgraph.object_instances:
+            if not instance.is_instance or instance.parent is None or instance.parent.original != instancer:
+                continue
+            obj = instance.object
+            if obj.type != 'MESH':
+                continue
+
+            key = (obj.data.as_pointer(), tuple(slot.name for slot in obj.material_slots))
+            if key not in self.meshes:
+                mesh = obj.to_mesh()
+                try:
+                    mesh.calc_loop_triangles()
+                    self.meshes[key] = mesh_triangle_buffers(obj, mesh, is_collision_smd)
+                finally:
+                    obj.to_mesh_clear()
+
+            # Noms uniques : un même objet peut être instancié plusieurs fois
+            count = seen.get(obj.name, 0)
+            seen[obj.name] = count + 1
+            name = obj.name if count == 0 else f"{obj.name}#{count}"
+            self.instances.append((name, key, np.array(instance.matrix_world, dtype=np.float64)))
+
+    @property
+    def triangle_count(self):
+        return sum(len(self.meshes[key][2]) for _, key, _ in self.instances)
+
+    def world_buffers(self, key, matrix):
+        """(buffers monde, noms, index de matériau) d'une instance"""
+        buffers, names, name_index = self.meshes[key]
+        return transform_buffers(buffers, matrix), names, name_index
+
+
+def iter_object_triangles(f, obj, depsgraph, is_collision_smd, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, skeleton=None):
+    """Évalue un objet et écrit ses triangles dans f bloc par bloc (générateur)
+
+    Les buffers sont copiés avant le formatage : le mesh évalué est libéré
+    avant le premier bloc, l'export peut donc être suspendu entre deux blocs.
+    """
+    object_eval = obj.evaluated_get(depsgraph)
+    mesh = object_eval.to_mesh()
+    try:
+        mesh.calc_loop_triangles()
+        mesh.transform(obj.matrix_world)
+        buffers, names, name_index = mesh_triangle_buffers(obj, mesh, is_collision_smd, skeleton)
+    finally:
+        object_eval.to_mesh_clear()
+    # La collision garde les normales des sommets
+    yield from iter_buffer_triangles(f, buffers, names, name_index, not is_collision_smd, chunk_size, formatter)
+
+
+def export_object_triangles(f, obj, depsgraph, is_collision_smd, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, skeleton=None):
+    """Évalue un objet, écrit ses triangles dans f puis libère le mesh évalué"""
+    return sum(iter_object_triangles(f, obj, depsgraph, is_collision_smd, chunk_size, formatter, skeleton))
+
+
+def iter_objects_to_smd(path, objects, depsgraph, is_collision_smd, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, on_object=None):
+    """Écrit un SMD en flux : chaque objet est évalué, écrit par blocs puis libéré
+
+    La mémoire utilisée reste bornée par le plus gros mesh, quel que soit le
+    nombre d'objets. Le fichier est remplacé atomiquement, et laissé intact
+    si son contenu n'a pas changé. on_object(nom, triangles, octets, temps
+    mur, temps CPU) est appelé après chaque objet. Si un objet est déformé
+    par une armature, ses os sont écrits dans les blocs nodes/skeleton (pose
+    courante, identique au mesh évalué).
+
+    Générateur : produit (objets, triangles) écrits depuis le dernier envoi,
+    après chaque bloc et chaque objet, et retourne le nombre de triangles.
+    Fermé avant la fin, il supprime le fichier temporaire (aucun SMD partiel).
+    """
+    tri_count = 0
+    skeleton = find_skeleton(objects)
+    with atomic_write(path, "w", buffering=SMD_WRITE_BUFFER) as f:
+        f.write(skeleton.header() if skeleton is not None else SMD_HEADER)
+        for obj in objects:
+            position = f.tell()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            obj_tri_count = 0
+            for chunk in iter_object_triangles(f, obj, depsgraph, is_collision_smd, chunk_size, formatter, skeleton):
+                obj_tri_count += chunk
+                yield 0, chunk
+            tri_count += obj_tri_count
+            if on_object is not None:
+                on_object(
+                    obj.name,
+                    obj_tri_count,
+                    f.tell() - position,
+                    time.perf_counter() - wall_start,
+                    time.process_time() - cpu_start,
+                )
+            yield 1, 0
+        f.write("end\n")
+    return tri_count
+
+
+def stream_objects_to_smd(path, objects, depsgraph, is_collision_smd, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, on_object=None):
+    """Écrit un SMD en flux d'une traite (voir iter_objects_to_smd) ; retourne le nombre de triangles"""
+    return run_to_end(iter_objects_to_smd(path, objects, depsgraph, is_collision_smd, chunk_size, formatter, on_object))
+
+
+def iter_instances_to_smd(path, instanced, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, on_object=None):
+    """Écrit les instances d'un InstancedMeshes dans un SMD statique
+
+    Même contrat que iter_objects_to_smd : écriture atomique, on_object
+    appelé après chaque instance, (instances, triangles) produits au fil de
+    l'écriture, nombre de triangles retourné.
+    """
+    tri_count = 0
+    with atomic_write(path, "w", buffering=SMD_WRITE_BUFFER) as f:
+        f.write(SMD_HEADER)
+        for name, key, matrix in instanced.instances:
+            position = f.tell()
+            wall_start = time.perf_counter()
+            cpu_start = time.process_time()
+            buffers, names, name_index = instanced.world_buffers(key, matrix)
+            instance_tri_count = 0
+            for chunk in iter_buffer_triangles(f, buffers, names, name_index, instanced.flat_shading, chunk_size, formatter):
+                instance_tri_count += chunk
+                yield 0, chunk
+            tri_count += instance_tri_count
+            if on_object is not None:
+                on_object(
+                    name,
+                    instance_tri_count,
+                    f.tell() - position,
+                    time.perf_counter() - wall_start,
+                    time.process_time() - cpu_start,
+                )
+            yield 1, 0
+        f.write("end\n")
+    return tri_count
+
+
+def stream_instances_to_smd(path, instanced, chunk_size=TRIANGLE_CHUNK_SIZE, formatter=None, on_object=None):
+    """Écrit les instances d'un InstancedMeshes d'une traite ; retourne le nombre de triangles"""
+    return run_to_end(iter_instances_to_smd(path, instanced, chunk_size, formatter, on_object))
@@ -0,0 +1,332 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+# Module sans dépendance à bpy ni import relatif : il est aussi chargé tel
+# quel dans les processus de formatage parallèle (voir smd_parallel.py).
+
+# Nombre de triangles formatés par bloc
+TRIANGLE_CHUNK_SIZE = 65536
+
+# Nombre maximum d'influences par sommet acceptées par studiomdl
+MAX_LINKS = 3
+
+_CORNER_FMT = "0  %.6f %.6f %.6f  %.6f %.6f %.6f  %.6f %.6f 0\n"
+_TRIANGLE_FMT = "%s\n" + _CORNER_FMT * 3
+
+# Coin avec os parent et influences ("n os poids ...") pré-formatées par sommet
+_SKINNED_CORNER_FMT = "%d  %.6f %.6f %.6f  %.6f %.6f %.6f  %.6f %.6f %s\n"
+_SKINNED_TRIANGLE_FMT = "%s\n" + _SKINNED_CORNER_FMT * 3
+
+_BONE_FMT = "%d  %.6f %.6f %.6f  %.6f %.6f %.6f\n"
+
+
+def triangle_chunk(buffers, start, end, flat_shading=True):
+    """Reconstruit positions, normales et UVs des triangles [start, end)
+
+    Retourne des tableaux de forme (n, 3, 3), (n, 3, 3) et (n, 3, 2). Si
+    flat_shading est vrai, les triangles non lissés reçoivent la normale de
+    leur face.
+    """
+    tri_verts = buffers["tri_verts"][start:end]
+
+    positions = buffers["co"][tri_verts]
+    normals = buffers["normals"][tri_verts]
+
+    if buffers["loop_uvs"] is not None:
+        uvs = buffers["loop_uvs"][buffers["tri_loops"][start:end]]
+    else:
+        uvs = np.zeros((len(tri_verts), 3, 2), dtype=np.float32)
+
+    if flat_shading:
+        flat = ~buffers["use_smooth"][start:end]
+        if flat.any():
+            normals[flat] = flat_normals(positions[flat])[:, None, :]
+
+    return positions, normals, uvs
+
+
+def flat_normals(positions):
+    """Calcule la normale plate de chaque triangle (forme (T, 3))
+
+    Même suite d'opérations que (b - a).cross(c - a).normalized() de
+    mathutils (normalize_vn) : arêtes et produit vectoriel en float32,
+    carrés et somme z + y + x en double, racine arrondie en float32, puis
+    multiplication par son inverse en float32 ; normale nulle si la somme
+    ne dépasse pas 1e-35 (triangle dégénéré).
+    """
+    positions = positions.astype(np.float32, copy=False)
+    edge_ab = positions[:, 1] - positions[:, 0]
+    edge_ac = positions[:, 2] - positions[:, 0]
+    normals = np.cross(edge_ab, edge_ac)
+
+    squares = np.square(normals.astype(np.float64))
+    length_sq = squares[:, 2] + squares[:, 1] + squares[:, 0]
+    valid = length_sq > 1.0e-35
+    inv_length = np.zeros(len(normals), dtype=np.float32)
+    inv_length[valid] = np.float32(1.0) / np.sqrt(length_sq[valid]).astype(np.float32)
+
+    return normals * inv_length[:, None]
+
+
+def format_triangles(names, positions, normals, uvs, parents=None, links=None):
+    """Formate un bloc de triangles SMD en une seule opération
+
+    parents et links (forme (n, 3)) donnent l'os parent et le texte des
+    influences de chaque coin ; sans eux, tout est rattaché à l'os 0.
+    """
+    tri_count = len(names)
+    if tri_count == 0:
+        return ""
+
+    values = np.concatenate((positions, normals, uvs), axis=2)
+
+    if links is None:
+        rows = np.empty((tri_count, 25), dtype=object)
+        rows[:, 0] = names
+        rows[:, 1:] = values.reshape(tri_count, 24).astype(np.float64)
+        return (_TRIANGLE_FMT * tri_count) % tuple(rows.ravel().tolist())
+
+    corners = np.empty((tri_count, 3, 10), dtype=object)
+    corners[:, :, 0] = parents
+    corners[:, :, 1:9] = values.astype(np.float64)
+    corners[:, :, 9] = links
+
+    rows = np.empty((tri_count, 31), dtype=object)
+    rows[:, 0] = names
+    rows[:, 1:] = corners.reshape(tri_count, 30)
+    return (_SKINNED_TRIANGLE_FMT * tri_count) % tuple(rows.ravel().tolist())
+
+
+def format_triangle_range(buffers, names, name_index, start, end, flat_shading=True):
+    """Formate les triangles [start, end) d'un mesh extrait en texte SMD"""
+    positions, normals, uvs = triangle_chunk(buffers, start, end, flat_shading)
+    chunk_names = np.array(names, dtype=object)[name_index[start:end]]
+
+    vertex_links = buffers.get("vertex_links")
+    if vertex_links is None:
+        return format_triangles(chunk_names, positions, normals, uvs)
+
+    tri_verts = buffers["tri_verts"][start:end]
+    return format_triangles(
+        chunk_names, positions, normals, uvs,
+        buffers["vertex_parent"][tri_verts], vertex_links[tri_verts],
+    )
+
+
+# Buffers indexés par triangle et par sommet (loop_uvs reste indexé par loop)
+TRIANGLE_BUFFERS = ("tri_verts", "tri_loops", "material_index", "use_smooth")
+VERTEX_BUFFERS = ("co", "normals", "vertex_parent", "vertex_links")
+
+
+def triangle_subset(buffers, triangles):
+    """Buffers réduits aux triangles donnés, sommets inutilisés retirés et réindexés"""
+    subset = dict(buffers)
+    for key in TRIANGLE_BUFFERS:
+        subset[key] = buffers[key][triangles]
+
+    used, remap = np.unique(subset["tri_verts"], return_inverse=True)
+    subset["tri_verts"] = remap.reshape(-1, 3).astype(np.int32)
+    for key in VERTEX_BUFFERS:
+        if key in buffers:
+            subset[key] = buffers[key][used]
+    return subset
+
+
+def transform_buffers(buffers, matrix):
+    """Buffers d'un mesh local placés en espace monde par matrix (4, 4)
+
+    Les normales suivent l'inverse transposée puis sont renormalisées ; les
+    autres buffers sont partagés avec l'original.
+    """
+    linear = matrix[:3, :3]
+    transformed = dict(buffers)
+    transformed["co"] = (buffers["co"] @ linear.T + matrix[:3, 3]).astype(np.float32)
+
+    normals = buffers["normals"] @ np.linalg.pinv(linear)
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    transformed["normals"] = (normals / np.where(length > 0.0, length, 1.0)).astype(np.float32)
+    return transformed
+
+
+def corner_keys(buffers, flat_shading=True):
+    """Clé d'unification studiomdl de chaque coin, forme (T, 3)
+
+    Deux coins ne donnent qu'un sommet après compilation s'ils partagent
+    sommet (position et influences), normale et UV : la clé regroupe l'index
+    du sommet et les valeurs écrites dans le SMD, en octets comparables.
+    """
+    tri_count = len(buffers["tri_verts"])
+    _, normals, uvs = triangle_chunk(buffers, 0, tri_count, flat_shading)
+    values = np.empty((tri_count, 3, 6), dtype=np.int32)
+    values[:, :, 0] = buffers["tri_verts"]
+    values[:, :, 1:4] = normals.astype(np.float32).view(np.int32)
+    values[:, :, 4:6] = uvs.astype(np.float32).view(np.int32)
+    return values.view(np.dtype((np.void, 24)))[:, :, 0]
+
+
+def limit_vertex_links(vertex_index, bone_index, weights, vert_count, max_links=MAX_LINKS):
+    """Garde les max_links plus fortes influences de chaque sommet et les renormalise
+
+    Les entrées sont des tableaux plats (une ligne par couple sommet/groupe) ;
+    les groupes sans os (bone_index < 0) et les poids nuls sont ignorés.
+    Retourne os (V, max_links), poids (V, max_links) et nombre d'influences (V,).
+    """
+    keep = (bone_index >= 0) & (weights > 0.0)
+    vertex_index = vertex_index[keep]
+    bone_index = bone_index[keep]
+    weights = weights[keep]
+
+    # Tri par sommet puis par poids décroissant, rang de chaque influence dans son sommet
+    order = np.lexsort((-weights, vertex_index))
+    vertex_index = vertex_index[order]
+    bone_index = bone_index[order]
+    weights = weights[order]
+    rank = np.arange(len(vertex_index)) - np.searchsorted(vertex_index, vertex_index)
+
+    keep = rank < max_links
+    vertex_index = vertex_index[keep]
+    bone_index = bone_index[keep]
+    weights = weights[keep]
+    rank = rank[keep]
+
+    totals = np.bincount(vertex_index, weights=weights, minlength=vert_count)
+
+    bones = np.zeros((vert_count, max_links), dtype=np.int32)
+    link_weights = np.zeros((vert_count, max_links), dtype=np.float32)
+    bones[vertex_index, rank] = bone_index
+    link_weights[vertex_index, rank] = weights / totals[vertex_index]
+    counts = np.bincount(vertex_index, minlength=vert_count).astype(np.int32)
+    return bones, link_weights, counts
+
+
+def format_vertex_links(bones, weights, counts):
+    """Texte des influences de chaque sommet ("n os poids os poids ..."), en tableau d'objets"""
+    links = np.empty(len(counts), dtype=object)
+    links[counts == 0] = "0"
+    for count in range(1, bones.shape[1] + 1):
+        selected = np.flatnonzero(counts == count)
+        if len(selected) == 0:
+            continue
+        rows = np.empty((len(selected), 1 + 2 * count), dtype=object)
+        rows[:, 0] = count
+        rows[:, 1::2] = bones[selected, :count]
+        rows[:, 2::2] = weights[selected, :count].astype(np.float64)
+        fmt = "%d" + " %d %.6f" * count + "\n"
+        links[selected] = ((fmt * len(selected)) % tuple(rows.ravel().tolist())).split("\n")[:-1]
+    return links
+
+
+def matrices_to_euler(matrices):
+    """Angles d'Euler XYZ de matrices de rotation (..., 3, 3), comme to_euler('XYZ') de mathutils
+
+    L'échelle est retirée en normalisant les colonnes ; des deux solutions,
+    la plus petite est gardée.
+    """
+    matrices = matrices / np.linalg.norm(matrices, axis=-2, keepdims=True)
+    m00 = matrices[..., 0, 0]
+    m10 = matrices[..., 1, 0]
+    m20 = matrices[..., 2, 0]
+    m21 = matrices[..., 2, 1]
+    m22 = matrices[..., 2, 2]
+    cy = np.hypot(m00, m10)
+
+    first = np.stack((np.arctan2(m21, m22), np.arctan2(-m20, cy), np.arctan2(m10, m00)), axis=-1)
+    second = np.stack((np.arctan2(-m21, -m22), np.arctan2(-m20, -cy), np.arctan2(-m10, -m00)), axis=-1)
+    euler = np.where(
+        (np.abs(first).sum(axis=-1) > np.abs(second).sum(axis=-1))[..., None], second, first
+    )
+
+    # Blocage de cardan : la rotation Z est reportée sur X
+    gimbal = cy <= 16 * np.finfo(np.float32).eps
+    if gimbal.any():
+        euler[gimbal, 0] = np.arctan2(-matrices[gimbal, 1, 2], matrices[gimbal, 1, 1])
+        euler[gimbal, 2] = 0.0
+    # + 0.0 évite d'écrire des "-0.000000"
+    return euler + 0.0
+
+
+def local_bone_matrices(world_matrices, parents):
+    """Matrices des os (..., B, 4, 4) exprimées dans l'espace de leur parent"""
+    parents = np.asarray(parents)
+    local = np.array(world_matrices, dtype=np.float64)
+    child = np.flatnonzero(parents >= 0)
+    if len(child):
+        local[..., child, :, :] = np.linalg.inv(local[..., parents[child], :, :]) @ local[..., child, :, :]
+    return local
+
+
+def format_nodes(names, parents):
+    """Bloc nodes d'un SMD"""
+    lines = "".join(f'{index} "{name}" {parent}\n' for index, (name, parent) in enumerate(zip(names, parents)))
+    return "nodes\n" + lines + "end\n"
+
+
+def format_skeleton(local_matrices, first_frame=0):
+    """Bloc skeleton d'un SMD à partir de matrices locales (F, B, 4, 4), une frame par ligne time"""
+    frame_count, bone_count = local_matrices.shape[:2]
+    if frame_count == 0 or bone_count == 0:
+        return "skeleton\nend\n"
+
+    rows = np.empty((frame_count, bone_count, 7), dtype=object)
+    rows[:, :, 0] = np.arange(bone_count)
+    rows[:, :, 1:4] = local_matrices[:, :, :3, 3]
+    rows[:, :, 4:7] = matrices_to_euler(local_matrices[:, :, :3, :3])
+
+    frame_fmt = _BONE_FMT * bone_count
+    frames = [
+        f"time {first_frame + index}\n" + frame_fmt % tuple(rows[index].ravel().tolist())
+        for index in range(frame_count)
+    ]
+    return "skeleton\n" + "".join(frames) + "end\n"
+
+
+def format_shared_range(specs, names, start, end, flat_shading):
+    """Point d'entrée des processus de formatage : lit les buffers en mémoire partagée
+
+    specs associe chaque buffer à (nom du segment, forme, dtype) ou None.
+    """
+    segments = []
+    buffers = {}
+    try:
+        for key, spec in specs.items():
+            if spec is None:
+                buffers[key] = None
+                continue
+            shm_name, shape, dtype = spec
+            segment = shared_memory.SharedMemory(name=shm_name)
+            segments.append(segment)
+            buffers[key] = np.ndarray(shape, dtype=dtype, buffer=segment.buf)
+
+        return format_triangle_range(buffers, names, buffers["name_index"], start, end, flat_shading)
+    finally:
+        buffers.clear()
+        for segment in segments:
+            segment.close()
+
+
+def format_animation(names, parents, world_matrices):
+    """SMD d'animation complet (nodes + skeleton, sans triangles) depuis les matrices monde (F, B, 4, 4)"""
+    local = local_bone_matrices(world_matrices, parents)
+    return "version 1\n" + format_nodes(names, parents) + format_skeleton(local)
+
+
+_VTA_VERTEX_FMT = "%d %.6f %.6f %.6f %.6f %.6f %.6f\n"
+
+
+def format_vertex_frame(indices, positions, normals):
+    """Lignes d'une frame de vertexanimation : index, position et normale de chaque sommet"""
+    count = len(indices)
+    if count == 0:
+        return ""
+    rows = np.empty((count, 7), dtype=object)
+    rows[:, 0] = indices
+    rows[:, 1:4] = positions.astype(np.float64)
+    rows[:, 4:7] = normals.astype(np.float64)
+    return (_VTA_VERTEX_FMT * count) % tuple(rows.ravel().tolist())
+
+
+def format_vta_header(frame_count):
+    """En-tête d'un VTA : nœud racine et une frame de squelette vide par frame de flex"""
+    frames = "".join(f"time {index}\n0 0 0 0 0 0 0\n" for index in range(frame_count))
+    return "version 1\nnodes\n0 \"root\" -1\nend\nskeleton\n" + frames + "end\nvertexanimation\n"
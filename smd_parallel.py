@@ -0,0 +1,122 @@
+import os
+import sys
+import importlib.util
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from .smd_format import TRIANGLE_CHUNK_SIZE
+
+
+# smd_format est chargé à part dans les workers (le package de l'addon importe
+# bpy, indisponible hors de Blender), sous un nom propre à cet addon pour ne
+# jamais masquer ni être masqué par le module d'un autre addon
+_WORKER_MODULE = "_" + (__package__ or "addon").replace(".", "_") + "_smd_format"
+_WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "smd_format.py")
+
+# Exécuté par l'initializer de chaque worker (exec est picklable, une fonction
+# de l'addon ne l'est pas : elle demanderait d'importer le package)
+_WORKER_BOOTSTRAP = """
+import importlib.util, sys
+spec = importlib.util.spec_from_file_location(name, path)
+module = importlib.util.module_from_spec(spec)
+sys.modules[name] = module
+spec.loader.exec_module(module)
+"""
+
+
+def _load_worker_module():
+    """Charge smd_format sous _WORKER_MODULE pour que ses fonctions soient picklables vers les workers
+
+    sys.path n'est pas modifié : les workers chargent le même fichier par
+    son chemin, dans l'initializer du pool.
+    """
+    module = sys.modules.get(_WORKER_MODULE)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(_WORKER_MODULE, _WORKER_PATH)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[_WORKER_MODULE] = module
+        spec.loader.exec_module(module)
+    return module
+
+
+class ParallelFormatter:
+    """Pool de processus qui formate les triangles SMD par blocs
+
+    Les buffers du mesh sont copiés une fois en mémoire partagée, les workers
+    ne reçoivent que les noms des segments et une plage de triangles. Les
+    blocs sont écrits dans l'ordre, la sortie est identique au chemin simple.
+    """
+
+    def __init__(self, workers, chunk_size=TRIANGLE_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._worker_module = _load_worker_module()
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=exec,
+            initargs=(_WORKER_BOOTSTRAP, {"name": _WORKER_MODULE, "path": _WORKER_PATH}),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def submit(self, function_name, *args):
+        """Exécute une fonction de smd_format dans un worker et retourne le Future"""
+        return self._executor.submit(getattr(self._worker_module, function_name), *args)
+
+    def should_parallelize(self, tri_count):
+        # En dessous de deux blocs, le coût des processus dépasse le gain
+        return tri_count >= self.chunk_size * 2
+
+    def write(self, f, buffers, names, name_index, flat_shading):
+        """Formate en parallèle et écrit dans f tous les triangles du mesh"""
+        arrays = dict(buffers)
+        arrays["name_index"] = name_index
+        tri_count = len(name_index)
+
+        segments = []
+        specs = {}
+        pending = deque()
+        try:
+            for key, array in arrays.items():
+                if array is None:
+                    specs[key] = None
+                    continue
+                array = np.ascontiguousarray(array)
+                segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                segments.append(segment)
+                np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+                specs[key] = (segment.name, array.shape, array.dtype.str)
+
+            # Fenêtre bornée de blocs en vol pour limiter la mémoire des résultats
+            max_pending = self.workers * 2
+            for start in range(0, tri_count, self.chunk_size):
+                end = min(start + self.chunk_size, tri_count)
+                pending.append(self._executor.submit(
+                    self._worker_module.format_shared_range,
+                    specs, names, start, end, flat_shading,
+                ))
+                if len(pending) >= max_pending:
+                    f.write(pending.popleft().result())
+
+            while pending:
+                f.write(pending.popleft().result())
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+        finally:
+            for segment in segments:
+                segment.close()
+                segment.unlink()
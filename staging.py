@@ -0,0 +1,67 @@
+import os
+import shutil
+import hashlib
+from contextlib import contextmanager
+
+
+# Taille des blocs lus pour le calcul des empreintes
+_DIGEST_BLOCK_SIZE = 1 << 20
+
+
+def file_digest(path):
+    """Empreinte blake2b du contenu d'un fichier"""
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(_DIGEST_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def files_identical(path_a, path_b):
+    """Vrai si les deux fichiers existent et ont le même contenu"""
+    if not (os.path.exists(path_a) and os.path.exists(path_b)):
+        return False
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    return file_digest(path_a) == file_digest(path_b)
+
+
+@contextmanager
+def atomic_write(path, mode="w", buffering=-1):
+    """Écrit un fichier via un fichier temporaire puis un renommage atomique
+
+    Si le contenu final est identique au fichier existant, celui-ci n'est pas
+    touché et garde sa date de modification.
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode, buffering=buffering) as f:
+            yield f
+        if files_identical(tmp_path, path):
+            os.remove(tmp_path)
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def sync_file(src, dst):
+    """Copie src vers dst seulement si le contenu diffère
+
+    La copie passe par un fichier temporaire renommé atomiquement. Retourne
+    True si le fichier a été copié, False s'il était déjà à jour.
+    """
+    if files_identical(src, dst):
+        return False
+
+    tmp_path = f"{dst}.{os.getpid()}.tmp"
+    try:
+        shutil.copy2(src, tmp_path)
+        os.replace(tmp_path, dst)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return True
@@ -0,0 +1,194 @@
+import os
+import re
+from collections import Counter
+
+
+# Messages gardés par catégorie (un compile peut produire des milliers d'avertissements)
+KEPT_MESSAGES = 200
+
+# Ordre de priorité : la première catégorie qui reconnaît la ligne l'emporte
+_ERROR = re.compile(r"^\s*(?:\*+\s*)?(?:fatal\s+)?error\b", re.IGNORECASE)
+_WARNING = re.compile(r"^\s*(?:\*+\s*)?warning\b", re.IGNORECASE)
+_FILE = re.compile(
+    r"^\s*(?:(?:SMD|DMX|VTA|OBJ)\s+(?:MODEL|ANIMATION|VTA)|Working on|Processing|Loading|Reading)\s+"
+    r"\"?(?P<path>[^\"]+?\.(?:smd|dmx|vta|qci?|obj))\"?\s*$",
+    re.IGNORECASE,
+)
+_TIMING = re.compile(
+    r"(?P<seconds>\d+(?:\.\d+)?)\s*(?:seconds|secs?)\b|^\s*Completed\s+\"",
+    re.IGNORECASE,
+)
+_LOD = re.compile(r"\blods?\b", re.IGNORECASE)
+_PHYS = re.compile(r"convex|collision|\bhulls?\b|\.phy\b|\bmass\b|\binertia\b", re.IGNORECASE)
+_WRITING = re.compile(r"^\s*writing\s+(?P<path>.+?):?\s*$", re.IGNORECASE)
+_STAT = re.compile(r"^\s*(?P<name>[a-z][a-z ]*?):?\s+(?P<bytes>\d+)\s+bytes\b", re.IGNORECASE)
+
+# Fichier d'entrée cité dans une ligne (erreur avec chemin, "file.smd(12)")
+_INPUT_FILE = re.compile(r"([^\s\"'\\/:()]+\.(?:smd|dmx|vta|qci?))", re.IGNORECASE)
+# Les nombres changent d'une occurrence à l'autre : regroupement des messages identiques
+_DIGITS = re.compile(r"\d+")
+
+
+class StudiomdlMessage:
+    """Ligne classée : catégorie, texte, fichier d'entrée concerné et objets Blender qui l'ont produit"""
+
+    def __init__(self, kind, stream, text, filename="", objects=()):
+        self.kind = kind
+        self.stream = stream
+        self.text = text
+        self.filename = filename
+        self.objects = list(objects)
+
+    def describe(self):
+        if self.objects:
+            return f"{self.text.strip()} [{', '.join(self.objects)}]"
+        return self.text.strip()
+
+
+class StudiomdlOutput:
+    """Analyse en flux de la sortie de studiomdl, ligne par ligne pendant le compile
+
+    Catégories : error, warning, file (fichier d'entrée traité), lod, phys,
+    stat (tailles écrites), timing, info. Une erreur qui cite un fichier
+    d'entrée est rattachée à ce fichier puis aux objets Blender écrits
+    dedans (file_objects : nom de fichier -> noms d'objets) ; sans fichier
+    cité, elle n'est rattachée à rien (le dernier fichier traité n'est pas
+    forcément en cause).
+    """
+
+    def __init__(self, file_objects=None):
+        self.reset(file_objects)
+
+    def reset(self, file_objects=None):
+        self.file_objects = {name.lower(): objects for name, objects in (file_objects or {}).items()}
+        self.counts = Counter()
+        self.errors = []
+        self.warnings = []
+        self.warning_kinds = Counter()
+        self.files = []
+        self.lod_lines = []
+        self.phys_lines = []
+        self.timing_lines = []
+        self.stats = {}
+        self.outputs = []
+        self.current_file = ""
+
+    def objects_for(self, filename):
+        return self.file_objects.get(filename.lower(), [])
+
+    def _input_file(self, text):
+        """Fichier d'entrée cité par la ligne elle-même, sinon chaîne vide"""
+        match = _INPUT_FILE.search(text)
+        if match:
+            return os.path.basename(match.group(1))
+        return ""
+
+    def classify(self, text):
+        if _ERROR.match(text):
+            return "error"
+        if _WARNING.match(text):
+            return "warning"
+        if _FILE.match(text):
+            return "file"
+        if _TIMING.search(text):
+            return "timing"
+        if _LOD.search(text):
+            return "lod"
+        if _PHYS.search(text):
+            return "phys"
+        if _WRITING.match(text) or _STAT.match(text):
+            return "stat"
+        return "info"
+
+    def feed(self, stream, text):
+        """Classe une ligne dès son arrivée et met à jour les compteurs ; retourne le StudiomdlMessage"""
+        kind = self.classify(text)
+        self.counts[kind] += 1
+
+        if kind == "file":
+            path = _FILE.match(text).group("path")
+            self.current_file = os.path.basename(path.replace("\\", "/"))
+            self.files.append(self.current_file)
+            return StudiomdlMessage(kind, stream, text, self.current_file, self.objects_for(self.current_file))
+
+        if kind in ("error", "warning"):
+            filename = self._input_file(text)
+            message = StudiomdlMessage(kind, stream, text, filename, self.objects_for(filename))
+            if kind == "error":
+                if len(self.errors) < KEPT_MESSAGES:
+                    self.errors.append(message)
+            else:
+                self.warning_kinds[_DIGITS.sub("#", text.strip())] += 1
+                if len(self.warnings) < KEPT_MESSAGES:
+                    self.warnings.append(message)
+            return message
+
+        if kind == "lod":
+            self.lod_lines.append(text.strip())
+        elif kind == "phys":
+            self.phys_lines.append(text.strip())
+        elif kind == "timing":
+            self.timing_lines.append(text.strip())
+        elif kind == "stat":
+            writing = _WRITING.match(text)
+            if writing:
+                self.outputs.append(os.path.basename(writing.group("path").replace("\\", "/")))
+            else:
+                stat = _STAT.match(text)
+                output = self.outputs[-1] if self.outputs else ""
+                self.stats[f"{output}:{stat.group('name').strip()}"] = int(stat.group("bytes"))
+        return StudiomdlMessage(kind, stream, text)
+
+    @property
+    def first_error(self):
+        return self.errors[0] if self.errors else None
+
+    def error_objects(self):
+        """Objets Blender cités par les erreurs, dans l'ordre d'apparition"""
+        objects = []
+        for error in self.errors:
+            objects.extend(name for name in error.objects if name not in objects)
+        return objects
+
+    def summary(self):
+        """Résumé compact : une ligne de comptes, puis les lignes utiles"""
+        lines = [
+            f"{self.counts['error']} error(s), {self.counts['warning']} warning(s) "
+            f"({len(self.warning_kinds)} distinct), {len(self.files)} file(s) processed"
+        ]
+        if self.lod_lines:
+            lines.append(f"LOD: {self.lod_lines[-1]}")
+        if self.phys_lines:
+            lines.append(f"Physics: {self.phys_lines[-1]}")
+        if self.timing_lines:
+            lines.append(f"Timing: {self.timing_lines[-1]}")
+        return lines
+
+    def to_dict(self):
+        return {
+            "counts": dict(self.counts),
+            "errors": [
+                {"text": error.text.strip(), "file": error.filename, "objects": error.objects}
+                for error in self.errors
+            ],
+            "warnings": [
+                {"text": text, "count": count} for text, count in self.warning_kinds.most_common()
+            ],
+            "files": self.files,
+            "lod": self.lod_lines,
+            "physics": self.phys_lines,
+            "timing": self.timing_lines,
+            "stats": self.stats,
+        }
+
+
+def parse_lines(lines, file_objects=None):
+    """Analyse après coup une liste de lignes (stream, texte)"""
+    output = StudiomdlOutput(file_objects)
+    for stream, text in lines:
+        output.feed(stream, text)
+    return output
+
+
+# Analyse partagée entre l'opérateur modal et le panel
+studiomdl_output = StudiomdlOutput()
@@ -0,0 +1,173 @@
+import time
+import queue
+import threading
+import subprocess
+from collections import deque
+
+from .studiomdl_output import parse_lines
+
+
+# Nombre maximum de lignes gardées dans le log du panel
+LOG_MAX_LINES = 5000
+
+
+class CompileLog:
+    """État du dernier lancement de studiomdl, affiché par le panel de log"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.lines = deque(maxlen=LOG_MAX_LINES)
+        self.running = False
+        self.start_time = None
+        self.end_time = None
+        self.status = ""
+        self.cancel_requested = False
+
+    def start(self):
+        self.reset()
+        self.running = True
+        self.start_time = time.monotonic()
+        self.status = "Running"
+
+    def finish(self, status):
+        self.running = False
+        self.end_time = time.monotonic()
+        self.status = status
+
+    def add(self, stream, line):
+        self.lines.append((stream, line))
+
+    @property
+    def elapsed(self):
+        if self.start_time is None:
+            return 0.0
+        end = self.end_time if self.end_time is not None else time.monotonic()
+        return end - self.start_time
+
+
+# Log partagé entre l'opérateur modal et le panel
+compile_log = CompileLog()
+
+
+def build_studiomdl_args(studiomdl_path, game_dir, qc_path):
+    """Ligne de commande studiomdl pour un QC donné"""
+    return [
+        studiomdl_path,
+        "-game", game_dir,
+        "-nop4",
+        qc_path
+    ]
+
+
+def studiomdl_error_message(returncode, lines, output=None):
+    """Message d'erreur d'un studiomdl terminé en échec
+
+    Les erreurs reconnues par l'analyse de la sortie (output, sinon une
+    analyse des lignes) remplacent la sortie complète.
+    """
+    error_msg = f"studiomdl.exe failed with exit code {returncode}"
+    if output is None:
+        output = parse_lines(lines)
+    if output.errors:
+        error_msg += f": {output.first_error.describe()}"
+        if output.counts['error'] > 1:
+            error_msg += f" (+{output.counts['error'] - 1} more error(s))"
+        return error_msg
+
+    stderr = "\n".join(line for stream, line in lines if stream == "stderr")
+    stdout = "\n".join(line for stream, line in lines if stream == "stdout")
+    if stderr:
+        error_msg += f"\nSTDERR: {stderr}"
+    if stdout:
+        error_msg += f"\nSTDOUT: {stdout}"
+    return error_msg
+
+
+class StudiomdlProcess:
+    """studiomdl lancé avec Popen, sorties lues ligne par ligne en arrière-plan
+
+    Deux threads lisent stdout et stderr dans une file ; drain() récupère les
+    lignes arrivées depuis le dernier appel sans jamais bloquer.
+    """
+
+    def __init__(self, args, cwd, timeout=0):
+        self.timeout = timeout
+        self.start_time = time.monotonic()
+        self.lines = queue.Queue()
+        self.process = subprocess.Popen(
+            args,
+            cwd=cwd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace",
+            bufsize=1,
+            shell=False
+        )
+        self._readers = [
+            threading.Thread(target=self._read_stream, args=(self.process.stdout, "stdout"), daemon=True),
+            threading.Thread(target=self._read_stream, args=(self.process.stderr, "stderr"), daemon=True),
+        ]
+        for reader in self._readers:
+            reader.start()
+
+    def _read_stream(self, stream, name):
+        for line in stream:
+            self.lines.put((name, line.rstrip("\r\n")))
+        stream.close()
+
+    def drain(self):
+        """Retourne les lignes (stream, texte) reçues depuis le dernier appel"""
+        drained = []
+        while True:
+            try:
+                drained.append(self.lines.get_nowait())
+            except queue.Empty:
+                return drained
+
+    def poll(self):
+        """Code de retour, ou None tant que le processus ou ses sorties ne sont pas terminés"""
+        returncode = self.process.poll()
+        if returncode is None or any(reader.is_alive() for reader in self._readers):
+            return None
+        return returncode
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.start_time
+
+    def timed_out(self):
+        return self.timeout > 0 and self.elapsed > self.timeout
+
+    def terminate(self):
+        """Arrête studiomdl (kill si terminate ne suffit pas)"""
+        if self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def wait(self, on_line=None, poll_interval=0.05):
+        """Attend la fin du processus (mode bloquant) en transmettant chaque ligne à on_line
+
+        Lève subprocess.TimeoutExpired si le timeout est dépassé.
+        """
+        while True:
+            for stream, line in self.drain():
+                if on_line:
+                    on_line(stream, line)
+            returncode = self.poll()
+            if returncode is not None:
+                for stream, line in self.drain():
+                    if on_line:
+                        on_line(stream, line)
+                return returncode
+            if self.timed_out():
+                self.terminate()
+                raise subprocess.TimeoutExpired(self.process.args, self.timeout)
+            time.sleep(poll_interval)
@@ -0,0 +1,98 @@
+"""Comparaison de l'écriture vectorisée des triangles avec l'ancien writer mathutils
+
+Hors de Blender, le __init__ de l'add-on (bpy) ne peut pas être importé :
+lancer depuis ce répertoire avec "python -m pytest --rootdir=." (le module
+mathutils autonome doit être installé, sinon les tests sont sautés).
+"""
+import importlib.util
+import os
+
+import numpy as np
+import pytest
+
+mathutils = pytest.importorskip("mathutils")
+
+# smd_format n'importe pas bpy : chargé seul, sans le __init__ de l'add-on
+_spec = importlib.util.spec_from_file_location(
+    "smd_format", os.path.join(os.path.dirname(os.path.dirname(__file__)), "smd_format.py")
+)
+smd_format = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(smd_format)
+
+
+def fixed_mesh():
+    """Mesh fixe : triangles lisses, plats à plusieurs échelles et dégénérés"""
+    rng = np.random.default_rng(2024)
+    scales = np.repeat([1.0e-3, 1.0, 37.5, 1.0e4], 600)[:, None]
+    co = (rng.normal(size=(2400, 3)) * scales).astype(np.float32)
+    normals = rng.normal(size=(2400, 3)).astype(np.float32)
+    normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+    tri_verts = rng.integers(0, 2400, size=(3000, 3)).astype(np.int32)
+
+    # Dégénérés : sommets confondus, alignés, ou arêtes trop courtes pour être normalisées
+    co[0] = co[1] = co[2]
+    co[3] = (0.0, 0.0, 0.0)
+    co[4] = (1.0, 1.0, 1.0)
+    co[5] = (2.0, 2.0, 2.0)
+    co[6] = (5.0, 5.0, 5.0)
+    co[7] = (5.0, 5.0, 5.0 + 1.0e-19)
+    co[8] = (5.0 + 1.0e-19, 5.0, 5.0)
+    tri_verts[:3] = ((0, 1, 2), (3, 4, 5), (6, 7, 8))
+
+    use_smooth = rng.random(3000) < 0.3
+    use_smooth[:3] = False
+    tri_count = len(tri_verts)
+    buffers = {
+        "co": co,
+        "normals": normals,
+        "tri_verts": tri_verts,
+        "tri_loops": np.arange(tri_count * 3, dtype=np.int32).reshape(-1, 3),
+        "material_index": np.zeros(tri_count, dtype=np.int32),
+        "use_smooth": use_smooth,
+        "loop_uvs": rng.random((tri_count * 3, 2)).astype(np.float32),
+    }
+    return buffers, ["mat"], np.zeros(tri_count, dtype=np.int32)
+
+
+def old_writer(buffers, name):
+    """Boucle par triangle de l'ancien export_mesh_smd_with_materials, en Vector mathutils"""
+    Vector = mathutils.Vector
+    lines = []
+    for tri, (a, b, c) in enumerate(buffers["tri_verts"]):
+        pos_a, pos_b, pos_c = (Vector(buffers["co"][index].tolist()) for index in (a, b, c))
+        normal_a, normal_b, normal_c = (Vector(buffers["normals"][index].tolist()) for index in (a, b, c))
+        if not buffers["use_smooth"][tri]:
+            normal = (pos_b - pos_a).cross(pos_c - pos_a).normalized()
+            normal_a = normal_b = normal_c = normal
+        uv_a, uv_b, uv_c = (Vector(buffers["loop_uvs"][loop].tolist()) for loop in buffers["tri_loops"][tri])
+        lines.append(
+            f"{name}\n"
+            f"0  {pos_a.x:.6f} {pos_a.y:.6f} {pos_a.z:.6f}  {normal_a.x:.6f} {normal_a.y:.6f} {normal_a.z:.6f}  {uv_a[0]:.6f} {uv_a[1]:.6f} 0\n"
+            f"0  {pos_b.x:.6f} {pos_b.y:.6f} {pos_b.z:.6f}  {normal_b.x:.6f} {normal_b.y:.6f} {normal_b.z:.6f}  {uv_b[0]:.6f} {uv_b[1]:.6f} 0\n"
+            f"0  {pos_c.x:.6f} {pos_c.y:.6f} {pos_c.z:.6f}  {normal_c.x:.6f} {normal_c.y:.6f} {normal_c.z:.6f}  {uv_c[0]:.6f} {uv_c[1]:.6f} 0\n"
+        )
+    return "".join(lines)
+
+
+def test_triangles_match_old_writer():
+    buffers, names, name_index = fixed_mesh()
+    expected = old_writer(buffers, names[0])
+    written = smd_format.format_triangle_range(buffers, names, name_index, 0, len(name_index))
+    assert written.splitlines() == expected.splitlines()
+
+
+def test_flat_normals_match_mathutils():
+    buffers, _, _ = fixed_mesh()
+    positions = buffers["co"][buffers["tri_verts"]]
+    normals = smd_format.flat_normals(positions)
+    Vector = mathutils.Vector
+    for triangle, normal in zip(positions, normals):
+        pos_a, pos_b, pos_c = (Vector(corner.tolist()) for corner in triangle)
+        expected = (pos_b - pos_a).cross(pos_c - pos_a).normalized()
+        assert np.array_equal(np.array(expected, dtype=np.float32), normal)
+
+
+def test_degenerate_triangles_get_zero_normal():
+    buffers, _, _ = fixed_mesh()
+    positions = buffers["co"][buffers["tri_verts"][:3]]
+    assert not smd_format.flat_normals(positions).any()
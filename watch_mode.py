@@ -0,0 +1,163 @@
+import time
+
+import bpy
+from bpy.app.handlers import persistent
+
+from .studiomdl_runner import compile_log
+from .export_progress import export_progress
+from .export_plan import instanced_mesh_objects, is_collection_instancer
+
+
+# Intervalle de vérification du timer de watch (secondes)
+WATCH_POLL_INTERVAL = 0.25
+
+
+def watched_objects(scene):
+    """Objets référencés par le compile : bodies, LODs, shadow LOD et collision"""
+    props = scene.compilation_props
+    objects = [body.mesh_object for body in scene.body_list if not body.blank]
+    for lod in scene.lod_list:
+        objects += [lod.replace_model_from_obj, lod.replace_model_to_obj]
+    if props.enable_shadowlod:
+        objects += [props.shadowlod_replace_from_obj, props.shadowlod_replace_to_obj]
+    objects.append(props.collision_mesh)
+    objects = [obj for obj in objects if obj is not None]
+
+    # Les meshes d'une collection instanciée changent le body qui l'instancie
+    for obj in list(objects):
+        if is_collection_instancer(obj):
+            objects += instanced_mesh_objects(obj.instance_collection)
+    return objects
+
+
+class WatchState:
+    """Mode watch : objets modifiés depuis le dernier compile et anti-rebond des éditions"""
+
+    def __init__(self):
+        self.active = False
+        self.scene_name = ""
+        self.changed = set()
+        self.last_change = 0.0
+        # Dernière édition pour laquelle un compile a été lancé (pas de relance en boucle sur échec)
+        self.triggered_change = 0.0
+        self.suspended = 0
+        self.compiles = 0
+        # Parts supplémentaires de chaque fichier de mesh écrit pendant la session
+        self.part_counts = {}
+
+    def record(self, objects):
+        self.changed.update(obj.as_pointer() for obj in objects)
+        self.last_change = time.monotonic()
+
+    def take_changes(self):
+        """Pointeurs des objets modifiés, remis à zéro pour le prochain compile"""
+        changed = self.changed
+        self.changed = set()
+        return changed
+
+    def restore(self, changed):
+        """Remet des changements non exportés (compile échoué) pour le prochain compile"""
+        if changed:
+            self.changed.update(changed)
+
+    def settled(self, debounce):
+        if not self.changed or self.last_change == self.triggered_change:
+            return False
+        return time.monotonic() - self.last_change >= debounce
+
+    def suspend(self):
+        return _Suspend(self)
+
+
+class _Suspend:
+    # Les mises à jour provoquées par l'export lui-même (mode objet, frame_set) sont ignorées
+    def __init__(self, state):
+        self.state = state
+
+    def __enter__(self):
+        self.state.suspended += 1
+
+    def __exit__(self, *exc):
+        self.state.suspended -= 1
+
+
+watch_state = WatchState()
+
+
+def changed_objects(scene, depsgraph):
+    """Objets surveillés dont la géométrie ou la transformation a changé dans cette mise à jour"""
+    watched = watched_objects(scene)
+    by_pointer = {obj.as_pointer(): obj for obj in watched}
+    by_mesh = {}
+    for obj in watched:
+        if obj.type == 'MESH':
+            by_mesh.setdefault(obj.data.as_pointer(), []).append(obj)
+
+    changed = []
+    for update in depsgraph.updates:
+        if not (update.is_updated_geometry or update.is_updated_transform):
+            continue
+        original = update.id.original
+        if isinstance(original, bpy.types.Object):
+            obj = by_pointer.get(original.as_pointer())
+            if obj is not None:
+                changed.append(obj)
+        elif isinstance(original, bpy.types.Mesh):
+            changed.extend(by_mesh.get(original.as_pointer(), []))
+    return changed
+
+
+@persistent
+def on_depsgraph_update(scene, depsgraph):
+    if not watch_state.active or watch_state.suspended or scene.name != watch_state.scene_name:
+        return
+    changed = changed_objects(scene, depsgraph)
+    if changed:
+        watch_state.record(changed)
+
+
+def _watch_tick():
+    """Timer du mode watch : lance un compile incrémental une fois les éditions stabilisées"""
+    if not watch_state.active:
+        return None
+
+    scene = bpy.data.scenes.get(watch_state.scene_name)
+    if scene is None:
+        stop_watch()
+        return None
+
+    if compile_log.running or export_progress.running or not watch_state.settled(scene.compilation_props.watch_debounce):
+        return WATCH_POLL_INTERVAL
+
+    window = next((window for window in bpy.context.window_manager.windows if window.scene == scene), None)
+    if window is None:
+        return WATCH_POLL_INTERVAL
+
+    print(f"[WATCH] {len(watch_state.changed)} object(s) changed, recompiling")
+    watch_state.compiles += 1
+    watch_state.triggered_change = watch_state.last_change
+    with bpy.context.temp_override(window=window):
+        bpy.ops.lw_pannel.compile_model('INVOKE_DEFAULT', incremental=True)
+    return WATCH_POLL_INTERVAL
+
+
+def start_watch(scene):
+    watch_state.active = True
+    watch_state.scene_name = scene.name
+    watch_state.changed = set()
+    watch_state.compiles = 0
+    if on_depsgraph_update not in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.append(on_depsgraph_update)
+    if not bpy.app.timers.is_registered(_watch_tick):
+        bpy.app.timers.register(_watch_tick, first_interval=WATCH_POLL_INTERVAL)
+    print(f"[WATCH] Watching scene '{scene.name}'")
+
+
+def stop_watch():
+    watch_state.active = False
+    watch_state.changed = set()
+    if on_depsgraph_update in bpy.app.handlers.depsgraph_update_post:
+        bpy.app.handlers.depsgraph_update_post.remove(on_depsgraph_update)
+    if bpy.app.timers.is_registered(_watch_tick):
+        bpy.app.timers.unregister(_watch_tick)
+    print("[WATCH] Stopped")